@@ -4,10 +4,26 @@ Swarm - Distributed AI Inference
 Run large language models across multiple consumer devices.
 """
 
+from typing import TYPE_CHECKING
+
+from swarm.utils.lazy import lazy_module
+
 __version__ = "0.1.0"
 
-from swarm.node.node import Node
-from swarm.discovery.service import DiscoveryService
-from swarm.inference.coordinator import InferenceCoordinator
+# Imported on first use: they pull in zeroconf, psutil and NumPy, which
+# `import swarm` (and every CLI invocation) shouldn't pay for
+_EXPORTS = {
+    "Node": "swarm.node.node",
+    "DiscoveryService": "swarm.discovery.service",
+    "InferenceCoordinator": "swarm.inference.coordinator",
+}
 
 __all__ = ["Node", "DiscoveryService", "InferenceCoordinator"]
+
+if TYPE_CHECKING:
+    from swarm.discovery.service import DiscoveryService
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.node.node import Node
+
+
+__getattr__, __dir__ = lazy_module(__name__, _EXPORTS)
@@ -0,0 +1,23 @@
+"""Benchmark module."""
+
+from typing import TYPE_CHECKING
+
+from swarm.utils.lazy import lazy_module
+
+# Imported on first use: SimulatedCluster pulls in the whole node
+_EXPORTS = {
+    "BenchmarkReport": "swarm.bench.workload",
+    "RequestResult": "swarm.bench.workload",
+    "SimulatedCluster": "swarm.bench.cluster",
+    "Workload": "swarm.bench.workload",
+    "run_workload": "swarm.bench.workload",
+}
+
+__all__ = ["BenchmarkReport", "RequestResult", "SimulatedCluster", "Workload", "run_workload"]
+
+if TYPE_CHECKING:
+    from swarm.bench.cluster import SimulatedCluster
+    from swarm.bench.workload import BenchmarkReport, RequestResult, Workload, run_workload
+
+
+__getattr__, __dir__ = lazy_module(__name__, _EXPORTS)
@@ -0,0 +1,173 @@
+"""
+Simulated cluster harness.
+
+Starts a whole cluster on localhost, in this process or one process per
+node, with simulated compute and link costs, so partitioning and
+scheduling changes can be measured without the hardware.
+
+In-process clusters talk over an emulated MemoryNetwork, whose links can
+be tuned one by one. Multi-process clusters use real TCP on loopback,
+with link latency and bandwidth added by each node's SimulationProfile.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from dataclasses import replace
+from typing import List, Optional
+
+from swarm.inference.simulation import SimulationProfile
+from swarm.node.node import Node, NodeConfig
+from swarm.protocol.memory import LinkProfile, MemoryNetwork
+from swarm.protocol.transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_config(
+    simulation: SimulationProfile,
+    memory_gb: float,
+    seed: str,
+    transport: Optional[Transport] = None,
+) -> NodeConfig:
+    return NodeConfig(
+        port=0,
+        listen_host="127.0.0.1",
+        advertise_host=None if transport else "127.0.0.1",
+        auto_discover=False,
+        compute_workers=1,
+        seeds=[seed],
+        gossip_interval=0.2,
+        announce_interval=1.0,
+        simulation=replace(simulation, memory_gb=memory_gb),
+        transport=transport,
+    )
+
+
+def _run_worker(config: NodeConfig, stop):
+    """Entry point of a worker process: run a node until told to stop."""
+    logging.basicConfig(level=logging.WARNING)
+
+    async def main():
+        node = Node(config)
+        await node.start()
+        try:
+            while not stop.is_set():
+                await asyncio.sleep(0.1)
+        finally:
+            await node.stop()
+
+    asyncio.run(main())
+
+
+class SimulatedCluster:
+    """
+    ``nodes`` worker nodes plus a frontend node that drives requests.
+
+    The frontend holds no layers, so every request goes through the
+    pipelines the workers form, the way a thin client would use a real
+    cluster. Workers join the frontend by gossip.
+
+    Nodes are reachable as ``frontend`` and ``node-0`` ... ``node-N-1`` on
+    ``network`` (in-process clusters only), so individual links can be
+    slowed down or made lossy with ``network.set_link``.
+
+    Usage:
+        async with SimulatedCluster(nodes=4, memory_gb=5.0) as cluster:
+            await cluster.frontend.run_inference("Hello")
+    """
+
+    def __init__(
+        self,
+        nodes: int = 4,
+        memory_gb: float = 8.0,
+        simulation: Optional[SimulationProfile] = None,
+        processes: bool = False,
+        link: Optional[LinkProfile] = None,
+        seed: int = 0,
+    ):
+        self.size = nodes
+        self.memory_gb = memory_gb
+        self.simulation = simulation or SimulationProfile()
+        self.processes = processes
+
+        self.network: Optional[MemoryNetwork] = None
+        if not processes:
+            # The network carries the link costs, so nodes mustn't add them again
+            self.network = MemoryNetwork(
+                default=link or LinkProfile(
+                    latency_ms=self.simulation.link_latency_ms,
+                    bandwidth_mbps=self.simulation.link_bandwidth_mbps,
+                ),
+                seed=seed,
+            )
+            self.simulation = replace(self.simulation, link_latency_ms=0.0, link_bandwidth_mbps=0.0)
+        elif link and (link.jitter_ms or link.drop_rate):
+            logger.warning("Jitter and drops are only emulated for in-process clusters")
+
+        self.frontend: Optional[Node] = None
+        self.nodes: List[Node] = []
+        self._workers: list = []
+        self._stop = None
+
+    async def start(self, timeout: float = 10.0):
+        """Start every node and wait until the frontend sees them all."""
+        self.frontend = Node(NodeConfig(
+            port=0,
+            listen_host="127.0.0.1",
+            advertise_host=None if self.network else "127.0.0.1",
+            auto_discover=False,
+            gossip_interval=0.2,
+            simulation=replace(self.simulation, memory_gb=0.0),
+            transport=self.network.transport("frontend") if self.network else None,
+        ))
+        await self.frontend.start()
+        seed = f"{self.frontend.gossip.self_info.ip_address}:{self.frontend.config.port}"
+
+        if self.processes:
+            # Spawn rather than fork: the parent already runs an event loop
+            context = multiprocessing.get_context("spawn")
+            self._stop = context.Event()
+            for _ in range(self.size):
+                config = _worker_config(self.simulation, self.memory_gb, seed)
+                worker = context.Process(target=_run_worker, args=(config, self._stop), daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        else:
+            for i in range(self.size):
+                transport = self.network.transport(f"node-{i}")
+                node = Node(_worker_config(self.simulation, self.memory_gb, seed, transport))
+                await node.start()
+                self.nodes.append(node)
+
+        if not await self.frontend.wait_for_peers(self.size, timeout=timeout):
+            await self.stop()
+            raise RuntimeError(f"Only {len(self.frontend.peers)} of {self.size} nodes joined")
+
+        logger.info(f"Simulated cluster of {self.size} nodes ready")
+
+    async def stop(self):
+        """Stop every node."""
+        for node in self.nodes:
+            await node.stop()
+        self.nodes.clear()
+
+        if self._workers:
+            self._stop.set()
+            loop = asyncio.get_running_loop()
+            for worker in self._workers:
+                await loop.run_in_executor(None, worker.join, 5.0)
+                if worker.is_alive():
+                    worker.terminate()
+            self._workers.clear()
+
+        if self.frontend:
+            await self.frontend.stop()
+            self.frontend = None
+
+    async def __aenter__(self) -> "SimulatedCluster":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
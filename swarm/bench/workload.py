@@ -0,0 +1,141 @@
+"""
+Benchmark load generation and reporting.
+
+Drives a node with concurrent streaming requests whose prompt and output
+lengths follow a chosen distribution, and reports time to first token,
+inter-token latency and throughput.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from swarm.utils.choices import LENGTH_DISTRIBUTIONS
+
+_WORDS = (
+    "the quick brown fox jumps over a lazy dog while distant thunder rolls "
+    "across quiet hills and bright stars slowly fade into morning light"
+).split()
+
+
+@dataclass
+class Workload:
+    """What to send: how many requests, how many at once, and how long."""
+
+    requests: int = 32
+    concurrency: int = 4
+    prompt_tokens: int = 32
+    output_tokens: int = 32
+    distribution: str = "fixed"
+    model: str = "default"
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.distribution not in LENGTH_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown length distribution {self.distribution!r}, "
+                f"expected one of {LENGTH_DISTRIBUTIONS}"
+            )
+
+    def sample_length(self, mean: int, rng: np.random.Generator) -> int:
+        """A length drawn around ``mean`` from the workload's distribution."""
+        if self.distribution == "uniform":
+            return int(rng.integers(max(1, mean // 2), mean + mean // 2 + 1))
+        if self.distribution == "exponential":
+            return max(1, round(rng.exponential(mean)))
+        return mean
+
+    def generate(self) -> List[Tuple[str, int]]:
+        """(prompt, output length) for every request, reproducible from ``seed``."""
+        rng = np.random.default_rng(self.seed)
+        items = []
+        for _ in range(self.requests):
+            prompt_len = self.sample_length(self.prompt_tokens, rng)
+            words = rng.choice(_WORDS, size=prompt_len)
+            items.append((" ".join(words), self.sample_length(self.output_tokens, rng)))
+        return items
+
+
+@dataclass
+class RequestResult:
+    """Timings of one request, in seconds."""
+
+    prompt_tokens: int
+    output_tokens: int = 0
+    ttft: Optional[float] = None
+    inter_token: List[float] = field(default_factory=list)
+    latency: float = 0.0
+    error: Optional[str] = None
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"p50": float(p50), "p90": float(p90), "p99": float(p99)}
+
+
+@dataclass
+class BenchmarkReport:
+    """All request results from a run plus its wall-clock duration."""
+
+    results: List[RequestResult]
+    duration: float
+
+    def summary(self) -> Dict:
+        ok = [r for r in self.results if r.error is None]
+        tokens = sum(r.output_tokens for r in ok)
+        duration = self.duration or 1e-9
+
+        return {
+            "requests": len(self.results),
+            "errors": len(self.results) - len(ok),
+            "duration_s": self.duration,
+            "output_tokens": tokens,
+            "throughput_tok_s": tokens / duration,
+            "requests_per_s": len(ok) / duration,
+            "ttft_s": _percentiles([r.ttft for r in ok if r.ttft is not None]),
+            "inter_token_s": _percentiles([t for r in ok for t in r.inter_token]),
+            "latency_s": _percentiles([r.latency for r in ok]),
+        }
+
+
+async def _run_request(node, workload: Workload, prompt: str, max_tokens: int) -> RequestResult:
+    result = RequestResult(prompt_tokens=len(prompt.split()))
+    started = last = time.perf_counter()
+
+    try:
+        async for _ in node.stream_inference(prompt, workload.model, max_tokens=max_tokens):
+            now = time.perf_counter()
+            if result.ttft is None:
+                result.ttft = now - started
+            else:
+                result.inter_token.append(now - last)
+            last = now
+            result.output_tokens += 1
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+
+    result.latency = time.perf_counter() - started
+    return result
+
+
+async def run_workload(node, workload: Workload) -> BenchmarkReport:
+    """
+    Send the workload through ``node`` with at most ``concurrency`` requests
+    in flight (closed loop: a new request starts when one finishes).
+    """
+    pending = list(reversed(workload.generate()))
+    results: List[RequestResult] = []
+
+    async def worker():
+        while pending:
+            prompt, max_tokens = pending.pop()
+            results.append(await _run_request(node, workload, prompt, max_tokens))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, workload.concurrency))))
+    return BenchmarkReport(results, time.perf_counter() - started)
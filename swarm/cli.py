@@ -1,25 +1,42 @@
 """
 Swarm CLI - Command-line interface for distributed AI inference.
+
+Scripts run the CLI often, so only what option parsing needs is imported
+up front; each command imports the node, servers and rich when it runs.
 """
 
 import asyncio
 import click
+import json
 import logging
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.logging import RichHandler
+import signal
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from swarm.node.node import Node, NodeConfig
+from swarm.inference.scheduler import PRIORITIES
+from swarm.utils.choices import BACKEND_NAMES, CODECS, LENGTH_DISTRIBUTIONS
+from swarm.utils.paths import default_control_socket, default_kv_offload_dir, default_peer_cache
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
+    from swarm.node.node import Node
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    handlers=[RichHandler(rich_tracebacks=True, console=console)],
-)
+
+@lru_cache(maxsize=None)
+def _console() -> "Console":
+    from rich.console import Console
+
+    return Console()
+
+
+class _LazyConsole:
+    """rich's Console, created on first use."""
+
+    def __getattr__(self, name: str):
+        return getattr(_console(), name)
+
+
+console = _LazyConsole()
 
 logger = logging.getLogger("swarm")
 
@@ -32,20 +49,115 @@ def main():
 
     Run large language models across multiple devices.
     """
-    pass
+    from rich.logging import RichHandler
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        handlers=[RichHandler(rich_tracebacks=True, console=_console())],
+    )
 
 
 @main.command()
 @click.option("--port", default=5000, help="Port to listen on")
 @click.option("--device-type", help="Device type (auto-detected if not specified)")
 @click.option("--no-discover", is_flag=True, help="Disable auto-discovery")
-def node(port: int, device_type: str, no_discover: bool):
+@click.option(
+    "--compute-mode",
+    type=click.Choice(["thread", "process"]),
+    default="thread",
+    help="Worker pool type for layer execution",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(("auto",) + BACKEND_NAMES),
+    default="auto",
+    help="Engine for layer compute (auto: the fastest installed one, by a startup benchmark)",
+)
+@click.option(
+    "--workers", type=click.IntRange(min=1), help="Compute pool size (auto if not specified)"
+)
+@click.option(
+    "--intra-op-threads",
+    type=click.IntRange(min=1),
+    help="Threads per layer kernel (auto if not specified)",
+)
+@click.option("--socket", "socket_path", help="Control socket path (default: ~/.swarm/node.sock)")
+@click.option("--no-socket", is_flag=True, help="Don't expose a control socket")
+@click.option(
+    "--seed",
+    "seeds",
+    multiple=True,
+    help="host:port of a node to join via gossip (repeatable, for networks without mDNS)",
+)
+@click.option("--advertise-host", help="Address peers should use to reach this node")
+@click.option("--group", default="", help="Rack/site label; pipelines and gossip stay within a group")
+@click.option("--metrics-port", type=int, help="Serve Prometheus metrics at :PORT/metrics")
+@click.option(
+    "--max-memory",
+    type=float,
+    help="Memory budget in GB for weights, KV cache and activations (default: memory available)",
+)
+@click.option(
+    "--kv-offload",
+    is_flag=True,
+    help="Spill cold KV cache blocks to disk so long contexts fit in less memory",
+)
+@click.option("--kv-offload-dir", help="Where to spill KV cache blocks (implies --kv-offload)")
+@click.option(
+    "--activation-codec",
+    type=click.Choice(("auto",) + CODECS),
+    default="auto",
+    help="Compression of hidden states between stages (auto: picked per link from its bandwidth)",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Time the request path; SIGUSR1 captures a 10s CPU profile, SIGUSR2 a memory snapshot",
+)
+def node(
+    port: int,
+    device_type: str,
+    no_discover: bool,
+    compute_mode: str,
+    backend: str,
+    workers: int,
+    intra_op_threads: int,
+    socket_path: str,
+    no_socket: bool,
+    seeds: tuple,
+    advertise_host: str,
+    group: str,
+    metrics_port: int,
+    max_memory: float,
+    kv_offload: bool,
+    kv_offload_dir: str,
+    activation_codec: str,
+    profile: bool,
+):
     """Start an Swarm compute node."""
 
+    from rich.panel import Panel
+    from swarm.node.node import Node, NodeConfig
+
     config = NodeConfig(
         port=port,
         device_type=device_type,
         auto_discover=not no_discover,
+        compute_mode=compute_mode,
+        compute_backend=backend,
+        compute_workers=workers,
+        intra_op_threads=intra_op_threads,
+        control_socket=None if no_socket else (socket_path or default_control_socket()),
+        peer_cache=default_peer_cache(),
+        seeds=list(seeds),
+        advertise_host=advertise_host,
+        group=group,
+        metrics_port=metrics_port,
+        max_memory_gb=max_memory,
+        profile=profile,
+        kv_offload_dir=kv_offload_dir or (default_kv_offload_dir() if kv_offload else None),
+        activation_codec=activation_codec,
     )
 
     node_instance = Node(config)
@@ -59,7 +171,12 @@ def node(port: int, device_type: str, no_discover: bool):
             f"Memory: [magenta]{node_instance.stats.memory_available_gb:.1f}GB[/magenta] / "
             f"{node_instance.stats.memory_total_gb:.1f}GB\n"
             f"Port: [blue]{port}[/blue]\n"
-            f"Auto-discovery: [green]{'ON' if not no_discover else 'OFF'}[/green]",
+            f"Auto-discovery: [green]{'ON' if not no_discover else 'OFF'}[/green]\n"
+            f"Seeds: [cyan]{', '.join(seeds) or 'none'}[/cyan]\n"
+            f"Group: [cyan]{group or 'none'}[/cyan]\n"
+            f"Metrics: [dim]{f':{metrics_port}/metrics' if metrics_port is not None else 'OFF'}[/dim]\n"
+            f"Profiling: [dim]{'ON' if profile else 'OFF'}[/dim]\n"
+            f"Control socket: [dim]{config.control_socket or 'OFF'}[/dim]",
             title="Swarm Node",
         )
     )
@@ -67,6 +184,8 @@ def node(port: int, device_type: str, no_discover: bool):
     async def run():
         try:
             await node_instance.start()
+            if profile:
+                _install_profile_signals(node_instance)
 
             console.print("\n[green]✓[/green] Node started successfully")
             console.print("[dim]Press Ctrl+C to stop[/dim]\n")
@@ -92,42 +211,99 @@ def node(port: int, device_type: str, no_discover: bool):
 @click.argument("prompt")
 @click.option("--model", default="default", help="Model to use")
 @click.option("--node-id", help="Specific node to connect to")
-def infer(prompt: str, model: str, node_id: str):
+@click.option("--socket", "socket_path", help="Control socket of a running node")
+@click.option("--standalone", is_flag=True, help="Don't use a running node, start a temporary one")
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False),
+    help="Write the request timeline here (Chrome trace format)",
+)
+@click.option("--session", "session_id", help="Continue this conversation on a running node")
+@click.option(
+    "--priority",
+    type=click.Choice(list(PRIORITIES)),
+    default="normal",
+    help="Scheduling class; interactive work runs ahead of batch work",
+)
+def infer(
+    prompt: str,
+    model: str,
+    node_id: str,
+    socket_path: str,
+    standalone: bool,
+    trace_path: str,
+    session_id: str,
+    priority: str,
+):
     """Run inference with the given prompt."""
 
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.node.client import NodeClient
+    from swarm.node.node import Node, NodeConfig
+    from swarm.utils.tracing import new_trace_id
+
+    # A temporary node forgets the conversation as soon as it exits
+    if session_id and standalone:
+        raise click.UsageError("--session needs a running node, not --standalone")
+
     console.print(f"\n[cyan]Prompt:[/cyan] {prompt}\n")
 
+    socket_path = socket_path or default_control_socket()
+    trace_id = new_trace_id()
+
     async def run():
-        # Create a client node
-        config = NodeConfig(auto_discover=True)
+        # Prefer a running node: no startup, discovery or teardown cost
+        if not standalone and NodeClient.available(socket_path):
+            try:
+                async with NodeClient(socket_path) as client:
+                    with console.status("[bold cyan]Running inference...", spinner="dots"):
+                        result = await client.infer(prompt, model, trace_id, session_id, priority)
+                    trace = await client.trace(trace_id, chrome=True)
+                _display_result(result)
+                _write_trace(trace_path, trace)
+                return
+            except (ConnectionError, OSError):
+                console.print("[dim]No node on control socket, starting a temporary one[/dim]")
+
+        if session_id:
+            raise click.UsageError(f"--session needs a running node (none on {socket_path})")
+
+        # Create a client node on a free port so it can coexist with `swarm node`
+        config = NodeConfig(port=0, auto_discover=True, peer_cache=default_peer_cache())
         node_instance = Node(config)
 
+        # Decide up front whether the network is needed at all
+        local_only = node_instance.fits_locally(model)
+        if local_only:
+            node_instance.config.auto_discover = False
+
         try:
             await node_instance.start()
 
-            # Wait a bit for peer discovery
-            console.print("[dim]Discovering peers...[/dim]")
-            await asyncio.sleep(2)
-
-            # Show cluster
-            cluster = node_instance.get_cluster_info()
-            console.print(
-                f"[green]✓[/green] Found {cluster['total_nodes']} node(s) "
-                f"with {cluster['total_memory_gb']}GB total memory\n"
-            )
+            if local_only:
+                console.print("[dim]Model fits locally, skipping discovery[/dim]\n")
+            else:
+                # Stop waiting as soon as the cluster can hold the model
+                console.print("[dim]Discovering peers...[/dim]")
+                model_spec = InferenceCoordinator.get_model_spec(model)
+                await node_instance.wait_for_capacity(model_spec.memory_gb, timeout=2)
+
+                # Show cluster
+                cluster = node_instance.get_cluster_info()
+                console.print(
+                    f"[green]✓[/green] Found {cluster['total_nodes']} node(s) "
+                    f"with {cluster['total_memory_gb']}GB total memory\n"
+                )
 
             # Run inference
             with console.status("[bold cyan]Running inference...", spinner="dots"):
-                result = await node_instance.run_inference(prompt, model)
-
-            # Display result
-            console.print(
-                Panel(
-                    result,
-                    title="[green]Result[/green]",
-                    border_style="green",
+                result = await node_instance.run_inference(
+                    prompt, model, trace_id, priority=priority
                 )
-            )
+
+            _display_result(result)
+            _write_trace(trace_path, node_instance.get_trace(trace_id, chrome=True))
 
         finally:
             await node_instance.stop()
@@ -135,20 +311,133 @@ def infer(prompt: str, model: str, node_id: str):
     asyncio.run(run())
 
 
+@main.command()
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-o", "--output", "output_path", required=True, type=click.Path(dir_okay=False),
+    help="JSONL file results are appended to (rerun with the same file to resume)",
+)
+@click.option("--model", default="default", help="Model for prompts that don't name one")
+@click.option("--max-tokens", type=int, help="Tokens to generate for prompts that don't say")
+@click.option("--concurrency", type=int, help="Prompts in flight (default: two per node in the cluster)")
+@click.option("--retries", default=3, help="Attempts per prompt before recording an error")
+@click.option("--socket", "socket_path", help="Control socket of a running node")
+@click.option("--standalone", is_flag=True, help="Don't use a running node, start a temporary one")
+def batch(
+    input_path: str,
+    output_path: str,
+    model: str,
+    max_tokens: int,
+    concurrency: int,
+    retries: int,
+    socket_path: str,
+    standalone: bool,
+):
+    """Run every prompt of a JSONL file, writing results as they finish."""
+
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.node.client import NodeClient
+    from swarm.node.node import Node, NodeConfig
+    from swarm.serving.batch import BatchItem, BatchReport, run_batch
+
+    logging.getLogger("swarm").setLevel(logging.WARNING)
+    socket_path = socket_path or default_control_socket()
+
+    def progress(report: BatchReport):
+        status.update(
+            f"[bold cyan]{report.completed} done, {report.failed} failed, "
+            f"{report.skipped} skipped..."
+        )
+
+    async def run_with(infer, nodes: int) -> BatchReport:
+        # Two sequences per stage: one computing, the next one queued
+        in_flight = concurrency or 2 * nodes
+        console.print(f"[dim]{nodes} node(s), {in_flight} prompt(s) in flight[/dim]")
+        return await run_batch(infer, input_path, output_path, in_flight, retries, progress)
+
+    async def run() -> BatchReport:
+        if not standalone and NodeClient.available(socket_path):
+            try:
+                async with NodeClient(socket_path) as client:
+                    nodes = (await client.cluster_info())["total_nodes"]
+            except (ConnectionError, OSError):
+                console.print("[dim]No node on control socket, starting a temporary one[/dim]")
+            else:
+                # Calls on one client are serialised, so each request gets its own
+                clients: asyncio.Queue = asyncio.Queue()
+
+                async def infer(item: BatchItem) -> str:
+                    client = clients.get_nowait() if not clients.empty() else NodeClient(socket_path)
+                    try:
+                        return await client.infer(
+                            item.prompt,
+                            item.model or model,
+                            priority="batch",
+                            max_tokens=item.max_tokens or max_tokens,
+                        )
+                    finally:
+                        clients.put_nowait(client)
+
+                try:
+                    return await run_with(infer, nodes)
+                finally:
+                    while not clients.empty():
+                        await clients.get_nowait().close()
+
+        node_instance = Node(NodeConfig(port=0, auto_discover=True, peer_cache=default_peer_cache()))
+        try:
+            await node_instance.start()
+            model_spec = InferenceCoordinator.get_model_spec(model)
+            await node_instance.wait_for_capacity(model_spec.memory_gb, timeout=2)
+
+            async def infer(item: BatchItem) -> str:
+                return await node_instance.run_inference(
+                    item.prompt,
+                    item.model or model,
+                    max_tokens=item.max_tokens or max_tokens,
+                    priority="batch",
+                )
+
+            return await run_with(infer, node_instance.get_cluster_info()["total_nodes"])
+        finally:
+            await node_instance.stop()
+
+    with console.status("[bold cyan]Running batch...", spinner="dots") as status:
+        report = asyncio.run(run())
+
+    summary = report.summary()
+    console.print(
+        f"[green]✓[/green] {summary['completed']} completed, {summary['failed']} failed, "
+        f"{summary['skipped']} already done, in {summary['duration_s']:.1f}s "
+        f"({summary['throughput_tok_s']:.1f} tok/s)"
+    )
+    console.print(f"[dim]Results in {output_path}[/dim]")
+
+
 @main.command()
 @click.option("--timeout", default=5, help="Discovery timeout in seconds")
 def discover(timeout: int):
     """Discover available Swarm nodes on the network."""
 
+    from rich.table import Table
+    from swarm.node.node import Node, NodeConfig
+
     console.print(f"[cyan]Discovering nodes for {timeout} seconds...[/cyan]\n")
 
     async def run():
-        config = NodeConfig(auto_discover=True)
+        config = NodeConfig(port=0, auto_discover=True, peer_cache=default_peer_cache())
         node_instance = Node(config)
 
         try:
             await node_instance.start()
-            await asyncio.sleep(timeout)
+
+            # Done once every previously-known peer has answered; with no
+            # cache, listen for the full timeout
+            expected = node_instance.discovery.expected_peers
+            if expected:
+                await node_instance.wait_for_peers(expected, timeout)
+            else:
+                await asyncio.sleep(timeout)
 
             cluster = node_instance.get_cluster_info()
 
@@ -188,10 +477,224 @@ def discover(timeout: int):
     asyncio.run(run())
 
 
+@main.command()
+@click.option("--host", default="127.0.0.1", help="Address for the HTTP API")
+@click.option("--http-port", default=8000, help="Port for the HTTP API")
+@click.option("--port", default=5000, help="Node port")
+@click.option("--no-discover", is_flag=True, help="Disable auto-discovery")
+@click.option("--max-concurrency", default=4, help="Requests run at once")
+@click.option("--max-queue", default=32, help="Requests allowed to wait before returning 429")
+@click.option("--timeout", default=60.0, help="Default per-request deadline in seconds")
+@click.option(
+    "--socket",
+    "--control-socket",
+    "socket_path",
+    help="Control socket path (default: ~/.swarm/node.sock)",
+)
+@click.option("--no-socket", is_flag=True, help="Don't expose a control socket")
+def serve(
+    host: str,
+    http_port: int,
+    port: int,
+    no_discover: bool,
+    max_concurrency: int,
+    max_queue: int,
+    timeout: float,
+    socket_path: str,
+    no_socket: bool,
+):
+    """Serve an OpenAI-compatible HTTP API backed by a node."""
+
+    from swarm.node.node import Node, NodeConfig
+    from swarm.serving.openai import OpenAIServer
+
+    config = NodeConfig(
+        port=port,
+        auto_discover=not no_discover,
+        control_socket=None if no_socket else (socket_path or default_control_socket()),
+        peer_cache=default_peer_cache(),
+    )
+
+    async def run():
+        # Built inside the loop that serves them
+        node_instance = Node(config)
+        server = OpenAIServer(
+            node_instance,
+            host=host,
+            port=http_port,
+            max_concurrency=max_concurrency,
+            max_queue=max_queue,
+            request_timeout=timeout,
+        )
+        try:
+            await node_instance.start()
+            await server.start()
+
+            console.print(
+                f"\n[green]✓[/green] Serving on [cyan]http://{host}:{server.port}/v1[/cyan] "
+                f"(concurrency {max_concurrency}, queue {max_queue})"
+            )
+            console.print("[dim]Press Ctrl+C to stop[/dim]\n")
+
+            while node_instance.running:
+                await asyncio.sleep(1)
+
+        except KeyboardInterrupt:
+            console.print("\n[yellow]Shutting down...[/yellow]")
+        finally:
+            await server.stop()
+            await node_instance.stop()
+
+    asyncio.run(run())
+
+
+@main.command()
+@click.option("--nodes", default=4, help="Worker nodes in the simulated cluster")
+@click.option("--stages", default=2, help="Nodes needed to hold one copy of the model")
+@click.option("--processes", is_flag=True, help="Run each node in its own process")
+@click.option("--model", default="default", help="Model to benchmark")
+@click.option("--requests", "num_requests", default=32, help="Requests to send")
+@click.option("--concurrency", default=4, help="Requests in flight at once")
+@click.option("--prompt-tokens", default=32, help="Mean prompt length")
+@click.option("--output-tokens", default=32, help="Mean output length")
+@click.option(
+    "--length-dist",
+    type=click.Choice(LENGTH_DISTRIBUTIONS),
+    default="fixed",
+    help="How prompt and output lengths vary around their means",
+)
+@click.option("--layer-ms", default=1.0, help="Simulated compute per layer per pass (ms)")
+@click.option("--token-ms", default=0.05, help="Simulated compute per layer per token (ms)")
+@click.option("--link-latency-ms", default=2.0, help="Simulated one-way link latency (ms)")
+@click.option("--bandwidth-mbps", default=100.0, help="Simulated link bandwidth (0 = unlimited)")
+@click.option("--jitter-ms", default=0.0, help="Extra random link delay, up to this much (ms)")
+@click.option("--drop-rate", default=0.0, help="Fraction of messages each link loses")
+@click.option("--seed", default=0, help="Seed for the generated workload")
+@click.option("--json", "json_path", type=click.Path(dir_okay=False), help="Also write the report here")
+def bench(
+    nodes: int,
+    stages: int,
+    processes: bool,
+    model: str,
+    num_requests: int,
+    concurrency: int,
+    prompt_tokens: int,
+    output_tokens: int,
+    length_dist: str,
+    layer_ms: float,
+    token_ms: float,
+    link_latency_ms: float,
+    bandwidth_mbps: float,
+    jitter_ms: float,
+    drop_rate: float,
+    seed: int,
+    json_path: str,
+):
+    """Benchmark a simulated cluster: TTFT, inter-token latency, throughput."""
+
+    from swarm.bench import SimulatedCluster, Workload, run_workload
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.inference.simulation import SimulationProfile
+    from swarm.protocol.memory import LinkProfile
+
+    logging.getLogger("swarm").setLevel(logging.WARNING)
+
+    # Size nodes so that exactly `stages` of them hold one copy of the model
+    model_spec = InferenceCoordinator.get_model_spec(model)
+    memory_gb = model_spec.memory_gb / stages * 1.05
+
+    simulation = SimulationProfile(
+        layer_ms=layer_ms,
+        token_ms=token_ms,
+        link_latency_ms=link_latency_ms,
+        link_bandwidth_mbps=bandwidth_mbps,
+    )
+    workload = Workload(
+        requests=num_requests,
+        concurrency=concurrency,
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        distribution=length_dist,
+        model=model,
+        seed=seed,
+    )
+
+    async def run():
+        link = LinkProfile(
+            latency_ms=link_latency_ms,
+            jitter_ms=jitter_ms,
+            bandwidth_mbps=bandwidth_mbps,
+            drop_rate=drop_rate,
+        )
+        cluster = SimulatedCluster(
+            nodes, memory_gb, simulation, processes=processes, link=link, seed=seed
+        )
+        with console.status(f"[bold cyan]Starting {nodes} nodes...", spinner="dots"):
+            await cluster.start()
+        try:
+            pipelines = cluster.frontend.coordinator.plan(
+                model, list(cluster.frontend.peers.values())
+            )
+            console.print(
+                f"[green]✓[/green] {nodes} nodes, {len(pipelines)} pipeline(s) "
+                f"of {', '.join(str(len(p)) for p in pipelines)} stage(s)\n"
+            )
+            with console.status("[bold cyan]Running workload...", spinner="dots"):
+                report = await run_workload(cluster.frontend, workload)
+        finally:
+            await cluster.stop()
+
+        summary = report.summary()
+        _display_bench(summary)
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(summary, f, indent=2)
+            console.print(f"[dim]Report written to {json_path}[/dim]")
+
+    asyncio.run(run())
+
+
+@main.command()
+@click.option("--socket", "socket_path", help="Control socket of a running node")
+@click.option("--cpu", type=float, help="Capture a cProfile of the event loop for this many seconds")
+@click.option("--memory", is_flag=True, help="Capture a tracemalloc snapshot")
+@click.option("--reset", is_flag=True, help="Clear the section timers after reading them")
+def profile(socket_path: str, cpu: float, memory: bool, reset: bool):
+    """Read profiling data from a running node (start it with --profile)."""
+
+    from swarm.node.client import NodeClient
+
+    async def run():
+        async with NodeClient(socket_path) as client:
+            if cpu:
+                with console.status(f"[bold cyan]Profiling for {cpu:g}s...", spinner="dots"):
+                    result = await client.profile("cpu", duration=cpu)
+                console.print(result["summary"])
+                console.print(f"[dim]Full profile: {result['path']}[/dim]")
+            elif memory:
+                result = await client.profile("memory")
+                console.print(
+                    f"Traced memory: {result['current_bytes'] / 1024**2:.1f}MB "
+                    f"(peak {result['peak_bytes'] / 1024**2:.1f}MB)\n"
+                )
+                for line in result["top"]:
+                    console.print(f"  {line}")
+                console.print(f"\n[dim]Snapshot: {result['path']}[/dim]")
+            else:
+                _display_profile(await client.profile("timers", reset=reset))
+
+    try:
+        asyncio.run(run())
+    except (ConnectionError, OSError):
+        console.print("[red]No node running on the control socket[/red]")
+
+
 @main.command()
 def status():
     """Show Swarm system status."""
 
+    from rich.panel import Panel
+
     console.print(
         Panel.fit(
             "[bold green]⚡ Swarm - Distributed AI Inference[/bold green]\n\n"
@@ -205,12 +708,106 @@ def status():
     )
 
 
-def _display_cluster_status(node: Node):
+def _display_result(result: str):
+    """Display an inference result."""
+    from rich.panel import Panel
+
+    console.print(
+        Panel(
+            result,
+            title="[green]Result[/green]",
+            border_style="green",
+        )
+    )
+
+
+def _display_bench(summary: dict):
+    """Display a benchmark summary."""
+    from rich.table import Table
+
+    table = Table(title="Benchmark")
+    table.add_column("Metric", style="cyan")
+    table.add_column("p50", justify="right")
+    table.add_column("p90", justify="right")
+    table.add_column("p99", justify="right")
+
+    for name, key in [("TTFT", "ttft_s"), ("Inter-token", "inter_token_s"), ("Latency", "latency_s")]:
+        values = summary[key]
+        table.add_row(name, *(f"{values[p] * 1000:.1f}ms" for p in ("p50", "p90", "p99")))
+
+    console.print(table)
+    console.print(
+        f"\n{summary['requests']} requests ({summary['errors']} failed) in "
+        f"{summary['duration_s']:.2f}s: "
+        f"[green]{summary['throughput_tok_s']:.1f} tok/s[/green], "
+        f"{summary['requests_per_s']:.2f} req/s"
+    )
+
+
+def _install_profile_signals(node: "Node"):
+    """SIGUSR1 captures a CPU profile, SIGUSR2 a memory snapshot."""
+    loop = asyncio.get_running_loop()
+
+    def cpu():
+        async def capture():
+            try:
+                await node.profiler.capture_cpu(10.0)
+            except RuntimeError as e:
+                logger.warning(str(e))
+
+        asyncio.ensure_future(capture())
+
+    try:
+        loop.add_signal_handler(signal.SIGUSR1, cpu)
+        loop.add_signal_handler(signal.SIGUSR2, node.profiler.capture_memory)
+    except (AttributeError, NotImplementedError):
+        # No SIGUSR1/2 (Windows); `swarm profile` still works
+        pass
+
+
+def _display_profile(result: dict):
+    """Display section timings from a node."""
+    from rich.table import Table
+
+    if not result["enabled"]:
+        console.print("[yellow]Profiling is off; start the node with --profile[/yellow]")
+        return
+
+    table = Table(title="Request Path Timings")
+    table.add_column("Section", style="cyan")
+    table.add_column("Count", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("Max", justify="right")
+
+    for name, stats in result["sections"].items():
+        table.add_row(
+            name,
+            str(stats["count"]),
+            f"{stats['total_s']:.3f}s",
+            f"{stats['mean_ms']:.2f}ms",
+            f"{stats['max_ms']:.2f}ms",
+        )
+
+    console.print(table)
+
+
+def _write_trace(path: str, trace: dict):
+    """Save a request timeline if one was asked for."""
+    if not path or trace is None:
+        return
+    with open(path, "w") as f:
+        json.dump(trace, f)
+    console.print(f"[dim]Trace written to {path} (open in chrome://tracing or Perfetto)[/dim]")
+
+
+def _display_cluster_status(node: "Node"):
     """Display current cluster status."""
     cluster = node.get_cluster_info()
 
     console.print(f"\n[cyan]Cluster Status:[/cyan]")
     console.print(f"  Nodes: {cluster['total_nodes']}")
+    console.print(f"  Compute backend: {cluster['backend']}")
     console.print(f"  Total Memory: {cluster['total_memory_gb']}GB")
 
     if cluster["peers"]:
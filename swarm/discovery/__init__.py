@@ -1,5 +1,15 @@
 """Discovery module."""
 
 from swarm.discovery.service import DiscoveryService, PeerInfo
+from swarm.discovery.cache import PeerCache
+from swarm.discovery.gossip import GossipService
+from swarm.discovery.topology import ClusterTopology, GroupSummary
 
-__all__ = ["DiscoveryService", "PeerInfo"]
+__all__ = [
+    "DiscoveryService",
+    "PeerInfo",
+    "PeerCache",
+    "GossipService",
+    "ClusterTopology",
+    "GroupSummary",
+]
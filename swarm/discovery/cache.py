@@ -0,0 +1,71 @@
+"""
+On-disk cache of discovered peers.
+
+Lets a restarting node begin with its last-known peers instead of an
+empty table while mDNS catches up.
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict
+from typing import Iterable, List
+
+from swarm.discovery.service import PeerInfo
+
+logger = logging.getLogger(__name__)
+
+
+class PeerCache:
+    """
+    JSON file of peers with a time-to-live.
+
+    Entries older than ``ttl`` seconds (by ``PeerInfo.last_seen``) are
+    dropped on load.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, ttl: float = 300.0):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self) -> List[PeerInfo]:
+        """Load peers that are still within their TTL."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable peer cache {self.path}: {e}")
+            return []
+
+        if data.get("version") != self.VERSION:
+            return []
+
+        cutoff = time.time() - self.ttl
+        peers = []
+        for entry in data.get("peers", []):
+            try:
+                peer = PeerInfo(**entry)
+            except TypeError:
+                continue
+            if peer.last_seen >= cutoff:
+                peers.append(peer)
+
+        return peers
+
+    def save(self, peers: Iterable[PeerInfo]):
+        """Write peers to disk, replacing the previous cache atomically."""
+        data = {"version": self.VERSION, "peers": [asdict(peer) for peer in peers]}
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write peer cache {self.path}: {e}")
@@ -0,0 +1,278 @@
+"""
+Seed-list bootstrap and gossip membership.
+
+For networks where mDNS can't reach (across subnets, inside containers),
+nodes start from a list of seed addresses and then exchange membership
+tables with a few random peers every round over the node port. Each
+round roughly doubles the number of nodes that know about a change, so
+membership converges in O(log N) rounds.
+
+With groups, nodes gossip only inside their group and track other groups
+through their leaders, who gossip with each other.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import time
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from swarm.discovery.service import PeerInfo
+from swarm.discovery.topology import ClusterTopology
+from swarm.protocol.rpc import RPCError, RPCServer
+from swarm.protocol.transport import TCPTransport, Transport
+from swarm.utils.net import parse_address
+
+logger = logging.getLogger(__name__)
+
+
+class GossipService:
+    """
+    Push-pull gossip over the node RPC port.
+
+    Every member carries a heartbeat counter that only its owner
+    increments. Receivers keep whichever entry has the higher heartbeat,
+    and a member whose heartbeat stops advancing for ``fail_timeout``
+    seconds (five gossip intervals by default) is considered dead.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        host: str,
+        port: int,
+        rpc_server: RPCServer,
+        device_type: str = "unknown",
+        memory_gb: float = 0.0,
+        seeds: Optional[List[str]] = None,
+        hints: Optional[List[str]] = None,
+        interval: float = 1.0,
+        fanout: int = 3,
+        fail_timeout: Optional[float] = None,
+        on_peer_added: Optional[Callable[[PeerInfo], None]] = None,
+        on_peer_removed: Optional[Callable[[str], None]] = None,
+        on_peer_updated: Optional[Callable[[PeerInfo], None]] = None,
+        group: str = "",
+        transport: Optional[Transport] = None,
+    ):
+        self.node_id = node_id
+        self.transport = transport or TCPTransport()
+        self.topology = ClusterTopology(node_id, group, memory_gb)
+        self.seeds: List[Tuple[str, int]] = [parse_address(seed, port) for seed in seeds or []]
+        # Addresses worth one try in the first round (last-known peers),
+        # unlike seeds, which are revisited for good
+        self._hints: List[Tuple[str, int]] = [parse_address(hint, port) for hint in hints or []]
+        self.interval = interval
+        self.fanout = fanout
+        self.fail_timeout = fail_timeout or 5 * interval
+        self.on_peer_added = on_peer_added
+        self.on_peer_removed = on_peer_removed
+        self.on_peer_updated = on_peer_updated
+
+        self.self_info = PeerInfo(
+            node_id=node_id,
+            hostname=socket.gethostname(),
+            ip_address=host,
+            port=port,
+            device_type=device_type,
+            memory_gb=memory_gb,
+            capabilities={},
+            group=group,
+        )
+        self._heartbeat = 0
+
+        # node_id -> (peer, heartbeat, local time the heartbeat last advanced)
+        self.members: Dict[str, Tuple[PeerInfo, int, float]] = {}
+        # node_id -> heartbeat at which it was declared dead
+        self._dead: Dict[str, int] = {}
+
+        self._task: Optional[asyncio.Task] = None
+        self._round = 0
+
+        rpc_server.register("gossip", self._handle_gossip)
+
+    async def start(self):
+        """Start gossiping."""
+        self._task = asyncio.create_task(self._gossip_loop())
+        if self.seeds:
+            logger.info(f"Gossip started with {len(self.seeds)} seed(s)")
+
+    async def stop(self):
+        """Stop gossiping."""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def get_peers(self) -> Dict[str, PeerInfo]:
+        """Get all live members except ourselves."""
+        return {node_id: peer for node_id, (peer, _, _) in self.members.items()}
+
+    async def update_load(
+        self,
+        memory_available_gb: float,
+        queue_depth: int,
+        tokens_per_sec: float,
+        models: List[str],
+        memory_headroom_gb: Optional[float] = None,
+    ):
+        """Update the load carried in our own membership entry."""
+        self.self_info.memory_available_gb = memory_available_gb
+        self.self_info.queue_depth = queue_depth
+        self.self_info.tokens_per_sec = tokens_per_sec
+        self.self_info.models = sorted(models)
+        self.self_info.memory_headroom_gb = memory_headroom_gb
+
+    async def _gossip_loop(self):
+        while True:
+            self._heartbeat += 1
+            self._round += 1
+            self._expire_members()
+            self._refresh_leadership()
+
+            targets = self._pick_targets()
+            if targets:
+                await asyncio.gather(
+                    *(self._exchange(host, port) for host, port in targets),
+                    return_exceptions=True,
+                )
+
+            await asyncio.sleep(self.interval)
+
+    def _pick_targets(self) -> List[Tuple[str, int]]:
+        """Choose this round's gossip partners."""
+        peers = [peer for peer, _, _ in self.members.values()]
+        group = [(p.ip_address, p.port) for p in self.topology.group_peers(peers)]
+        targets = random.sample(group, min(self.fanout, len(group)))
+
+        # Only leaders talk across groups, one foreign leader per round
+        others = [(p.ip_address, p.port) for p in self.topology.other_peers(peers)]
+        if others and self.topology.is_leader(peers):
+            targets.append(random.choice(others))
+
+        members = group + others
+
+        # Fall back to seeds until we know someone, and revisit one now and
+        # then so partitioned clusters heal
+        if self.seeds and (not members or self._round % 10 == 0):
+            targets.append(random.choice(self.seeds))
+
+        targets += [hint for hint in self._hints if hint not in targets]
+        self._hints = []
+
+        return targets
+
+    async def _exchange(self, host: str, port: int):
+        """Push our table to a peer and merge the table it sends back."""
+        try:
+            reply = await self.transport.call(
+                host,
+                port,
+                "gossip",
+                {"members": self._digest()},
+                timeout=self.interval * 2,
+            )
+        except (OSError, RPCError, asyncio.TimeoutError) as e:
+            logger.debug(f"Gossip with {host}:{port} failed: {e}")
+            return
+
+        self._merge(reply.get("members", []))
+
+    async def _handle_gossip(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._merge(params.get("members", []))
+        return {"members": self._digest()}
+
+    def _digest(self) -> List[Dict[str, Any]]:
+        """Our membership table, including ourselves, in wire form."""
+        entries = [{"peer": asdict(self.self_info), "heartbeat": self._heartbeat}]
+        entries += [
+            {"peer": asdict(peer), "heartbeat": heartbeat}
+            for peer, heartbeat, _ in self.members.values()
+        ]
+        return entries
+
+    def _merge(self, entries: List[Dict[str, Any]]):
+        """Merge a received table, keeping the freshest entry per member."""
+        now = time.monotonic()
+
+        for entry in entries:
+            try:
+                peer = PeerInfo(**entry["peer"])
+                heartbeat = int(entry["heartbeat"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            if peer.node_id == self.node_id:
+                continue
+            if heartbeat <= self._dead.get(peer.node_id, -1):
+                continue
+
+            # Outside our group we only track each group's leader
+            if peer.group != self.topology.group and not self._accept_foreign(peer):
+                if peer.node_id in self.members:
+                    self._remove_member(peer.node_id)
+                continue
+
+            peer.last_seen = time.time()
+            known = self.members.get(peer.node_id)
+
+            if known is None:
+                self._dead.pop(peer.node_id, None)
+                self.members[peer.node_id] = (peer, heartbeat, now)
+                logger.info(f"Gossip: discovered {peer.node_id} at {peer.ip_address}:{peer.port}")
+                if self.on_peer_added:
+                    self.on_peer_added(peer)
+            elif heartbeat > known[1]:
+                self.members[peer.node_id] = (peer, heartbeat, now)
+                if self.on_peer_updated:
+                    self.on_peer_updated(peer)
+
+    def _expire_members(self):
+        """Drop members whose heartbeat stopped advancing."""
+        cutoff = time.monotonic() - self.fail_timeout
+
+        for node_id, (_, heartbeat, updated_at) in list(self.members.items()):
+            if updated_at < cutoff:
+                self._dead[node_id] = heartbeat
+                logger.info(f"Gossip: {node_id} stopped responding")
+                self._remove_member(node_id)
+
+    def _accept_foreign(self, peer: PeerInfo) -> bool:
+        """
+        Whether to track a member of another group.
+
+        Nodes that have just joined briefly believe they lead their group,
+        so only the lowest-id claimant per group is kept.
+        """
+        if not peer.capabilities.get("leader"):
+            return False
+
+        for node_id, (known, _, _) in list(self.members.items()):
+            if known.group != peer.group or node_id == peer.node_id:
+                continue
+            if node_id < peer.node_id:
+                return False
+            self._remove_member(node_id)
+
+        return True
+
+    def _remove_member(self, node_id: str):
+        del self.members[node_id]
+        if self.on_peer_removed:
+            self.on_peer_removed(node_id)
+
+    def _refresh_leadership(self):
+        """Advertise whether we lead our group, and the group's totals if so."""
+        peers = [peer for peer, _, _ in self.members.values()]
+
+        if not self.topology.is_leader(peers):
+            self.self_info.capabilities = {}
+            return
+
+        summary = self.topology.summarize(peers)[self.topology.group]
+        self.self_info.capabilities = {
+            "leader": True,
+            "group_nodes": summary.nodes,
+            "group_memory_gb": round(summary.memory_gb, 2),
+        }
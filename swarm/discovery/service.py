@@ -6,12 +6,15 @@ Automatically discovers other Swarm nodes on the local network.
 
 import asyncio
 import socket
-from typing import Callable, Dict, Optional, Set
-from dataclasses import dataclass
+import time
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field
 from zeroconf import ServiceBrowser, ServiceInfo, Zeroconf, ServiceStateChange
-from zeroconf.asyncio import AsyncZeroconf, AsyncServiceBrowser
+from zeroconf.asyncio import AsyncZeroconf, AsyncServiceBrowser, AsyncServiceInfo
 import logging
 
+from swarm.utils.net import get_local_ip
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +29,17 @@ class PeerInfo:
     device_type: str
     memory_gb: float
     capabilities: Dict[str, any]
+    last_seen: float = 0.0
+    
+    # Live load, republished periodically by the peer
+    memory_available_gb: float = 0.0
+    queue_depth: int = 0
+    tokens_per_sec: float = 0.0
+    models: List[str] = field(default_factory=list)
+    memory_headroom_gb: Optional[float] = None  # None until the peer reports it
+    
+    # Rack/site label for hierarchical topologies ("" = ungrouped)
+    group: str = ""
     
 
 class DiscoveryService:
@@ -37,6 +51,12 @@ class DiscoveryService:
     
     SERVICE_TYPE = "_swarm._tcp.local."
     
+    # How long to wait for a peer to answer a service info request
+    SERVICE_INFO_TIMEOUT_MS = 3000
+    
+    # Cached peers not seen over mDNS within this many seconds are dropped
+    CACHE_CONFIRM_GRACE = 10.0
+    
     def __init__(
         self,
         node_id: str,
@@ -45,39 +65,50 @@ class DiscoveryService:
         memory_gb: float = 0.0,
         on_peer_added: Optional[Callable[[PeerInfo], None]] = None,
         on_peer_removed: Optional[Callable[[str], None]] = None,
+        cache_path: Optional[str] = None,
+        cache_ttl: float = 300.0,
+        on_peer_updated: Optional[Callable[[PeerInfo], None]] = None,
+        group: str = "",
     ):
         self.node_id = node_id
+        self.group = group
         self.port = port
         self.device_type = device_type
         self.memory_gb = memory_gb
         self.on_peer_added = on_peer_added
         self.on_peer_removed = on_peer_removed
+        self.on_peer_updated = on_peer_updated
         
         self.peers: Dict[str, PeerInfo] = {}
+        self._load: Dict[str, str] = {}
+        self._local_ip: Optional[str] = None
         self._zeroconf: Optional[AsyncZeroconf] = None
         self._service_info: Optional[ServiceInfo] = None
         self._browser: Optional[AsyncServiceBrowser] = None
         
+        # Warm cache: peers loaded from disk wait here, unused for planning,
+        # until mDNS or gossip confirms them
+        self._cache = None
+        if cache_path:
+            from swarm.discovery.cache import PeerCache
+            self._cache = PeerCache(cache_path, ttl=cache_ttl)
+        self.cached: Dict[str, PeerInfo] = {}
+        self._expire_task: Optional[asyncio.Task] = None
+        self.expected_peers = 0
+        self._changed_event: Optional[asyncio.Event] = None
+        
     async def start(self):
         """Start the discovery service."""
         logger.info(f"Starting discovery service for node {self.node_id}")
         
+        self._load_cache()
+        
         # Get local IP
         local_ip = self._get_local_ip()
+        self._local_ip = local_ip
         
         # Create service info
-        self._service_info = ServiceInfo(
-            self.SERVICE_TYPE,
-            f"{self.node_id}.{self.SERVICE_TYPE}",
-            addresses=[socket.inet_aton(local_ip)],
-            port=self.port,
-            properties={
-                "node_id": self.node_id,
-                "device_type": self.device_type,
-                "memory_gb": str(self.memory_gb),
-            },
-            server=f"{self.node_id}.local.",
-        )
+        self._service_info = self._build_service_info()
         
         # Start Zeroconf
         self._zeroconf = AsyncZeroconf()
@@ -96,6 +127,9 @@ class DiscoveryService:
         """Stop the discovery service."""
         logger.info("Stopping discovery service")
         
+        if self._expire_task:
+            self._expire_task.cancel()
+        
         if self._browser:
             await self._browser.async_cancel()
         
@@ -105,6 +139,53 @@ class DiscoveryService:
         
         logger.info("Discovery service stopped")
         
+    async def update_load(
+        self,
+        memory_available_gb: float,
+        queue_depth: int,
+        tokens_per_sec: float,
+        models: List[str],
+        memory_headroom_gb: Optional[float] = None,
+    ):
+        """
+        Republish this node's live load in its TXT record.
+        
+        Skipped when nothing changed, so idle nodes don't generate
+        multicast traffic.
+        """
+        load = {
+            "mem_avail_gb": f"{memory_available_gb:.2f}",
+            "queue_depth": str(queue_depth),
+            "tok_s": f"{tokens_per_sec:.1f}",
+            "models": ",".join(sorted(models)),
+        }
+        if memory_headroom_gb is not None:
+            load["mem_headroom_gb"] = f"{memory_headroom_gb:.2f}"
+        if load == self._load:
+            return
+        
+        self._load = load
+        if self._zeroconf and self._service_info:
+            self._service_info = self._build_service_info()
+            await self._zeroconf.async_update_service(self._service_info)
+        
+    def _build_service_info(self) -> ServiceInfo:
+        """Build the service record announced over mDNS."""
+        return ServiceInfo(
+            self.SERVICE_TYPE,
+            f"{self.node_id}.{self.SERVICE_TYPE}",
+            addresses=[socket.inet_aton(self._local_ip)],
+            port=self.port,
+            properties={
+                "node_id": self.node_id,
+                "device_type": self.device_type,
+                "memory_gb": str(self.memory_gb),
+                "group": self.group,
+                **self._load,
+            },
+            server=f"{self.node_id}.local.",
+        )
+        
     def _on_service_state_change(
         self,
         zeroconf: Zeroconf,
@@ -115,50 +196,102 @@ class DiscoveryService:
         """Handle service state changes."""
         if state_change is ServiceStateChange.Added:
             asyncio.create_task(self._on_service_added(zeroconf, service_type, name))
+        elif state_change is ServiceStateChange.Updated:
+            asyncio.create_task(self._on_service_updated(zeroconf, service_type, name))
         elif state_change is ServiceStateChange.Removed:
             self._on_service_removed(name)
             
     async def _on_service_added(self, zeroconf: Zeroconf, service_type: str, name: str):
         """Handle new service discovery."""
-        info = await asyncio.get_event_loop().run_in_executor(
-            None, zeroconf.get_service_info, service_type, name
-        )
+        peer = await self._fetch_peer(zeroconf, service_type, name)
+        if peer is None:
+            return
         
-        if not info or not info.properties:
+        # Skip if already known
+        if peer.node_id in self.peers:
             return
         
-        # Extract node info
-        node_id = info.properties.get(b"node_id", b"unknown").decode()
+        self._add_peer(peer)
         
-        # Don't add ourselves
-        if node_id == self.node_id:
+    async def _on_service_updated(self, zeroconf: Zeroconf, service_type: str, name: str):
+        """Handle a peer republishing its TXT record."""
+        peer = await self._fetch_peer(zeroconf, service_type, name)
+        if peer is None:
             return
         
-        # Skip if already known
-        if node_id in self.peers:
+        # An update can arrive before (or instead of) the add
+        if peer.node_id not in self.peers:
+            self._add_peer(peer)
             return
         
-        device_type = info.properties.get(b"device_type", b"unknown").decode()
-        memory_gb = float(info.properties.get(b"memory_gb", b"0").decode())
+        self.peers[peer.node_id] = peer
+        
+        if self.on_peer_updated:
+            self.on_peer_updated(peer)
+        
+        self._peers_changed(persist=False)
+        
+    async def _fetch_peer(
+        self,
+        zeroconf: Zeroconf,
+        service_type: str,
+        name: str,
+    ) -> Optional[PeerInfo]:
+        """Resolve a service into a PeerInfo, or None if it isn't a usable peer."""
+        info = AsyncServiceInfo(service_type, name)
+        if not await info.async_request(zeroconf, self.SERVICE_INFO_TIMEOUT_MS):
+            return None
+        
+        if not info.properties:
+            return None
+        
+        def prop(key: str, default: str) -> str:
+            value = info.properties.get(key.encode())
+            return value.decode() if value is not None else default
+        
+        # Extract node info
+        node_id = prop("node_id", "unknown")
+        
+        # Don't add ourselves
+        if node_id == self.node_id:
+            return None
         
         # Get IP address
         ip_address = socket.inet_ntoa(info.addresses[0]) if info.addresses else "unknown"
         
-        peer = PeerInfo(
-            node_id=node_id,
-            hostname=info.server.rstrip("."),
-            ip_address=ip_address,
-            port=info.port,
-            device_type=device_type,
-            memory_gb=memory_gb,
-            capabilities={},
-        )
+        try:
+            return PeerInfo(
+                node_id=node_id,
+                hostname=info.server.rstrip("."),
+                ip_address=ip_address,
+                port=info.port,
+                device_type=prop("device_type", "unknown"),
+                memory_gb=float(prop("memory_gb", "0")),
+                capabilities={},
+                last_seen=time.time(),
+                memory_available_gb=float(prop("mem_avail_gb", "0")),
+                queue_depth=int(prop("queue_depth", "0")),
+                tokens_per_sec=float(prop("tok_s", "0")),
+                models=[m for m in prop("models", "").split(",") if m],
+                memory_headroom_gb=(
+                    float(prop("mem_headroom_gb", "")) if prop("mem_headroom_gb", "") else None
+                ),
+                group=prop("group", ""),
+            )
+        except ValueError:
+            logger.warning(f"Ignoring malformed service record: {name}")
+            return None
         
-        self.peers[node_id] = peer
-        logger.info(f"Discovered peer: {node_id} at {ip_address}:{info.port}")
+    def _add_peer(self, peer: PeerInfo):
+        """Record a newly confirmed peer."""
+        self.peers[peer.node_id] = peer
+        self.cached.pop(peer.node_id, None)
+        logger.info(f"Discovered peer: {peer.node_id} at {peer.ip_address}:{peer.port}")
         
         if self.on_peer_added:
             self.on_peer_added(peer)
+        
+        self._peers_changed()
             
     def _on_service_removed(self, name: str):
         """Handle service removal."""
@@ -171,19 +304,103 @@ class DiscoveryService:
             
             if self.on_peer_removed:
                 self.on_peer_removed(node_id)
+            
+            self._peers_changed()
     
     def get_peers(self) -> Dict[str, PeerInfo]:
         """Get all discovered peers."""
         return self.peers.copy()
     
+    def confirmed_peers(self) -> Dict[str, PeerInfo]:
+        """Get peers seen over mDNS since startup (cache-only peers are never in ``peers``)."""
+        return self.peers.copy()
+    
+    def is_unconfirmed(self, node_id: str) -> bool:
+        """Whether a peer is only known from the cache so far."""
+        return node_id in self.cached
+    
+    def confirm(self, node_id: str):
+        """Another source (gossip) has seen a cached peer: stop waiting for it."""
+        if self.cached.pop(node_id, None) is not None:
+            self._changed.set()
+    
+    @property
+    def _changed(self) -> asyncio.Event:
+        # Created inside the running loop: before 3.10 an event binds to the
+        # loop current at construction
+        if self._changed_event is None:
+            self._changed_event = asyncio.Event()
+        return self._changed_event
+    
+    @property
+    def quorum(self) -> int:
+        """Majority of the peers known from the cache at startup (at least one)."""
+        return self.expected_peers // 2 + 1
+    
+    async def wait_until(self, predicate: Callable[[], bool], timeout: float) -> bool:
+        """
+        Wait until ``predicate()`` holds, re-checking on every peer change.
+        
+        Returns False if the timeout expires first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while not predicate():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+        
+        return True
+    
+    async def wait_for_peers(self, count: Optional[int] = None, timeout: float = 5.0) -> bool:
+        """
+        Wait until ``count`` peers are confirmed over mDNS.
+        
+        Defaults to a quorum of the peers known from the cache, so a
+        restarting node can proceed once most of its cluster has answered.
+        """
+        target = self.quorum if count is None else count
+        return await self.wait_until(lambda: len(self.confirmed_peers()) >= target, timeout)
+    
+    def _peers_changed(self, persist: bool = True):
+        """Persist the peer table and wake anyone waiting on it."""
+        if self._cache and persist:
+            # Cached peers not yet confirmed stay on disk for the next start
+            self._cache.save([*self.peers.values(), *self.cached.values()])
+        self._changed.set()
+    
+    def _load_cache(self):
+        """Seed the peer table from the on-disk cache."""
+        if not self._cache:
+            return
+        
+        for peer in self._cache.load():
+            if peer.node_id == self.node_id or peer.node_id in self.peers:
+                continue
+            
+            self.cached[peer.node_id] = peer
+        
+        self.expected_peers = len(self.cached)
+        if self.expected_peers:
+            logger.info(f"Loaded {self.expected_peers} peer(s) from cache")
+            self._expire_task = asyncio.create_task(self._expire_unconfirmed())
+    
+    async def _expire_unconfirmed(self):
+        """Drop cached peers that never showed up."""
+        await asyncio.sleep(self.CACHE_CONFIRM_GRACE)
+        
+        for node_id in list(self.cached):
+            logger.info(f"Cached peer {node_id} did not respond, dropping")
+            del self.cached[node_id]
+        self._peers_changed()
+    
     def _get_local_ip(self) -> str:
         """Get the local IP address."""
-        try:
-            # Create a socket to determine local IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except Exception:
-            return "127.0.0.1"
+        return get_local_ip()
@@ -0,0 +1,85 @@
+"""
+Hierarchical cluster topology.
+
+Nodes can be labelled with a group (a rack, a room, a site). Each group
+elects a leader, and nodes only track their own group in full plus the
+leaders of other groups, so membership and planning cost O(group) rather
+than O(cluster).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from swarm.discovery.service import PeerInfo
+
+
+@dataclass
+class GroupSummary:
+    """Aggregate view of one group."""
+
+    group: str
+    leader_id: str
+    nodes: int
+    memory_gb: float
+
+
+class ClusterTopology:
+    """
+    Groups peers and elects a leader per group.
+
+    The leader is the lowest node id in the group, which every member can
+    compute independently from the same membership view.
+    """
+
+    def __init__(self, node_id: str, group: str = "", memory_gb: float = 0.0):
+        self.node_id = node_id
+        self.group = group
+        self.memory_gb = memory_gb
+
+    def group_peers(self, peers: Iterable[PeerInfo]) -> List[PeerInfo]:
+        """Peers in our own group."""
+        return [peer for peer in peers if peer.group == self.group]
+
+    def other_peers(self, peers: Iterable[PeerInfo]) -> List[PeerInfo]:
+        """Peers in other groups."""
+        return [peer for peer in peers if peer.group != self.group]
+
+    def leader(self, peers: Iterable[PeerInfo], group: Optional[str] = None) -> str:
+        """Leader of ``group`` (default: our own group)."""
+        group = self.group if group is None else group
+        candidates = [peer.node_id for peer in peers if peer.group == group]
+        if group == self.group:
+            candidates.append(self.node_id)
+        return min(candidates)
+
+    def is_leader(self, peers: Iterable[PeerInfo]) -> bool:
+        """Whether this node leads its group."""
+        return self.leader(peers) == self.node_id
+
+    def summarize(self, peers: Iterable[PeerInfo]) -> Dict[str, GroupSummary]:
+        """Per-group node count, memory and leader, including ourselves."""
+        peers = list(peers)
+        summaries = {
+            self.group: GroupSummary(self.group, self.leader(peers), 1, self.memory_gb)
+        }
+
+        for peer in peers:
+            summary = summaries.get(peer.group)
+            if summary is None:
+                summary = GroupSummary(peer.group, self.leader(peers, peer.group), 0, 0.0)
+                summaries[peer.group] = summary
+            summary.nodes += 1
+            summary.memory_gb += peer.memory_gb
+
+        # Leaders of other groups advertise their group's totals, which
+        # covers members we don't track individually
+        for peer in peers:
+            reported = peer.capabilities.get("group_nodes")
+            if peer.group != self.group and reported:
+                summary = summaries[peer.group]
+                summary.nodes = max(summary.nodes, reported)
+                summary.memory_gb = max(
+                    summary.memory_gb, peer.capabilities.get("group_memory_gb", 0.0)
+                )
+
+        return summaries
@@ -0,0 +1,235 @@
+"""
+Compute backends.
+
+A backend runs a stage's layers on one engine: NumPy everywhere, torch on
+CPU where it is installed, MLX on Apple silicon. Whatever runs inside,
+tensors cross stage boundaries, the KV cache and the wire as NumPy arrays
+(float32 hidden states, int32 token ids), so nodes on different engines
+work in one pipeline and frames never depend on who made them.
+
+Each node picks its backend once, when it first computes: the installed
+engines that suit the machine run a short benchmark, and the fastest one
+whose output matches NumPy's wins. Nodes that never compute never import
+them.
+"""
+
+import importlib.util
+import logging
+import platform
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache, partial
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from swarm.inference import compute
+from swarm.inference.compute import HIDDEN_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(module: str) -> bool:
+    """Whether ``module`` can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class ComputeBackend(ABC):
+    """
+    Runs layer ranges over NumPy hidden states on some engine.
+
+    Subclasses convert to and from their native arrays and run one layer;
+    the batching and attention around it are ``compute.attend_batch``'s.
+    Backends hold no state, so they pickle into process workers cheaply.
+    """
+
+    name = ""
+
+    @classmethod
+    @abstractmethod
+    def available(cls) -> bool:
+        """Whether this machine can run the backend."""
+
+    @abstractmethod
+    def asarray(self, array: np.ndarray) -> Any:
+        """A NumPy array as this engine's array."""
+
+    @abstractmethod
+    def numpy(self, array: Any) -> np.ndarray:
+        """This engine's array as a NumPy array."""
+
+    @abstractmethod
+    def layer(self, rows: Any, weights: Any) -> Any:
+        """Run one layer over native rows."""
+
+    def attend_batch(
+        self,
+        model_name: str,
+        start_layer: int,
+        end_layer: int,
+        hidden_states: Sequence[np.ndarray],
+        contexts: Sequence[Sequence[Optional[np.ndarray]]],
+    ) -> Tuple[List[np.ndarray], List[List[np.ndarray]]]:
+        """Same contract as ``compute.attend_batch``, on this backend."""
+        return compute.attend_batch(
+            model_name,
+            start_layer,
+            end_layer,
+            hidden_states,
+            contexts,
+            asarray=self.asarray,
+            numpy=self.numpy,
+            layer=self.layer,
+            weights=partial(_native_weights, self.name),
+        )
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class NumpyBackend(ComputeBackend):
+    """The reference kernels in ``compute``; always available."""
+
+    name = "numpy"
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def asarray(self, array: np.ndarray) -> np.ndarray:
+        return array
+
+    def numpy(self, array: np.ndarray) -> np.ndarray:
+        return array
+
+    def layer(self, rows: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        return np.tanh(rows @ weights)
+
+
+class TorchBackend(ComputeBackend):
+    """torch on CPU; its kernels beat NumPy's BLAS on some machines."""
+
+    name = "torch"
+
+    @classmethod
+    def available(cls) -> bool:
+        return _installed("torch")
+
+    def asarray(self, array: np.ndarray) -> Any:
+        import torch
+
+        if not array.flags.writeable:
+            # torch.from_numpy shares memory and wants to own it writable
+            array = array.copy()
+        return torch.from_numpy(array)
+
+    def numpy(self, array: Any) -> np.ndarray:
+        return array.numpy()
+
+    def layer(self, rows: Any, weights: Any) -> Any:
+        import torch
+
+        with torch.inference_mode():
+            return torch.tanh(rows @ weights)
+
+
+class MLXBackend(ComputeBackend):
+    """MLX on Apple silicon, in unified memory."""
+
+    name = "mlx"
+
+    @classmethod
+    def available(cls) -> bool:
+        return (
+            platform.system() == "Darwin"
+            and platform.machine() == "arm64"
+            and _installed("mlx")
+        )
+
+    def asarray(self, array: np.ndarray) -> Any:
+        import mlx.core as mx
+
+        return mx.array(array)
+
+    def numpy(self, array: Any) -> np.ndarray:
+        # Converting evaluates MLX's lazy graph
+        return np.asarray(array)
+
+    def layer(self, rows: Any, weights: Any) -> Any:
+        import mlx.core as mx
+
+        return mx.tanh(rows @ weights)
+
+
+BACKENDS: Dict[str, Type[ComputeBackend]] = {
+    backend.name: backend for backend in (NumpyBackend, TorchBackend, MLXBackend)
+}
+
+
+@lru_cache(maxsize=512)
+def _native_weights(backend: str, model_name: str, layer: int, hidden_size: int) -> Any:
+    """A layer's stand-in weights as a backend's native array, converted once."""
+    return BACKENDS[backend]().asarray(compute._layer_weights(model_name, layer, hidden_size))
+
+
+def available_backends() -> List[str]:
+    """Names of the backends this machine can run."""
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def benchmark(backend: ComputeBackend, tokens: int = 16, layers: int = 8, repeats: int = 3) -> float:
+    """
+    Best time (seconds) of ``backend`` over a small batch of stage work.
+
+    Raises ValueError if its output doesn't match the NumPy kernels.
+    """
+    rng = np.random.default_rng(0)
+    hidden = [rng.standard_normal((tokens, HIDDEN_SIZE)).astype(np.float32)]
+    contexts = [[rng.standard_normal((4, HIDDEN_SIZE)).astype(np.float32)] * layers]
+    args = ("benchmark", 0, layers - 1, hidden, contexts)
+
+    (expected,), _ = compute.attend_batch(*args)
+    (output,), _ = backend.attend_batch(*args)  # also warms up
+    if not np.allclose(output, expected, atol=1e-3):
+        raise ValueError(f"{backend.name} output differs from NumPy's")
+
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.attend_batch(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+@lru_cache(maxsize=None)
+def select_backend(name: str = "auto") -> ComputeBackend:
+    """
+    The backend called ``name``, or with "auto" the fastest one here.
+
+    The choice is made once per process: the machine doesn't change.
+    """
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown compute backend {name!r} (expected one of {list(BACKENDS)})")
+        if not BACKENDS[name].available():
+            raise ValueError(f"Compute backend {name!r} isn't available on this machine")
+        return BACKENDS[name]()
+
+    timings: Dict[str, float] = {}
+    for candidate in available_backends():
+        backend = BACKENDS[candidate]()
+        try:
+            timings[candidate] = benchmark(backend)
+        except Exception as e:
+            logger.warning(f"Skipping compute backend {candidate}: {e}")
+
+    fastest = min(timings, key=timings.get, default=NumpyBackend.name)
+    logger.info(
+        f"Compute backend: {fastest} ("
+        + ", ".join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in timings.items())
+        + ")"
+    )
+    return BACKENDS[fastest]()
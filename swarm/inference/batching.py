@@ -0,0 +1,201 @@
+"""
+Adaptive micro-batching of stage compute.
+
+Steps of different sequences that wait at a stage for the same layers run
+together as one micro-batch: one compute slot, one executor call and one
+matmul per layer over all their rows. Bigger batches amortise the fixed
+cost of a pass (reading the weights) but take longer, and the size that
+balances the two differs from one machine to the next and between
+prefill and decode.
+
+So each stage sizes its micro-batches online, additive-increase /
+multiplicative-decrease: a batch that filled up while more steps were
+waiting and still finished within its latency target grows the next one
+by a step; a batch that overran the target, or ran out of memory, halves
+it. A batch never takes more tokens than the node has memory for.
+"""
+
+import asyncio
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+from swarm.inference.memory import MemoryExhausted
+from swarm.inference.scheduler import StepScheduler, Urgency
+
+_order = itertools.count()
+
+
+@dataclass(eq=False)
+class Step:
+    """One sequence's pass over a stage's layers."""
+
+    seq_id: str
+    hidden_state: np.ndarray
+    urgency: Urgency = field(default_factory=Urgency)
+    submitted_at: float = field(default_factory=time.time)
+    order: int = field(default_factory=lambda: next(_order))
+    result: Optional[asyncio.Future] = None
+
+    @property
+    def tokens(self) -> int:
+        return self.hidden_state.shape[0]
+
+    @property
+    def rank(self):
+        deadline = math.inf if self.urgency.deadline is None else self.urgency.deadline
+        return (self.urgency.priority, deadline, self.order)
+
+
+class BatchSizer:
+    """AIMD micro-batch size for one kind of step at one stage."""
+
+    def __init__(self, target: float, max_size: int = 32):
+        self.target = target
+        self.max_size = max_size
+        self.size = 1
+
+    def observe(self, steps: int, backlog: int, seconds: float):
+        """Adjust after a batch of ``steps`` that took ``seconds``, ``backlog`` still waiting."""
+        if seconds > self.target:
+            self.backoff()
+        elif backlog and steps >= self.size:
+            self.size = min(self.max_size, self.size + 1)
+
+    def backoff(self):
+        self.size = max(1, self.size // 2)
+
+
+# Runs a micro-batch; returns one result per step
+Execute = Callable[[Hashable, List[Step]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """
+    Groups waiting steps with the same key into micro-batches.
+
+    Each step waits for a compute slot. The first to get one runs as many
+    waiting steps as the key's size allows, most urgent first; the others
+    give their place in the slot queue up. Keys should tell prefill and
+    decode apart: each key is sized separately, against the prefill or
+    decode latency target depending on its first step.
+
+    Usage:
+        batcher = MicroBatcher(scheduler)
+        result = await batcher.run(("llama-7b", 0, 15, "decode"), step, execute, room)
+    """
+
+    def __init__(
+        self,
+        scheduler: StepScheduler,
+        decode_target: float = 0.05,
+        prefill_target: float = 0.5,
+        max_size: int = 32,
+    ):
+        self.scheduler = scheduler
+        self.decode_target = decode_target
+        self.prefill_target = prefill_target
+        self.max_size = max_size
+        self.pending: Dict[Hashable, List[Step]] = {}
+        self.sizers: Dict[Hashable, BatchSizer] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        step: Step,
+        execute: Execute,
+        room: Callable[[], int] = lambda: math.inf,
+    ) -> Any:
+        """
+        Run ``step`` in a micro-batch of steps sharing ``key``; returns its
+        result. ``room()`` is how many tokens a batch may hold right now.
+        """
+        if key not in self.sizers:
+            target = self.prefill_target if step.tokens > 1 else self.decode_target
+            self.sizers[key] = BatchSizer(target, self.max_size)
+        step.result = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(key, []).append(step)
+        slot = asyncio.ensure_future(self.scheduler.acquire(step.urgency, prefill=step.tokens > 1))
+        try:
+            await asyncio.wait([slot, step.result], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            self._discard(key, step)
+            self._give_back(slot)
+            raise
+
+        if step not in self.pending.get(key, ()):
+            # Another step's batch has taken this one
+            self._give_back(slot)
+            return await step.result
+
+        try:
+            slot.result()
+        except BaseException:
+            self._discard(key, step)
+            raise
+
+        batch = self._take(key, step, room())
+        # The batch finishes for the others even if this step's caller goes away
+        await asyncio.shield(asyncio.ensure_future(self._execute(key, batch, execute)))
+        return step.result.result()
+
+    def _take(self, key: Hashable, leader: Step, room: int) -> List[Step]:
+        """The leader plus the most urgent waiting steps that fit."""
+        waiting = self.pending[key]
+        waiting.remove(leader)
+        batch, tokens = [leader], leader.tokens
+        for step in sorted(waiting, key=lambda s: s.rank):
+            if len(batch) >= self.sizers[key].size:
+                break
+            if tokens + step.tokens > room:
+                continue
+            batch.append(step)
+            tokens += step.tokens
+        for step in batch[1:]:
+            waiting.remove(step)
+        if not waiting:
+            del self.pending[key]
+        return batch
+
+    async def _execute(self, key: Hashable, batch: List[Step], execute: Execute):
+        sizer = self.sizers[key]
+        started = time.perf_counter()
+        try:
+            results = await execute(key, batch)
+        except BaseException as e:
+            if isinstance(e, MemoryExhausted):
+                sizer.backoff()
+            for step in batch:
+                if not step.result.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        step.result.cancel()
+                    else:
+                        step.result.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        finally:
+            self.scheduler.release()
+
+        sizer.observe(len(batch), len(self.pending.get(key, [])), time.perf_counter() - started)
+        for step, result in zip(batch, results):
+            if not step.result.done():
+                step.result.set_result(result)
+
+    def _discard(self, key: Hashable, step: Step):
+        waiting = self.pending.get(key, [])
+        if step in waiting:
+            waiting.remove(step)
+            if not waiting:
+                del self.pending[key]
+
+    def _give_back(self, slot: asyncio.Future):
+        if not slot.done():
+            # A slot granted meanwhile is handed on by the cancelled acquire
+            slot.cancel()
+        elif not slot.cancelled() and slot.exception() is None:
+            self.scheduler.release()
@@ -0,0 +1,174 @@
+"""
+Layer compute kernels.
+
+Everything in this module runs inside the node's worker pool, never on the
+event loop. Functions must stay at module level so they can be pickled
+into worker processes.
+"""
+
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HIDDEN_SIZE = 64
+VOCAB_SIZE = 32000
+
+
+@lru_cache(maxsize=512)
+def _layer_weights(model_name: str, layer: int, hidden_size: int) -> np.ndarray:
+    """
+    Deterministic stand-in weights for a layer.
+
+    Seeded from the model name and layer index so every node (and every
+    worker process) produces identical weights without shipping them around.
+    """
+    rng = np.random.default_rng(zlib.crc32(f"{model_name}:{layer}".encode()))
+    weights = rng.standard_normal((hidden_size, hidden_size)).astype(np.float32)
+    return weights / np.sqrt(hidden_size)
+
+
+@lru_cache(maxsize=8)
+def _embedding_table(model_name: str, vocab_size: int, hidden_size: int) -> np.ndarray:
+    """Deterministic stand-in embedding table, seeded like ``_layer_weights``."""
+    rng = np.random.default_rng(zlib.crc32(f"{model_name}:embedding".encode()))
+    return rng.standard_normal((vocab_size, hidden_size)).astype(np.float32)
+
+
+def embed_tokens(model_name: str, token_ids: np.ndarray, hidden_size: int = HIDDEN_SIZE) -> np.ndarray:
+    """Look up token ids into a (tokens, hidden_size) hidden state."""
+    return _embedding_table(model_name, VOCAB_SIZE, hidden_size)[token_ids]
+
+
+def execute_layers(
+    model_name: str,
+    start_layer: int,
+    end_layer: int,
+    hidden_state: np.ndarray,
+) -> np.ndarray:
+    """
+    Run layers ``start_layer..end_layer`` (inclusive) over a hidden state.
+
+    This is a mock transformer block (matmul + tanh), but it does real
+    NumPy work that releases the GIL, so it behaves like a real kernel
+    as far as the worker pool is concerned.
+    """
+    hidden_size = hidden_state.shape[-1]
+    for layer in range(start_layer, end_layer + 1):
+        hidden_state = np.tanh(hidden_state @ _layer_weights(model_name, layer, hidden_size))
+    return hidden_state
+
+
+def fold_context(state: Optional[Tuple[np.ndarray, int]], rows: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Fold a block of a layer's cached entries into its attention state.
+
+    The mock attention only needs the entries' sum and count, so a long
+    history streams through block by block instead of being concatenated.
+    Start from None.
+    """
+    total = rows.sum(axis=0, dtype=np.float64)
+    if state is None:
+        return total, len(rows)
+    return state[0] + total, state[1] + len(rows)
+
+
+def context_mean(context: Any) -> np.ndarray:
+    """Mean of a layer's cached entries, given them or their ``fold_context`` state."""
+    if isinstance(context, tuple):
+        total, count = context
+        return (total / count).astype(np.float32)
+    return context.mean(axis=0)
+
+
+def attend_layers(
+    model_name: str,
+    start_layer: int,
+    end_layer: int,
+    hidden_state: np.ndarray,
+    context: Sequence[Optional[np.ndarray]],
+) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Run layers like ``execute_layers``, attending over cached earlier tokens.
+
+    ``context[i]`` holds the cached entries of layer ``start_layer + i``,
+    or their ``fold_context`` state (None before the first token). The mock attention blends their mean
+    into each new token. Returns the output and every layer's input, which
+    is what the caller caches as the new tokens' KV entries.
+
+    An integer ``hidden_state`` holds token ids, which the first stage
+    embeds itself.
+    """
+    (output,), (inputs,) = attend_batch(model_name, start_layer, end_layer, [hidden_state], [context])
+    return output, inputs
+
+
+def _identity(array: Any) -> Any:
+    return array
+
+
+def _layer(rows: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    return np.tanh(rows @ weights)
+
+
+def attend_batch(
+    model_name: str,
+    start_layer: int,
+    end_layer: int,
+    hidden_states: Sequence[np.ndarray],
+    contexts: Sequence[Sequence[Optional[np.ndarray]]],
+    asarray: Callable[[np.ndarray], Any] = _identity,
+    numpy: Callable[[Any], np.ndarray] = _identity,
+    layer: Callable[[Any, Any], Any] = _layer,
+    weights: Callable[[str, int, int], Any] = _layer_weights,
+) -> Tuple[List[np.ndarray], List[List[np.ndarray]]]:
+    """
+    ``attend_layers`` over a micro-batch of sequences at once.
+
+    Each sequence attends over its own context, but every layer runs one
+    matmul over the rows of all of them. Returns each sequence's output
+    and layer inputs.
+
+    The engine is pluggable: ``asarray`` and ``numpy`` convert to and from
+    its arrays, ``layer`` runs one layer on them and ``weights`` looks up
+    a layer's weights as its array. The defaults are NumPy's.
+    """
+    hidden_states = [
+        embed_tokens(model_name, hidden) if np.issubdtype(hidden.dtype, np.integer) else hidden
+        for hidden in hidden_states
+    ]
+    bounds = np.cumsum([0] + [len(hidden) for hidden in hidden_states])
+    rows = np.concatenate(hidden_states)
+    hidden_size = rows.shape[-1]
+    inputs: List[List[np.ndarray]] = [[] for _ in hidden_states]
+    native = asarray(rows)
+
+    for i, index in enumerate(range(start_layer, end_layer + 1)):
+        context_means = None
+        for j, context in enumerate(contexts):
+            start, end = bounds[j], bounds[j + 1]
+            inputs[j].append(rows[start:end])
+            if context[i] is not None:
+                if context_means is None:
+                    context_means = np.zeros_like(rows)
+                context_means[start:end] = context_mean(context[i])
+        if context_means is not None:
+            native = native + asarray(context_means)
+        native = layer(native, weights(model_name, index, hidden_size))
+        rows = numpy(native)
+
+    return [rows[bounds[j]:bounds[j + 1]] for j in range(len(hidden_states))], inputs
+
+
+def timed(fn: Callable[..., Any], *args: Any) -> Tuple[float, float, Any]:
+    """
+    Call ``fn(*args)`` and return (start, end, result) in wall-clock time.
+
+    Run inside the worker, so the caller can tell time spent queued for a
+    worker apart from time spent computing.
+    """
+    start = time.time()
+    result = fn(*args)
+    return start, time.time(), result
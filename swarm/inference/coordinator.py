@@ -7,10 +7,33 @@ model layers and coordinating execution.
 
 import asyncio
 import logging
-from typing import List, Optional, Dict
-from dataclasses import dataclass
+import time
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Deque, List, Optional, Dict, Set, Tuple, Union
+from dataclasses import asdict, dataclass
+
+import numpy as np
 
 from swarm.discovery.service import PeerInfo
+from swarm.inference.backends import ComputeBackend, select_backend
+from swarm.inference.batching import MicroBatcher, Step
+from swarm.inference.compute import VOCAB_SIZE, embed_tokens, fold_context, timed
+from swarm.inference.executor import LayerExecutor
+from swarm.inference.kvcache import KVCache
+from swarm.inference.memory import MemoryAccountant, MemoryExhausted
+from swarm.inference.router import Pipeline, PipelineRouter
+from swarm.inference.scheduler import DeadlineExceeded, StepScheduler, Urgency, priority_rank
+from swarm.inference.session import Session, SessionStore
+from swarm.inference.simulation import SimulationProfile
+from swarm.inference.tokenizer import Tokenizer
+from swarm.protocol.codec import BASE_CODECS, CODECS, LinkMeter, choose_codec, fallback_codec
+from swarm.protocol.frames import HiddenStateFrame
+from swarm.protocol.rpc import RPCError
+from swarm.protocol.transport import TCPTransport, Transport
+from swarm.utils.metrics import MetricsRegistry
+from swarm.utils.profiling import Profiler
+from swarm.utils.tracing import Span, Tracer, new_trace_id
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +56,30 @@ class ModelSpec:
     name: str
     total_layers: int
     memory_per_layer_mb: float
+    hidden_size: int = 4096
+    vocab_size: int = VOCAB_SIZE
+    
+    @property
+    def memory_gb(self) -> float:
+        """Memory needed to hold every layer of the model."""
+        return self.total_layers * self.memory_per_layer_mb / 1024
+    
+    def weight_bytes(self, layers: int) -> int:
+        """Memory taken by the weights of ``layers`` layers."""
+        return int(layers * self.memory_per_layer_mb * 1024**2)
+    
+    def kv_bytes(self, tokens: int, layers: int) -> int:
+        """KV cache for ``tokens`` tokens over ``layers`` layers (fp16 keys and values)."""
+        return 2 * 2 * self.hidden_size * tokens * layers
+    
+    @property
+    def embedding_bytes(self) -> int:
+        """Memory taken by the token embedding table (fp16)."""
+        return 2 * self.vocab_size * self.hidden_size
+    
+    def activation_bytes(self, tokens: int) -> int:
+        """Input and output hidden states of a stage (fp32)."""
+        return 2 * 4 * self.hidden_size * tokens
     
 
 class InferenceCoordinator:
@@ -48,21 +95,183 @@ class InferenceCoordinator:
     
     # Model specifications (simplified for demo)
     MODELS = {
-        "llama-7b": ModelSpec("llama-7b", 32, 500),
-        "llama-13b": ModelSpec("llama-13b", 40, 650),
-        "mistral-7b": ModelSpec("mistral-7b", 32, 500),
-        "default": ModelSpec("default", 24, 400),
+        "llama-7b": ModelSpec("llama-7b", 32, 500, 4096),
+        "llama-13b": ModelSpec("llama-13b", 40, 650, 5120),
+        "mistral-7b": ModelSpec("mistral-7b", 32, 500, 4096),
+        "default": ModelSpec("default", 24, 400, 2048),
     }
     
-    def __init__(self, node_id: str):
+    # Window over which tokens/s is measured
+    THROUGHPUT_WINDOW = 30.0
+    
+    # Longest a pipeline stage may take to answer a forwarded frame
+    HOP_TIMEOUT = 30.0
+    
+    # How long work may queue for memory before it is rejected
+    MEMORY_WAIT = 5.0
+    
+    # Most prompt tokens one prefill pass runs
+    PREFILL_CHUNK = 64
+    
+    # Pipeline plans kept, most recently used first
+    PLAN_CACHE_SIZE = 8
+    
+    def __init__(
+        self,
+        node_id: str,
+        executor: Optional[LayerExecutor] = None,
+        local_memory_gb: float = 4.0,
+        port: int = 5000,
+        group: str = "",
+        metrics: Optional[MetricsRegistry] = None,
+        simulation: Optional[SimulationProfile] = None,
+        transport: Optional[Transport] = None,
+        profiler: Optional[Profiler] = None,
+        memory: Optional[MemoryAccountant] = None,
+        kv_cache: Optional[KVCache] = None,
+        activation_codec: str = "auto",
+        backend: Union[ComputeBackend, str] = "numpy",
+    ):
         self.node_id = node_id
+        self.group = group
+        self.executor = executor or LayerExecutor()
+        # "auto" is resolved on the first compute: benchmarking imports every
+        # installed engine, which nodes that never compute shouldn't pay for
+        self._backend: Optional[ComputeBackend] = (
+            None if backend == "auto"
+            else select_backend(backend) if isinstance(backend, str)
+            else backend
+        )
+        self._backend_selection: Optional[asyncio.Future] = None
+        self.local_memory_gb = local_memory_gb
+        self.port = port
         self.current_partitions: List[LayerPartition] = []
+        self.current_pipelines: List[Pipeline] = []
+        self.router = PipelineRouter()
+        self._plan_cache: "OrderedDict[Tuple, List[Pipeline]]" = OrderedDict()
+        
+        # Load, published to peers by the node
+        self.active_requests = 0
+        self.resident_models: Set[str] = set()
+        self._token_log: Deque[Tuple[float, int]] = deque()
+        
+        self.metrics = metrics or MetricsRegistry()
+        self._register_metrics()
+        self.tracer = Tracer(node_id)
+        self.simulation = simulation
+        self.transport = transport or TCPTransport()
+        self.profiler = profiler or Profiler()
+        self.memory = memory or MemoryAccountant(local_memory_gb * 1024**3)
+        self.kv_cache = kv_cache or KVCache()
+        self.sessions = SessionStore()
+        self.scheduler = StepScheduler(slots=self.executor.workers)
+        self.batcher = MicroBatcher(self.scheduler)
+        self._priorities: Dict[str, int] = {}  # sequence id -> priority rank, per stage
+        self._token_kv_bytes: Dict[str, int] = {}  # sequence id -> KV bytes of one cached token
+        self.tokenizer = Tokenizer()
+        self._stage_embeds: Dict[str, bool] = {}  # first-stage node id -> holds the embedding table
+        self._stage_codecs: Dict[str, Set[str]] = {}  # stage node id -> codecs both ends handle
+        if activation_codec != "auto" and activation_codec not in CODECS:
+            raise ValueError(f"Unknown activation codec {activation_codec!r}")
+        self.activation_codec = activation_codec
+        self.links = LinkMeter()
+        
+    @property
+    def backend_name(self) -> str:
+        """The compute backend's name; "auto" until the first compute picks one."""
+        return self._backend.name if self._backend else "auto"
+        
+    async def backend(self) -> ComputeBackend:
+        """The compute backend, benchmarked off the event loop on first use if "auto"."""
+        if self._backend is None:
+            if self._backend_selection is None:
+                self._backend_selection = asyncio.get_running_loop().run_in_executor(
+                    None, select_backend, "auto"
+                )
+            self._backend = await asyncio.shield(self._backend_selection)
+        return self._backend
+        
+    def _register_metrics(self):
+        m = self.metrics
+        self._requests = m.counter(
+            "swarm_requests_total", "Inference requests by model and execution mode", ["model", "mode"]
+        )
+        self._tokens = m.counter("swarm_tokens_generated_total", "Tokens generated")
+        self._stage_seconds = m.histogram(
+            "swarm_stage_compute_seconds", "Compute time per pipeline stage", ["model", "layers"]
+        )
+        self._queue_wait_seconds = m.histogram(
+            "swarm_stage_queue_wait_seconds", "Time a step waits for compute per pipeline stage",
+            ["model", "layers"],
+        )
+        self._hop_seconds = m.histogram(
+            "swarm_hop_transfer_seconds", "Hidden-state transfer time per hop", ["src", "dst"]
+        )
+        self._hop_bytes = m.counter(
+            "swarm_hop_transfer_bytes_total", "Hidden-state bytes sent per hop", ["src", "dst"]
+        )
+        self._hop_frames = m.counter(
+            "swarm_hop_frames_total", "Hidden-state frames to and from stages by codec", ["codec"]
+        )
+        # Fed by the KV cache; hit rate is hits / (hits + misses)
+        self.kv_lookups = m.counter(
+            "swarm_kv_cache_lookups_total", "KV cache lookups by result", ["result"]
+        )
+        m.gauge("swarm_tokens_per_second", "Recent generation throughput", function=self.tokens_per_sec)
+        m.gauge(
+            "swarm_active_requests", "Requests being processed", function=lambda: self.active_requests
+        )
+        m.gauge(
+            "swarm_kv_cache_resident_bytes", "KV cache held in memory",
+            function=lambda: self.kv_cache.stats()["resident_bytes"],
+        )
+        m.gauge(
+            "swarm_kv_cache_spilled_bytes", "KV cache spilled to disk",
+            function=lambda: self.kv_cache.stats()["spilled_bytes"],
+        )
+        m.gauge(
+            "swarm_memory_headroom_bytes", "Memory budget not reserved for weights, KV or activations",
+            function=lambda: self.memory.headroom,
+        )
+        self._memory_rejections = m.counter(
+            "swarm_memory_rejections_total", "Work turned away for lack of memory", ["kind"]
+        )
+        self._dropped = m.counter(
+            "swarm_requests_dropped_total", "Requests abandoned mid-flight", ["reason"]
+        )
+        self._preemptions = m.counter(
+            "swarm_preemptions_total", "Sequences swapped out for more urgent work"
+        )
+        self._batch_steps = m.histogram(
+            "swarm_micro_batch_steps", "Steps run together per stage pass", ["kind"],
+            buckets=(1, 2, 4, 8, 16, 32, 64),
+        )
+        m.gauge(
+            "swarm_compute_queue_depth", "Steps waiting for a compute slot",
+            function=lambda: self.scheduler.queued,
+        )
+        
+    @classmethod
+    def get_model_spec(cls, model: str) -> ModelSpec:
+        """Look up a model, falling back to the default spec."""
+        return cls.MODELS.get(model, cls.MODELS["default"])
+        
+    @staticmethod
+    def fits_locally(model_spec: ModelSpec, memory_gb: float) -> bool:
+        """Whether the whole model fits in ``memory_gb`` on a single node."""
+        return model_spec.memory_gb <= memory_gb
         
     async def run_inference(
         self,
         prompt: str,
         model: str,
         peers: List[PeerInfo],
+        trace_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        priority: str = "normal",
+        deadline: Optional[float] = None,
+        client: str = "local",
     ) -> str:
         """
         Run distributed inference.
@@ -71,27 +280,252 @@ class InferenceCoordinator:
             prompt: Input prompt
             model: Model name
             peers: Available peer nodes
+            trace_id: Id to record the request's timeline under (generated if not given)
+            max_tokens: Number of tokens to generate (default: the whole mock response)
+            session_id: Conversation this prompt continues; only its new tokens are prefilled
+            priority: "interactive", "normal" or "batch"
+            deadline: Unix time by which the request must finish, or be dropped
+            client: Who sent the request; session ids are only unique per client
             
         Returns:
             Generated text
         """
-        model_spec = self.MODELS.get(model, self.MODELS["default"])
+        pieces = [
+            piece
+            async for piece in self.generate(
+                prompt, model, peers, trace_id, max_tokens, session_id, priority, deadline, client
+            )
+        ]
+        return "".join(pieces)
+        
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        peers: List[PeerInfo],
+        trace_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        priority: str = "normal",
+        deadline: Optional[float] = None,
+        client: str = "local",
+    ) -> AsyncIterator[str]:
+        """
+        Run inference and yield each token as soon as it is decoded.
+        
+        Same arguments as ``run_inference``.
+        """
+        model_spec = self.get_model_spec(model)
+        trace_id = trace_id or new_trace_id()
+        urgency = Urgency(priority_rank(priority), deadline)
         
-        # Calculate partitioning
-        partitions = self._partition_model(model_spec, peers)
+        await self._expire_sessions()
+        session = (
+            self.sessions.get(self.session_key(client, session_id), model_spec.name)
+            if session_id
+            else None
+        )
+        
+        self.active_requests += 1
+        try:
+            # Turns of one conversation run one at a time
+            async with session.lock if session else nullcontext():
+                if session and session.model != model_spec.name:
+                    await self._release_memory(session.partitions, session.session_id)
+                    session.reset()
+                    session.history.clear()
+                    session.model = model_spec.name
+                
+                with self.tracer.span(trace_id, "request", model=model_spec.name):
+                    async for piece in self._run(
+                        prompt, model_spec, peers, trace_id, max_tokens, session, urgency
+                    ):
+                        self._record_tokens(1)
+                        yield piece
+        except DeadlineExceeded:
+            self._dropped.inc(reason="deadline")
+            raise
+        finally:
+            self.active_requests -= 1
+        
+    async def _run(
+        self,
+        prompt: str,
+        model_spec: ModelSpec,
+        peers: List[PeerInfo],
+        trace_id: str,
+        max_tokens: Optional[int],
+        session: Optional[Session] = None,
+        urgency: Optional[Urgency] = None,
+    ) -> AsyncIterator[str]:
+        """Pick local or distributed execution and run it."""
+        local = [LayerPartition(self.node_id, 0, model_spec.total_layers - 1, "localhost", self.port)]
         
-        if not partitions:
+        # Fast path: no need to involve the network if we can hold every layer
+        if self.fits_locally(model_spec, self.local_memory_gb):
+            logger.info(f"{model_spec.name} fits locally, skipping partitioning")
+            self._requests.inc(model=model_spec.name, mode="local")
+            async for piece in self._decode(
+                prompt, model_spec, local, trace_id, max_tokens, session, urgency
+            ):
+                yield piece
+            return
+        
+        # A session stays on the pipeline holding its KV cache while every
+        # stage of it is still around
+        live = {p.node_id for p in peers} | {self.node_id}
+        if session and session.partitions and all(p.node_id in live for p in session.partitions):
+            pipelines = [session.partitions]
+        else:
+            with self.profiler.section("partition"):
+                pipelines = self._get_pipelines(model_spec, peers)
+        
+        if not pipelines:
             logger.warning("No partitions available, running locally")
-            return await self._run_local_inference(prompt, model_spec)
+            self._requests.inc(model=model_spec.name, mode="local")
+            async for piece in self._decode(
+                prompt, model_spec, local, trace_id, max_tokens, session, urgency
+            ):
+                yield piece
+            return
         
-        logger.info(f"Running distributed inference across {len(partitions)} nodes")
-        for p in partitions:
-            logger.info(f"  {p.node_id}: layers {p.start_layer}-{p.end_layer}")
+        # Data parallelism: spread requests over complete pipelines, avoiding
+        # ones with a stage too full to hold this request's KV cache
+        queue_depths = {p.node_id: p.queue_depth for p in peers}
+        headroom = {p.node_id: p.memory_headroom_gb for p in peers}
+        tokens = self._sequence_tokens(prompt, max_tokens)
         
-        # Execute distributed inference
-        result = await self._run_distributed_inference(prompt, model_spec, partitions)
+        def has_room(pipeline: Pipeline) -> bool:
+            return all(
+                headroom.get(p.node_id) is None
+                or headroom[p.node_id] * 1024**3 >= self._stage_kv_bytes(model_spec, p, tokens)
+                for p in pipeline
+            )
         
-        return result
+        with self.router.route(pipelines, queue_depths, has_room) as partitions:
+            self.current_partitions = partitions
+            self._requests.inc(model=model_spec.name, mode="distributed")
+            
+            logger.info(f"Running distributed inference across {len(partitions)} nodes")
+            for p in partitions:
+                logger.info(f"  {p.node_id}: layers {p.start_layer}-{p.end_layer}")
+            
+            async for piece in self._decode(
+                prompt, model_spec, partitions, trace_id, max_tokens, session, urgency
+            ):
+                yield piece
+        
+    def tokens_per_sec(self) -> float:
+        """Tokens generated per second over the recent window."""
+        cutoff = time.monotonic() - self.THROUGHPUT_WINDOW
+        while self._token_log and self._token_log[0][0] < cutoff:
+            self._token_log.popleft()
+        
+        return sum(count for _, count in self._token_log) / self.THROUGHPUT_WINDOW
+        
+    def _record_tokens(self, count: int):
+        self._token_log.append((time.monotonic(), count))
+        self._tokens.inc(count)
+        
+    def plan(self, model: str, peers: List[PeerInfo]) -> List[Pipeline]:
+        """The pipelines requests for ``model`` would run on over ``peers``."""
+        return self._get_pipelines(self.get_model_spec(model), peers)
+        
+    def _get_pipelines(
+        self,
+        model_spec: ModelSpec,
+        peers: List[PeerInfo],
+    ) -> List[Pipeline]:
+        """
+        Get the pipeline plan for a model, reusing the plan computed for the
+        same peer set.
+        
+        Plans depend only on what identifies the peers and their capacity,
+        which is also the cache key. Live load (free memory, queue depth)
+        changes with every announcement; it steers routing between the
+        planned pipelines instead, so a cached plan never goes stale.
+        """
+        key = (
+            model_spec.name,
+            self.local_memory_gb,
+            tuple(sorted(
+                (p.node_id, p.group, p.memory_gb, p.ip_address, p.port) for p in peers
+            )),
+        )
+        
+        pipelines = self._plan_cache.get(key)
+        if pipelines is None:
+            pipelines = self._plan_pipelines(model_spec, peers)
+            self._plan_cache[key] = pipelines
+            while len(self._plan_cache) > self.PLAN_CACHE_SIZE:
+                self._plan_cache.popitem(last=False)
+        else:
+            self._plan_cache.move_to_end(key)
+        
+        self.current_pipelines = pipelines
+        return pipelines
+        
+    def _plan_pipelines(
+        self,
+        model_spec: ModelSpec,
+        peers: List[PeerInfo],
+    ) -> List[Pipeline]:
+        """
+        Form as many disjoint pipelines as the cluster can hold.
+        
+        Each pipeline is a full chain of partitions that can serve a request
+        on its own, so adding nodes adds throughput instead of hops. Pipelines
+        are formed inside each group first (ours before others); leftover
+        nodes are pooled across groups. If no complete pipeline fits, fall
+        back to a single pipeline over every node.
+        """
+        if not peers:
+            return []
+        
+        nodes = self._node_entries(peers)
+        
+        groups: Dict[str, List[Dict]] = {}
+        for node in nodes:
+            groups.setdefault(node["group"], []).append(node)
+        order = sorted(groups, key=lambda g: (g != self.group, g))
+        
+        pipelines: List[Pipeline] = []
+        leftover: List[Dict] = []
+        for group in order:
+            formed, unused = self._form_pipelines(model_spec, groups[group])
+            pipelines += formed
+            leftover += unused
+        
+        formed, _ = self._form_pipelines(model_spec, leftover)
+        pipelines += formed
+        
+        if not pipelines:
+            return [self._partition_model(model_spec, peers)]
+        
+        return pipelines
+        
+    def _form_pipelines(
+        self,
+        model_spec: ModelSpec,
+        nodes: List[Dict],
+    ) -> Tuple[List[Pipeline], List[Dict]]:
+        """
+        Greedily chain nodes, largest first, into pipelines that each hold
+        the whole model. Returns the pipelines and the nodes left over.
+        """
+        pipelines: List[Pipeline] = []
+        chain: List[Dict] = []
+        chain_memory = 0.0
+        
+        for node in sorted(nodes, key=lambda n: n["memory_gb"], reverse=True):
+            chain.append(node)
+            chain_memory += node["memory_gb"]
+            
+            if chain_memory >= model_spec.memory_gb:
+                pipelines.append(self._partition_nodes(model_spec, chain))
+                chain, chain_memory = [], 0.0
+        
+        return pipelines, chain
         
     def _partition_model(
         self,
@@ -106,25 +540,47 @@ class InferenceCoordinator:
         if not peers:
             return []
         
-        # Add self to the pool
-        all_nodes = [
-            {"node_id": self.node_id, "memory_gb": 4.0, "ip": "localhost", "port": 5000}
+        peers = self._prefer_group(model_spec, peers)
+        return self._partition_nodes(model_spec, self._node_entries(peers))
+        
+    def _node_entries(self, peers: List[PeerInfo]) -> List[Dict]:
+        """Planning view of ourselves followed by ``peers``."""
+        return [
+            {
+                "node_id": self.node_id,
+                "memory_gb": self.local_memory_gb,
+                "ip": "localhost",
+                "port": self.port,
+                "group": self.group,
+            }
         ] + [
-            {"node_id": p.node_id, "memory_gb": p.memory_gb, "ip": p.ip_address, "port": p.port}
+            {
+                "node_id": p.node_id,
+                "memory_gb": p.memory_gb,
+                "ip": p.ip_address,
+                "port": p.port,
+                "group": p.group,
+            }
             for p in peers
         ]
         
+    def _partition_nodes(self, model_spec: ModelSpec, nodes: List[Dict]) -> List[LayerPartition]:
+        """Split the model's layers over ``nodes`` in proportion to memory."""
         # Calculate layers per node based on memory
-        total_memory = sum(n["memory_gb"] for n in all_nodes)
+        total_memory = sum(n["memory_gb"] for n in nodes)
         total_layers = model_spec.total_layers
         
         partitions = []
         current_layer = 0
         
-        for node in all_nodes:
-            # Allocate layers proportional to memory
-            memory_ratio = node["memory_gb"] / total_memory
-            layers_for_node = max(1, int(total_layers * memory_ratio))
+        for i, node in enumerate(nodes):
+            # Allocate layers proportional to memory; the last node takes
+            # whatever rounding left over
+            if i == len(nodes) - 1:
+                layers_for_node = total_layers - current_layer
+            else:
+                memory_ratio = node["memory_gb"] / total_memory
+                layers_for_node = max(1, int(total_layers * memory_ratio))
             
             # Don't exceed total layers
             layers_for_node = min(layers_for_node, total_layers - current_layer)
@@ -144,59 +600,658 @@ class InferenceCoordinator:
         
         return partitions
         
-    async def _run_local_inference(self, prompt: str, model_spec: ModelSpec) -> str:
+    def _prefer_group(self, model_spec: ModelSpec, peers: List[PeerInfo]) -> List[PeerInfo]:
         """
-        Run inference locally (fallback).
+        Keep the pipeline inside our group when the group can hold the model.
         
-        This is a mock implementation for demonstration.
-        In a real system, this would load and run the model.
+        Otherwise spill into other groups, after our own group's nodes and
+        largest first, so as few hops as possible cross group boundaries.
         """
-        logger.info(f"Running local inference with {model_spec.name}")
+        local = [p for p in peers if p.group == self.group]
+        remote = [p for p in peers if p.group != self.group]
+        
+        memory = self.local_memory_gb + sum(p.memory_gb for p in local)
+        if not remote or memory >= model_spec.memory_gb:
+            return local
+        
+        return local + sorted(remote, key=lambda p: p.memory_gb, reverse=True)
         
-        # Simulate processing time
-        await asyncio.sleep(0.5)
+    @staticmethod
+    def _sequence_tokens(prompt: str, max_tokens: Optional[int]) -> int:
+        """Tokens a request will hold in KV cache: prompt plus output."""
+        # Mirrors the mock response in _decode: a short preamble, then the prompt
+        prompt_tokens = len(prompt.split())
+        return prompt_tokens + (max_tokens if max_tokens is not None else prompt_tokens + 8)
         
-        # Mock response
-        return f"[Local inference on {self.node_id}] Response to: {prompt}"
+    @staticmethod
+    def _stage_kv_bytes(model_spec: ModelSpec, partition: LayerPartition, tokens: int) -> int:
+        return model_spec.kv_bytes(tokens, partition.end_layer - partition.start_layer + 1)
         
-    async def _run_distributed_inference(
+    async def _decode(
         self,
         prompt: str,
         model_spec: ModelSpec,
         partitions: List[LayerPartition],
+        trace_id: str,
+        max_tokens: Optional[int],
+        session: Optional[Session] = None,
+        urgency: Optional[Urgency] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Prefill the prompt through the pipeline, then run one pass per
+        generated token.
+        
+        Layers run in the compute pool, locally or on the stage's node. The
+        response text is still mocked: each pass emits the next word of it.
+        Within a session only the new tokens are prefilled, on top of the
+        KV cache the earlier turns left on the stages.
+        
+        A long prefill runs in chunks of ``PREFILL_CHUNK`` tokens, and
+        stages run waiting decode steps ahead of each chunk, so a new long
+        prompt doesn't stall the sequences already generating.
+        
+        The request is dropped as soon as the pace so far says it can't
+        finish before its deadline.
+        """
+        urgency = urgency or Urgency()
+        if len(partitions) == 1 and partitions[0].node_id == self.node_id:
+            response = f"[Local inference on {self.node_id}] Response to: {prompt}"
+        else:
+            response = f"[Distributed inference across {len(partitions)} nodes] Response to: {prompt}"
+        words = response.split(" ")
+        count = len(words) if max_tokens is None else max_tokens
+        
+        if session:
+            seq_id = session.session_id
+            prefill = await self._resume_session(
+                session, model_spec, partitions, prompt, count, urgency
+            )
+        else:
+            seq_id = trace_id
+            prefill = prompt
+            await self._reserve_memory(
+                model_spec, partitions, seq_id, self.tokenizer.count(prompt) + count, urgency=urgency
+            )
+        
+        sent = 0
+        generated: List[str] = []
+        started = time.monotonic()
+        try:
+            with self.tracer.span(trace_id, "embed"):
+                hidden_state = await self._embed(model_spec, partitions, prefill)
+            
+            for i in range(count):
+                word = words[i % len(words)]
+                
+                urgency.check()
+                if i and urgency.deadline is not None:
+                    needed = (time.monotonic() - started) / i * (count - i)
+                    if needed > urgency.remaining():
+                        raise DeadlineExceeded(
+                            f"{count - i} tokens would take {needed:.1f}s, "
+                            f"{urgency.remaining():.1f}s left"
+                        )
+                
+                # Step 0 is the prefill over the whole prompt, one chunk per
+                # pass so stages run other sequences' decode steps in between;
+                # every later step feeds back the token just produced
+                if i:
+                    previous = words[(i - 1) % len(words)]
+                    hidden_state = await self._embed(model_spec, partitions, previous)
+                for chunk in range(0, hidden_state.shape[0], self.PREFILL_CHUNK):
+                    rows = hidden_state[chunk:chunk + self.PREFILL_CHUNK]
+                    try:
+                        await self._run_pipeline(
+                            model_spec, partitions, rows, trace_id, seq_id, urgency
+                        )
+                    except RPCError as e:
+                        # A stage dropped the step from its queue
+                        if urgency.remaining() <= 0:
+                            raise DeadlineExceeded(str(e))
+                        raise
+                    sent += rows.shape[0]
+                
+                piece = word if i == 0 else f" {word}"
+                generated.append(piece)
+                yield piece
+        except BaseException:
+            # A turn cut short leaves the stages' caches in an unknown state
+            if session:
+                await self._release_memory(session.partitions, seq_id)
+                session.reset()
+            raise
+        finally:
+            if not session:
+                await self._release_memory(partitions, seq_id)
+        
+        if session:
+            session.history += [prompt, "".join(generated)]
+            session.pending = words[(count - 1) % len(words)] if count else session.pending
+            session.tokens += sent
+        
+    async def _resume_session(
+        self,
+        session: Session,
+        model_spec: ModelSpec,
+        partitions: List[LayerPartition],
+        prompt: str,
+        count: int,
+        urgency: Urgency,
     ) -> str:
         """
-        Run distributed inference across nodes.
+        Reserve a session turn on every stage and pick what to prefill.
+        
+        Normally only the new tokens: the last token generated in the
+        previous turn, then the prompt. If the session moved pipelines or
+        any stage no longer holds its cache, the caches are dropped and the
+        whole conversation is prefilled again.
+        """
+        seq_id = session.session_id
+        if session.partitions != partitions:
+            await self._release_memory(session.partitions, seq_id)
+            session.reset()
+            session.partitions = partitions
+        
+        prefill = " ".join(text for text in (session.pending, prompt) if text)
+        cached = await self._reserve_memory(
+            model_spec,
+            partitions,
+            seq_id,
+            self.tokenizer.count(prefill) + count,
+            self.sessions.ttl,
+            urgency,
+        )
+        resumable = session.tokens or not session.history
+        if resumable and all(tokens == session.tokens for tokens in cached):
+            return prefill
+        
+        logger.info(f"Session {seq_id} lost its KV cache, prefilling the conversation again")
+        await self._release_memory(partitions, seq_id)
+        session.reset()
+        session.partitions = partitions
+        
+        prefill = " ".join(session.history + [prompt])
+        await self._reserve_memory(
+            model_spec,
+            partitions,
+            seq_id,
+            self.tokenizer.count(prefill) + count,
+            self.sessions.ttl,
+            urgency,
+        )
+        return prefill
+        
+    async def _embed(
+        self,
+        model_spec: ModelSpec,
+        partitions: List[LayerPartition],
+        text: str,
+    ) -> np.ndarray:
+        """
+        Tokenize ``text`` for the first stage.
+        
+        The stage normally gets the token ids and embeds them in the same
+        pass as its layers. If it has no room for the embedding table, the
+        lookup happens here and the embeddings are sent instead.
+        """
+        token_ids = self.tokenizer.encode(text)
+        first = partitions[0]
+        if first.node_id == self.node_id or self._stage_embeds.get(first.node_id, True):
+            return token_ids
         
-        This is a mock implementation for demonstration.
-        A real implementation would:
-        1. Send embeddings to first node
-        2. Pass hidden states between nodes
-        3. Get final output from last node
+        self.memory.hold_weights(f"{model_spec.name}:embedding", model_spec.embedding_bytes)
+        return await self.executor.run(embed_tokens, model_spec.name, token_ids)
+        
+    def session_key(self, client: str, session_id: str) -> str:
+        """
+        The key a client's session is stored, cached and leased under.
+
+        Session ids come from clients, so they're namespaced by this node
+        and the client: stages shared with other coordinators, and other
+        clients of this one, never see the same key.
+        """
+        return f"{self.node_id}:{client}:{session_id}"
+        
+    async def end_session(self, session_id: str, client: str = "local"):
+        """Forget a session and free its KV cache on every stage."""
+        for session in self.sessions.end(self.session_key(client, session_id)):
+            await self._release_memory(session.partitions, session.session_id)
+        
+    async def _expire_sessions(self):
+        for session in self.sessions.expire():
+            logger.info(f"Session {session.session_id} expired")
+            await self._release_memory(session.partitions, session.session_id)
+        
+    async def _reserve_memory(
+        self,
+        model_spec: ModelSpec,
+        partitions: List[LayerPartition],
+        seq_id: str,
+        tokens: int,
+        ttl: Optional[float] = None,
+        urgency: Optional[Urgency] = None,
+    ) -> List[int]:
         """
-        logger.info(f"Starting distributed inference across {len(partitions)} nodes")
+        Reserve weights and KV cache for ``tokens`` more tokens of a sequence
+        on every stage up front.
         
-        # Simulate layer-by-layer execution
-        current_hidden_state = f"embedding({prompt})"
+        If any stage can't take it, the stages already reserved are released
+        and MemoryExhausted is raised before any compute starts. Returns the
+        number of tokens each stage already had cached for the sequence.
+        """
+        reserved: List[LayerPartition] = []
+        cached: List[int] = []
+        try:
+            for partition in partitions:
+                params = {
+                    "sequence_id": seq_id,
+                    "model": model_spec.name,
+                    "start_layer": partition.start_layer,
+                    "end_layer": partition.end_layer,
+                    "tokens": tokens,
+                    "ttl": ttl,
+                    "priority": (urgency or Urgency()).priority,
+                }
+                if partition.node_id == self.node_id:
+                    reply = await self.handle_reserve(params, stream_weights=len(partitions) == 1)
+                else:
+                    try:
+                        reply = await self.transport.call(
+                            partition.ip_address,
+                            partition.port,
+                            "reserve",
+                            params,
+                            timeout=self.MEMORY_WAIT + self.HOP_TIMEOUT,
+                        )
+                    except RPCError as e:
+                        # Only a stage out of memory means back off; a dead
+                        # peer or a broken handler is an ordinary failure
+                        if e.code == MemoryExhausted.rpc_code:
+                            raise MemoryExhausted(f"{partition.node_id}: {e}")
+                        raise
+                reserved.append(partition)
+                cached.append(reply["cached_tokens"])
+                # Stages that don't say decode only what every node does
+                self._stage_codecs[partition.node_id] = set(CODECS) & set(
+                    reply.get("codecs", BASE_CODECS)
+                )
+                if partition.start_layer == 0:
+                    self._stage_embeds[partition.node_id] = reply.get("embeds", True)
+        except BaseException:
+            await self._release_memory(reserved, seq_id)
+            raise
+        return cached
         
+    async def _release_memory(self, partitions: List[LayerPartition], seq_id: str):
+        """Give back a sequence's reservations; stages that can't be reached expire them."""
         for partition in partitions:
-            logger.info(
+            if partition.node_id == self.node_id:
+                await self.handle_release({"sequence_id": seq_id})
+                continue
+            try:
+                await self.transport.call(
+                    partition.ip_address,
+                    partition.port,
+                    "release",
+                    {"sequence_id": seq_id},
+                    timeout=self.HOP_TIMEOUT,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to release memory on {partition.node_id}: {e}")
+        
+    async def handle_reserve(
+        self, params: Dict[str, Any], stream_weights: bool = False
+    ) -> Dict[str, Any]:
+        """
+        RPC handler: hold the weights of a layer range and reserve KV cache
+        for more tokens of a sequence. Replies with the memory left, the
+        tokens already cached for the sequence and, for the first stage,
+        whether it embeds the token ids it is sent.
+        
+        Weights over the budget raise MemoryExhausted, unless
+        ``stream_weights`` (this node runs the whole model itself).
+        """
+        model_spec = self.get_model_spec(params["model"])
+        layers = params["end_layer"] - params["start_layer"] + 1
+        seq_id = params["sequence_id"]
+        
+        # Cached entries of sequences whose lease expired are dead weight
+        for stale in list(self.kv_cache.sequences):
+            if stale not in self.memory.leases:
+                self.kv_cache.drop(stale)
+                self._priorities.pop(stale, None)
+                self._token_kv_bytes.pop(stale, None)
+        priority = params.get("priority", Urgency().priority)
+        self._priorities[seq_id] = priority
+        self._token_kv_bytes[seq_id] = model_spec.kv_bytes(1, layers)
+        
+        # With offload only a window of each sequence's KV stays in memory
+        cached = self.kv_cache.tokens(seq_id, params["start_layer"])
+        tokens = cached + params["tokens"]
+        if self.kv_cache.resident_tokens is not None:
+            tokens = min(tokens, self.kv_cache.resident_tokens)
+        
+        # The first stage embeds the token ids it is sent, if the embedding
+        # table fits next to its layers; otherwise the coordinator does
+        weights = model_spec.weight_bytes(layers)
+        embeds = (
+            params["start_layer"] == 0
+            and weights + model_spec.embedding_bytes <= self.memory.budget
+        )
+        if embeds:
+            weights += model_spec.embedding_bytes
+        
+        # Weights bigger than the whole budget can't stay resident. Running
+        # the whole model here as a last resort streams them in on every
+        # pass, so only the KV cache is reserved; a stage turns the work away
+        if weights <= self.memory.budget:
+            self.memory.hold_weights(model_spec.name, weights)
+        elif stream_weights:
+            self.memory.hold_weights(model_spec.name, 0)
+        else:
+            self._memory_rejections.inc(kind="weights")
+            raise MemoryExhausted(
+                f"Layers {params['start_layer']}-{params['end_layer']} of {model_spec.name} "
+                f"need {weights} bytes of weights, budget is {self.memory.budget}"
+            )
+        need = max(0, model_spec.kv_bytes(tokens, layers) - self.memory.held(seq_id))
+        if need > self.memory.headroom:
+            self._preempt(need - self.memory.headroom, priority)
+        try:
+            await self.memory.reserve(
+                seq_id,
+                need,
+                timeout=self.MEMORY_WAIT,
+                ttl=params.get("ttl"),
+            )
+        except MemoryExhausted:
+            self._memory_rejections.inc(kind="kv")
+            raise
+        return {
+            "headroom_bytes": self.memory.headroom,
+            "cached_tokens": cached,
+            "embeds": embeds,
+            "codecs": list(CODECS),
+        }
+        
+    async def handle_release(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """RPC handler: drop a sequence's KV cache and its reservation."""
+        self.kv_cache.drop(params["sequence_id"])
+        self.memory.release(params["sequence_id"])
+        self._priorities.pop(params["sequence_id"], None)
+        self._token_kv_bytes.pop(params["sequence_id"], None)
+        return {"headroom_bytes": self.memory.headroom}
+        
+    def _preempt(self, nbytes: int, priority: int):
+        """
+        Swap out the KV cache of less urgent sequences, least urgent first,
+        until ``nbytes`` are free. They swap back in at their next step.
+        """
+        victims = sorted(
+            (
+                (rank, self.memory.held(seq_id), seq_id)
+                for seq_id, rank in self._priorities.items()
+                if rank > priority and self.memory.held(seq_id)
+            ),
+            reverse=True,
+        )
+        for _, _, seq_id in victims:
+            if nbytes <= 0:
+                break
+            # The blocks being filled stay in memory, and keep their share
+            self.kv_cache.swap_out(seq_id)
+            keep = self.kv_cache.resident(seq_id) * self._token_kv_bytes.get(seq_id, 0)
+            nbytes -= self.memory.swap_out(seq_id, keep=keep)
+            self._preemptions.inc()
+            logger.info(f"Swapped out KV cache of {seq_id} for more urgent work")
+        
+    async def _run_pipeline(
+        self,
+        model_spec: ModelSpec,
+        partitions: List[LayerPartition],
+        hidden_state: np.ndarray,
+        trace_id: str,
+        seq_id: str,
+        urgency: Urgency,
+    ) -> np.ndarray:
+        """
+        One forward pass through every stage.
+        
+        The coordinator hands the hidden state to each stage in turn as a
+        HiddenStateFrame and carries the result on to the next.
+        """
+        for partition in partitions:
+            logger.debug(
                 f"Executing layers {partition.start_layer}-{partition.end_layer} "
                 f"on {partition.node_id}"
             )
             
-            # Simulate network transfer and computation
-            await asyncio.sleep(0.2)
+            if partition.node_id == self.node_id:
+                self.memory.renew(seq_id)
+                self.resident_models.add(model_spec.name)
+                hidden_state, spans = await self._compute(
+                    model_spec.name,
+                    partition.start_layer,
+                    partition.end_layer,
+                    hidden_state,
+                    seq_id,
+                    urgency,
+                )
+                self.tracer.add(trace_id, spans)
+                continue
             
-            # In reality, would send hidden_state to node and receive output
-            current_hidden_state = f"output_from_{partition.node_id}"
+            frame = HiddenStateFrame(
+                trace_id=trace_id,
+                model=model_spec.name,
+                start_layer=partition.start_layer,
+                end_layer=partition.end_layer,
+                hidden_state=hidden_state,
+                sequence_id=seq_id,
+                priority=urgency.priority,
+                deadline=urgency.deadline,
+            )
+            hidden_state = (await self._forward(partition, frame)).hidden_state
         
-        # Mock final response
-        result = f"[Distributed inference across {len(partitions)} nodes] Response to: {prompt}"
+        return hidden_state
+        
+    def _codec(self, node_id: str, dtype: np.dtype, rows: int) -> str:
+        """The activation codec for a frame on the link to ``node_id``."""
+        accepted = self._stage_codecs.get(node_id, BASE_CODECS)
+        if self.activation_codec == "auto":
+            return choose_codec(dtype, rows, self.links.bandwidth.get(node_id), accepted)
+        return fallback_codec(self.activation_codec, accepted)
+        
+    async def _forward(self, partition: LayerPartition, frame: HiddenStateFrame) -> HiddenStateFrame:
+        """
+        Send a frame to a remote stage and wait for its output.
+        
+        Both directions use the codec picked for the link, and the
+        transfer time feeds the link's bandwidth estimate.
+        """
+        rows = frame.hidden_state.shape[0]
+        codec = self._codec(partition.node_id, frame.hidden_state.dtype, rows)
+        reply_codec = self._codec(partition.node_id, np.dtype(np.float32), rows)
+        with self.tracer.span(frame.trace_id, "hop", dst=partition.node_id, codec=codec) as hop:
+            with self.profiler.section("serialize"):
+                wire = frame.to_wire(codec)
+            sent = HiddenStateFrame.wire_nbytes(wire)
+            hop.attrs["bytes"] = sent
+            if self.simulation:
+                await asyncio.sleep(self.simulation.transfer_delay(sent))
+            with self.profiler.section("send_receive"):
+                reply = await self.transport.call(
+                    partition.ip_address,
+                    partition.port,
+                    "forward",
+                    {"frame": wire, "reply_codec": reply_codec},
+                    timeout=self.HOP_TIMEOUT,
+                )
+            received = HiddenStateFrame.wire_nbytes(reply["frame"])
+            with self.profiler.section("deserialize"):
+                result = HiddenStateFrame.from_wire(reply["frame"])
+            if self.simulation:
+                await asyncio.sleep(self.simulation.transfer_delay(received))
+        
+        remote_spans = [Span.from_dict(span) for span in reply.get("spans", [])]
+        self.tracer.add(frame.trace_id, remote_spans)
+        
+        # Whatever part of the round trip the stage doesn't account for was
+        # spent on the wire
+        transfer = max(0.0, hop.duration - sum(span.duration for span in remote_spans))
+        self.links.observe(partition.node_id, sent + received, transfer)
+        self._hop_seconds.observe(transfer, src=self.node_id, dst=partition.node_id)
+        self._hop_bytes.inc(sent, src=self.node_id, dst=partition.node_id)
+        self._hop_bytes.inc(received, src=partition.node_id, dst=self.node_id)
+        self._hop_frames.inc(codec=wire["codec"])
+        self._hop_frames.inc(codec=reply["frame"].get("codec", "raw"))
         
-        logger.info("Distributed inference complete")
         return result
         
+    async def handle_forward(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        RPC handler: run a forwarded frame's layers on this node.
+        
+        Replies with the output frame and this node's spans for the work, so
+        the coordinator can put them on the request's timeline.
+        """
+        received_at = time.time()
+        started = time.perf_counter()
+        with self.profiler.section("deserialize"):
+            frame = HiddenStateFrame.from_wire(params["frame"])
+        spans = [
+            Span("receive", self.node_id, received_at, time.perf_counter() - started,
+                 {"bytes": frame.nbytes}),
+        ]
+        
+        seq_id = frame.sequence_id or frame.trace_id
+        self.active_requests += 1
+        try:
+            self.memory.renew(seq_id)
+            self.resident_models.add(frame.model)
+            hidden_state, compute_spans = await self._compute(
+                frame.model,
+                frame.start_layer,
+                frame.end_layer,
+                frame.hidden_state,
+                seq_id,
+                Urgency(frame.priority, frame.deadline),
+            )
+            spans += compute_spans
+        finally:
+            self.active_requests -= 1
+        
+        sent_at = time.time()
+        started = time.perf_counter()
+        with self.profiler.section("serialize"):
+            # Answer in the codec the coordinator picked for this link
+            reply = HiddenStateFrame(
+                frame.trace_id, frame.model, frame.start_layer, frame.end_layer, hidden_state
+            ).to_wire(params.get("reply_codec", "raw"))
+        spans.append(
+            Span("send", self.node_id, sent_at, time.perf_counter() - started,
+                 {"bytes": HiddenStateFrame.wire_nbytes(reply)})
+        )
+        
+        return {"frame": reply, "spans": [asdict(span) for span in spans]}
+        
+    async def _compute(
+        self,
+        model_name: str,
+        start_layer: int,
+        end_layer: int,
+        hidden_state: np.ndarray,
+        seq_id: str,
+        urgency: Urgency,
+    ) -> Tuple[np.ndarray, List[Span]]:
+        """
+        Run layers in the compute pool over the sequence's cached context,
+        then cache the new tokens. Returns the output and queue/compute spans.
+        
+        Steps of other sequences waiting for the same layers run in the same
+        micro-batch, most urgent first, and a sequence that was swapped out
+        takes its memory back before it runs.
+        """
+        layers = f"{start_layer}-{end_layer}"
+        model_spec = self.get_model_spec(model_name)
+        try:
+            swapped = await self.memory.swap_in(seq_id, timeout=self.MEMORY_WAIT)
+        except MemoryExhausted:
+            self._memory_rejections.inc(kind="kv")
+            raise
+        if swapped:
+            # The reservation is real again only once the blocks are back
+            await self.kv_cache.swap_in(seq_id)
+        
+        step = Step(seq_id, hidden_state, urgency)
+        kind = "prefill" if step.tokens > 1 else "decode"
+        hidden_state, started_at, finished_at, size = await self.batcher.run(
+            (model_name, start_layer, end_layer, kind),
+            step,
+            self._compute_batch,
+            room=lambda: self.memory.headroom // model_spec.activation_bytes(1),
+        )
+        
+        queued = max(0.0, started_at - step.submitted_at)
+        self._stage_seconds.observe(finished_at - started_at, model=model_name, layers=layers)
+        self._queue_wait_seconds.observe(queued, model=model_name, layers=layers)
+        self.profiler.record("queue", queued)
+        self.profiler.record("layer", finished_at - started_at, count=end_layer - start_layer + 1)
+        return hidden_state, [
+            Span("queue", self.node_id, step.submitted_at, queued, {"layers": layers}),
+            Span("compute", self.node_id, started_at, finished_at - started_at,
+                 {"layers": layers, "model": model_name, "batch": size}),
+        ]
+        
+    async def _compute_batch(
+        self,
+        key: Tuple[str, int, int, str],
+        steps: List[Step],
+    ) -> List[Tuple[np.ndarray, float, float, int]]:
+        """
+        Run one micro-batch of steps in the compute pool and cache their new
+        tokens. Returns each step's output, the batch's start and end time
+        and its size.
+        """
+        model_name, start_layer, end_layer, kind = key
+        layers = range(start_layer, end_layer + 1)
+        tokens = sum(step.tokens for step in steps)
+        activations = self.get_model_spec(model_name).activation_bytes(tokens)
+        
+        backend = await self.backend()
+        hits, misses = self.kv_cache.hits, self.kv_cache.misses
+        contexts = [await self.kv_cache.stream(step.seq_id, layers, fold_context) for step in steps]
+        self.kv_lookups.inc(self.kv_cache.hits - hits, result="hit")
+        self.kv_lookups.inc(self.kv_cache.misses - misses, result="miss")
+        
+        try:
+            async with self.memory.activations(activations, timeout=self.MEMORY_WAIT):
+                started_at, finished_at, (outputs, inputs) = await self.executor.run(
+                    timed,
+                    backend.attend_batch,
+                    model_name,
+                    start_layer,
+                    end_layer,
+                    [step.hidden_state for step in steps],
+                    contexts,
+                )
+        except MemoryExhausted:
+            self._memory_rejections.inc(kind="activations")
+            raise
+        
+        if self.simulation:
+            delay = self.simulation.compute_delay(len(layers), tokens)
+            await asyncio.sleep(delay)
+            finished_at += delay
+        
+        for step, step_inputs in zip(steps, inputs):
+            for layer, rows in zip(layers, step_inputs):
+                self.kv_cache.append(step.seq_id, layer, rows)
+            # Read the first spilled block back while the other stages run
+            self.kv_cache.prefetch(step.seq_id)
+        
+        self._batch_steps.observe(len(steps), kind=kind)
+        return [(output, started_at, finished_at, len(steps)) for output in outputs]
+        
     def get_partition_info(self) -> List[Dict]:
         """Get current partition information."""
         return [
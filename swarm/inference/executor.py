@@ -0,0 +1,215 @@
+"""
+Worker pool for layer execution.
+
+Keeps model compute off the asyncio event loop so discovery callbacks and
+networking stay responsive while layers saturate the CPU.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_MODES = ("thread", "process")
+
+# Environment variables read by the common BLAS / OpenMP runtimes
+_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def plan_threads(
+    cpu_count: int,
+    workers: Optional[int] = None,
+    intra_op_threads: Optional[int] = None,
+) -> Tuple[int, int]:
+    """
+    Split the CPU budget between pool workers and intra-op threads.
+
+    Returns (workers, intra_op_threads) such that their product does not
+    exceed ``cpu_count`` unless the caller explicitly asked for more.
+    """
+    for name, value in (("workers", workers), ("intra_op_threads", intra_op_threads)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}")
+    cpu_count = max(1, cpu_count or 1)
+
+    if workers is None and intra_op_threads is None:
+        workers = min(cpu_count, 4)
+    if workers is None:
+        workers = max(1, cpu_count // intra_op_threads)
+    if intra_op_threads is None:
+        intra_op_threads = max(1, cpu_count // workers)
+
+    return max(1, workers), max(1, intra_op_threads)
+
+
+def _limit_threads(threads: int) -> Callable[[], None]:
+    """
+    Set the live per-kernel thread count of the loaded BLAS runtimes and
+    torch; returns a function that puts the previous counts back.
+    """
+    restores = []
+
+    # NumPy's BLAS is usually loaded by now and ignores the environment;
+    # threadpoolctl changes its live thread count
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        logger.debug("threadpoolctl not installed; BLAS thread count left as loaded")
+    else:
+        restores.append(threadpool_limits(limits=threads).restore_original_limits)
+
+    # Only touch torch if something already imported it; importing it here
+    # would cost seconds on every worker start.
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        previous = torch.get_num_threads()
+        try:
+            torch.set_num_threads(threads)
+        except RuntimeError:
+            pass
+        else:
+            restores.append(partial(torch.set_num_threads, previous))
+
+    def restore():
+        for undo in reversed(restores):
+            try:
+                undo()
+            except RuntimeError:
+                pass
+
+    return restore
+
+
+def _configure_worker_process(threads: int):
+    """Limit per-kernel threading for the life of a pool worker process."""
+    # Read by BLAS runtimes only when they load: covers libraries the
+    # worker imports later
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    _limit_threads(threads)
+
+
+class _ThreadLimits:
+    """
+    Per-kernel thread limits held while any compute call runs in a thread
+    pool. The limits are process-wide, so they are set when the first call
+    starts and the previous ones come back when the last call ends.
+    """
+
+    def __init__(self, threads: int):
+        self.threads = threads
+        self._active = 0
+        self._restore: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            if self._active == 0:
+                self._restore = _limit_threads(self.threads)
+            self._active += 1
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._restore()
+                self._restore = None
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self:
+            return fn(*args, **kwargs)
+
+
+class LayerExecutor:
+    """
+    Runs blocking layer compute in a dedicated worker pool.
+
+    ``thread`` mode suits kernels that release the GIL (NumPy, torch);
+    ``process`` mode sidesteps the GIL for pure-Python compute at the cost
+    of pickling hidden states across the process boundary.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 1,
+        intra_op_threads: int = 1,
+    ):
+        if mode not in COMPUTE_MODES:
+            raise ValueError(f"Unknown compute mode: {mode!r} (expected one of {COMPUTE_MODES})")
+
+        self.mode = mode
+        self.workers = workers
+        self.intra_op_threads = intra_op_threads
+        self._pool: Optional[Executor] = None
+        self._limits: Optional[_ThreadLimits] = None
+
+    @classmethod
+    def for_cpu_count(
+        cls,
+        cpu_count: int,
+        mode: str = "thread",
+        workers: Optional[int] = None,
+        intra_op_threads: Optional[int] = None,
+    ) -> "LayerExecutor":
+        """Create an executor sized for a machine with ``cpu_count`` cores."""
+        workers, intra_op_threads = plan_threads(cpu_count, workers, intra_op_threads)
+        return cls(mode=mode, workers=workers, intra_op_threads=intra_op_threads)
+
+    def start(self):
+        """Create the worker pool."""
+        if self._pool is not None:
+            return
+
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_configure_worker_process,
+                initargs=(self.intra_op_threads,),
+            )
+        else:
+            # Workers share this process: its thread counts are only
+            # limited while compute runs, and left as they were after
+            self._limits = _ThreadLimits(self.intra_op_threads)
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="swarm-compute",
+            )
+
+        logger.info(
+            f"Compute pool started: {self.workers} {self.mode} worker(s), "
+            f"{self.intra_op_threads} intra-op thread(s) each"
+        )
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``fn(*args, **kwargs)`` in the pool and await the result."""
+        if self._pool is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        if self._limits is not None:
+            return await loop.run_in_executor(
+                self._pool, partial(self._limits.run, fn, *args, **kwargs)
+            )
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the worker pool."""
+        if self._pool is None:
+            return
+
+        self._pool.shutdown(wait=wait)
+        self._pool = None
+        self._limits = None
@@ -0,0 +1,410 @@
+"""
+Per-node KV cache with an optional disk tier.
+
+Every stage keeps the KV entries of the sequences passing through it, per
+layer, in fixed-size blocks of tokens. With offload enabled, only the
+newest blocks of each layer stay in memory. Older, full blocks spill to a
+memory-mapped file on local disk, written off the event loop. A step streams a layer's blocks through
+attention one at a time: each spilled block is paged in while the one
+before it is consumed, then dropped again, so at most two sit in memory
+next to the resident window. A prefetch started after each step reads the
+first one back in the background, so the next step seldom waits on disk.
+
+Long contexts then cost disk space instead of RAM, which lets small nodes
+serve them instead of rejecting them.
+
+A whole sequence can also be swapped out on demand, offload or not, to
+make room for more urgent work; its blocks page back in the same way.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _SpillFile:
+    """A growable memory-mapped file of equally sized slots."""
+
+    def __init__(self, path: str, slot_bytes: int):
+        self.path = path
+        self.slot_bytes = slot_bytes
+        self.slots = 0
+        self.free: List[int] = []
+        self._file = open(path, "w+b")
+        self._map: Optional[np.memmap] = None
+        self._grow(64)
+
+    def _grow(self, slots: int):
+        if self._map is not None:
+            self._map.flush()
+        self._file.truncate(slots * self.slot_bytes)
+        self._map = np.memmap(self._file, dtype=np.uint8, mode="r+", shape=(slots * self.slot_bytes,))
+        self.free.extend(range(self.slots, slots))
+        self.slots = slots
+
+    def write(self, data: np.ndarray) -> int:
+        if not self.free:
+            self._grow(self.slots * 2)
+        slot = self.free.pop()
+        offset = slot * self.slot_bytes
+        self._map[offset:offset + self.slot_bytes] = np.frombuffer(data.tobytes(), dtype=np.uint8)
+        return slot
+
+    def read(self, slot: int, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        offset = slot * self.slot_bytes
+        return np.frombuffer(self._map[offset:offset + self.slot_bytes].tobytes(), dtype=dtype).reshape(shape)
+
+    def release(self, slot: int):
+        self.free.append(slot)
+
+    def close(self):
+        self._map = None
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class _Block:
+    """Up to ``block_tokens`` cached rows of one layer of one sequence."""
+
+    shape: Tuple[int, ...]
+    dtype: np.dtype
+    rows: Optional[np.ndarray] = None  # None once spilled; the first ``used`` rows are valid
+    used: int = 0
+    slot: Optional[int] = None  # where the block lives on disk once spilled
+    staged: Optional[np.ndarray] = None  # prefetched copy of a spilled block
+    spilling: bool = False  # queued for disk; stays readable in memory until written
+    dropped: bool = False  # its sequence was dropped while it was being written
+
+    @classmethod
+    def empty(cls, block_tokens: int, like: np.ndarray) -> "_Block":
+        shape = (block_tokens,) + like.shape[1:]
+        return cls(shape, like.dtype, np.empty(shape, like.dtype))
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    @property
+    def resident(self) -> bool:
+        return self.rows is not None
+
+
+class KVCache:
+    """
+    KV blocks keyed by sequence id and layer.
+
+    ``resident_blocks`` full blocks per layer are kept in memory, plus the
+    block being filled. Older blocks spill to ``spill_dir``. Without a
+    ``spill_dir`` nothing spills, except sequences swapped out explicitly
+    (those go to a temporary directory).
+
+    Usage:
+        cache = KVCache(spill_dir="/mnt/ssd/swarm-kv", resident_blocks=8)
+        states = await cache.stream(seq_id, range(start, end + 1), fold_context)
+        ...
+        cache.append(seq_id, layer, rows)
+    """
+
+    def __init__(
+        self,
+        block_tokens: int = 16,
+        resident_blocks: int = 32,
+        spill_dir: Optional[str] = None,
+    ):
+        self.block_tokens = block_tokens
+        self.resident_blocks = resident_blocks
+        self.spill_dir = spill_dir
+        self.sequences: Dict[str, Dict[int, List[_Block]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._spill: Dict[int, _SpillFile] = {}
+        self._prefetching: Dict[str, Tuple[_Block, asyncio.Task]] = {}
+        self._writes: List[_Block] = []
+        self._writing: Optional[asyncio.Task] = None
+
+    @property
+    def offload(self) -> bool:
+        return self.spill_dir is not None
+
+    @property
+    def resident_tokens(self) -> Optional[int]:
+        """Most tokens a layer of one sequence keeps in memory (None: no limit)."""
+        if not self.offload:
+            return None
+        # The full blocks kept, the block being filled, the spilled block
+        # being consumed and the next one prefetched
+        return (self.resident_blocks + 3) * self.block_tokens
+
+    def tokens(self, seq_id: str, layer: int) -> int:
+        """Tokens cached for a layer of a sequence."""
+        blocks = self.sequences.get(seq_id, {}).get(layer, [])
+        return sum(block.used for block in blocks)
+
+    def append(self, seq_id: str, layer: int, rows: np.ndarray):
+        """Cache the entries of new tokens for a layer."""
+        blocks = self.sequences.setdefault(seq_id, {}).setdefault(layer, [])
+        while len(rows):
+            if not blocks or blocks[-1].used == self.block_tokens:
+                blocks.append(_Block.empty(self.block_tokens, rows))
+                self._spill_cold(blocks)
+            block = blocks[-1]
+            take = min(len(rows), self.block_tokens - block.used)
+            block.rows[block.used:block.used + take] = rows[:take]
+            block.used += take
+            rows = rows[take:]
+
+    async def stream(
+        self,
+        seq_id: str,
+        layers: Iterable[int],
+        fold: Callable[[Any, np.ndarray], Any],
+    ) -> List[Any]:
+        """
+        Fold the cached entries of each of ``layers`` through ``fold``, a
+        block at a time, oldest token first.
+
+        ``fold(state, rows)`` starts from None; a layer with nothing cached
+        stays None. Spilled blocks are read back one at a time, the next
+        one in the background while the current one is folded, so a long
+        history never sits in memory whole.
+        """
+        layers = [self.sequences.get(seq_id, {}).get(layer, []) for layer in layers]
+        spilled = [block for blocks in layers for block in blocks if not block.resident]
+        upcoming = iter(spilled[1:])
+
+        states = []
+        for blocks in layers:
+            state = None
+            for block in blocks:
+                if block.resident:
+                    self.hits += 1
+                    rows = block.rows[:block.used]
+                else:
+                    rows = await self._take(seq_id, block)
+                    following = next(upcoming, None)
+                    if following is not None:
+                        self._prefetch_block(seq_id, following)
+                state = fold(state, rows)
+            states.append(state)
+        return states
+
+    def prefetch(self, seq_id: str):
+        """
+        Start reading a sequence's first spilled block back in the
+        background; the rest follow while the next step streams.
+        """
+        if not self.offload:
+            return
+        block = next(
+            (
+                block
+                for layers in self.sequences.get(seq_id, {}).values()
+                for block in layers
+                if not block.resident
+            ),
+            None,
+        )
+        if block is not None:
+            self._prefetch_block(seq_id, block)
+
+    def _prefetch_block(self, seq_id: str, block: _Block):
+        if seq_id in self._prefetching or block.staged is not None:
+            return
+        task = asyncio.create_task(self._load([block]))
+        task.add_done_callback(lambda done: self._prefetched(seq_id, done))
+        self._prefetching[seq_id] = (block, task)
+
+    def _prefetched(self, seq_id: str, task: asyncio.Task):
+        if self._prefetching.get(seq_id, (None, None))[1] is task:
+            del self._prefetching[seq_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"KV prefetch for {seq_id} failed: {task.exception()}")
+
+    async def _take(self, seq_id: str, block: _Block) -> np.ndarray:
+        """A spilled block's rows, from its prefetch if one ran; unstages it."""
+        pending = self._prefetching.get(seq_id)
+        if pending is not None and pending[0] is block:
+            await asyncio.wait([pending[1]])
+        if block.staged is None:
+            self.misses += 1
+            await self._load([block])
+        else:
+            self.hits += 1
+        rows, block.staged = block.staged, None
+        return rows
+
+    def resident(self, seq_id: str) -> int:
+        """Most tokens any layer of a sequence keeps in memory."""
+        return max(
+            (
+                sum(block.used for block in blocks if block.resident and not block.spilling)
+                for blocks in self.sequences.get(seq_id, {}).values()
+            ),
+            default=0,
+        )
+
+    def swap_out(self, seq_id: str) -> int:
+        """
+        Move every full block of a sequence to disk; returns the bytes freed.
+
+        The blocks being filled stay in memory: they're small and the next
+        step writes to them. The writes happen in the background; see ``flush``.
+        """
+        blocks = [
+            block
+            for layer in self.sequences.get(seq_id, {}).values()
+            for block in layer[:-1]
+        ]
+        return self._spill_blocks(blocks)
+
+    async def flush(self):
+        """Wait until the blocks queued for disk have been written."""
+        while self._writing is not None:
+            await asyncio.wait([self._writing])
+
+    async def swap_in(self, seq_id: str):
+        """
+        Read the blocks ``swap_out`` moved to disk back into memory, once
+        their memory is reserved again. With offload only the resident
+        window comes back; older blocks keep streaming from disk.
+        """
+        pending = self._prefetching.get(seq_id)
+        if pending is not None:
+            await asyncio.wait([pending[1]])
+        await self.flush()
+
+        blocks = []
+        for layer in self.sequences.get(seq_id, {}).values():
+            full = layer[:-1]
+            if self.offload:
+                full = full[max(0, len(full) - self.resident_blocks):]
+            blocks += [block for block in full if not block.resident]
+        missing = [block for block in blocks if block.staged is None]
+        if missing:
+            await self._load(missing)
+
+        for block in blocks:
+            block.rows, block.staged = block.staged, None
+            self._spill[block.nbytes].release(block.slot)
+            block.slot = None
+
+    def drop(self, seq_id: str):
+        """Forget a sequence and free its disk slots."""
+        pending = self._prefetching.pop(seq_id, None)
+        if pending is not None:
+            pending[1].cancel()
+        for blocks in self.sequences.pop(seq_id, {}).values():
+            for block in blocks:
+                block.dropped = True
+                if block.slot is not None:
+                    self._spill[block.nbytes].release(block.slot)
+
+    def stats(self) -> Dict[str, int]:
+        """Sequences held, bytes in memory and on disk, and block lookups."""
+        resident = spilled = 0
+        for layers in self.sequences.values():
+            for blocks in layers.values():
+                for block in blocks:
+                    if block.resident:
+                        resident += block.nbytes
+                    else:
+                        spilled += block.nbytes
+        return {
+            "sequences": len(self.sequences),
+            "resident_bytes": resident,
+            "spilled_bytes": spilled,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        for _, task in self._prefetching.values():
+            task.cancel()
+        self._prefetching.clear()
+        if self._writing is not None:
+            self._writing.cancel()
+            self._writing = None
+        self._writes.clear()
+        self.sequences.clear()
+        for spill in self._spill.values():
+            spill.close()
+        self._spill.clear()
+
+    def _spill_cold(self, blocks: List[_Block]):
+        """Move full blocks beyond the resident window of a layer to disk."""
+        if not self.offload:
+            return
+        # The last block is the one being filled
+        full = blocks[:-1]
+        self._spill_blocks(full[:max(0, len(full) - self.resident_blocks)])
+
+    def _spill_blocks(self, blocks: List[_Block]) -> int:
+        """Queue resident blocks for disk; returns their bytes."""
+        queued = [block for block in blocks if block.resident and not block.spilling]
+        for block in queued:
+            block.spilling = True
+        self._writes += queued
+        if queued and self._writing is None:
+            self._writing = asyncio.create_task(self._write())
+        return sum(block.nbytes for block in queued)
+
+    async def _write(self):
+        """Write queued blocks to disk off the event loop, then free their rows."""
+        loop = asyncio.get_running_loop()
+        blocks: List[_Block] = []
+        try:
+            while self._writes:
+                blocks = [block for block in self._writes if not block.dropped]
+                self._writes = []
+                spills = [self._spill_file(block.nbytes) for block in blocks]
+
+                def write() -> List[int]:
+                    return [spill.write(block.rows) for spill, block in zip(spills, blocks)]
+
+                slots = await loop.run_in_executor(None, write)
+                for spill, block, slot in zip(spills, blocks, slots):
+                    if block.dropped:
+                        spill.release(slot)
+                    else:
+                        block.slot, block.rows = slot, None
+                    block.spilling = False
+        finally:
+            # Blocks whose write failed or was cancelled stay in memory
+            for block in blocks + self._writes:
+                block.spilling = False
+            self._writes = []
+            self._writing = None
+
+    def _spill_file(self, slot_bytes: int) -> _SpillFile:
+        spill = self._spill.get(slot_bytes)
+        if spill is None:
+            directory = self.spill_dir or os.path.join(tempfile.gettempdir(), "swarm-kv")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"kv-{os.getpid()}-{id(self):x}-{slot_bytes}.bin")
+            spill = self._spill[slot_bytes] = _SpillFile(path, slot_bytes)
+            logger.info(f"Spilling KV cache blocks to {path}")
+        return spill
+
+    async def _load(self, blocks: List[_Block]):
+        """Read spilled blocks into their staging copies, off the event loop."""
+        loop = asyncio.get_running_loop()
+
+        def read() -> List[np.ndarray]:
+            return [
+                self._spill[block.nbytes].read(block.slot, block.dtype, block.shape)
+                for block in blocks
+            ]
+
+        for block, rows in zip(blocks, await loop.run_in_executor(None, read)):
+            block.staged = rows[:block.used]
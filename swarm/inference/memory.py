@@ -0,0 +1,214 @@
+"""
+Per-node memory accounting.
+
+A node only takes on work it has memory for. The accountant tracks three
+kinds of memory against the node's budget: weights of the layers it
+serves, KV cache reserved for each request for its whole lifetime, and
+activations held while a stage computes. Work that doesn't fit waits
+briefly for memory to be released, then is rejected with MemoryExhausted.
+A rejected request fails before it starts, instead of the node running
+out of memory partway through a pipeline.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryExhausted(Exception):
+    """Raised when a reservation doesn't fit in the memory budget."""
+
+    # Sent with the RPC error, so a remote rejection is raised as this again
+    rpc_code = "memory_exhausted"
+
+
+class MemoryAccountant:
+    """
+    Reserves a node's memory for weights, KV cache and activations.
+
+    KV reservations are leases named after the request holding them. A
+    lease that isn't renewed within ``lease_ttl`` seconds is reclaimed, so
+    memory isn't leaked when a coordinator disappears mid-request.
+
+    Usage:
+        memory = MemoryAccountant(budget_bytes=4 * 1024**3)
+        await memory.reserve("request-id", kv_bytes, timeout=1.0)
+        try:
+            async with memory.activations(nbytes):
+                ...
+        finally:
+            memory.release("request-id")
+    """
+
+    def __init__(self, budget_bytes: float, lease_ttl: float = 60.0):
+        self.budget = int(budget_bytes)
+        self.lease_ttl = lease_ttl
+        self.weights: Dict[str, int] = {}
+        self.leases: Dict[str, Tuple[int, float, float]] = {}  # lease id -> (bytes, expiry, ttl)
+        self.activation_bytes = 0
+        self.swapped: Dict[str, int] = {}  # lease id -> bytes to reserve again on swap-in
+        self._released_event: Optional[asyncio.Event] = None
+
+    @property
+    def _released(self) -> asyncio.Event:
+        # Created inside the running loop: before 3.10 an event binds to the
+        # loop current at construction, and nodes are built outside it
+        if self._released_event is None:
+            self._released_event = asyncio.Event()
+        return self._released_event
+
+    @property
+    def kv_bytes(self) -> int:
+        return sum(lease[0] for lease in self.leases.values())
+
+    @property
+    def used(self) -> int:
+        return sum(self.weights.values()) + self.kv_bytes + self.activation_bytes
+
+    @property
+    def headroom(self) -> int:
+        """Bytes still free for new reservations."""
+        self._expire()
+        return max(0, self.budget - self.used)
+
+    def hold_weights(self, model: str, nbytes: int):
+        """
+        Account for the weights this node keeps resident for ``model``.
+
+        A node serves one layer range per model, so this replaces whatever
+        was held for the model before.
+        """
+        previous = self.weights.get(model, 0)
+        self.weights[model] = int(nbytes)
+        if nbytes > self.budget - self.used + previous:
+            logger.warning(
+                f"Weights of {model} ({nbytes / 1024**3:.2f}GB) leave no room for KV cache "
+                f"in a {self.budget / 1024**3:.2f}GB budget"
+            )
+        if nbytes < previous:
+            self._released.set()
+
+    async def reserve(
+        self,
+        lease_id: str,
+        nbytes: int,
+        timeout: float = 0.0,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Reserve ``nbytes`` more of KV cache under ``lease_id``.
+
+        Waits up to ``timeout`` seconds for other reservations to be
+        released. Raises MemoryExhausted if the memory doesn't free up in
+        time, or right away if the request could never fit. ``ttl``
+        overrides ``lease_ttl`` for this lease.
+        """
+        await self._acquire(int(nbytes), timeout, f"KV cache for {lease_id}")
+        ttl = ttl or self.lease_ttl
+        self.leases[lease_id] = (self.held(lease_id) + int(nbytes), time.monotonic() + ttl, ttl)
+
+    def held(self, lease_id: str) -> int:
+        """Bytes reserved under ``lease_id``."""
+        lease = self.leases.get(lease_id)
+        return lease[0] if lease else 0
+
+    def renew(self, lease_id: str):
+        """Push back the expiry of a lease that is still in use."""
+        lease = self.leases.get(lease_id)
+        if lease is not None:
+            self.leases[lease_id] = (lease[0], time.monotonic() + lease[2], lease[2])
+
+    def release(self, lease_id: str):
+        """Give back everything reserved under ``lease_id``."""
+        self.swapped.pop(lease_id, None)
+        if self.leases.pop(lease_id, None) is not None:
+            self._released.set()
+
+    def swap_out(self, lease_id: str, keep: int = 0) -> int:
+        """
+        Free a lease's bytes beyond ``keep`` while keeping the lease, after
+        its KV cache was moved to disk; ``keep`` covers what stayed in
+        memory. Returns the bytes freed.
+        """
+        lease = self.leases.get(lease_id)
+        freed = max(0, lease[0] - int(keep)) if lease else 0
+        if not freed:
+            return 0
+        self.swapped[lease_id] = self.swapped.get(lease_id, 0) + freed
+        self.leases[lease_id] = (lease[0] - freed, lease[1], lease[2])
+        self._released.set()
+        return freed
+
+    async def swap_in(self, lease_id: str, timeout: float = 0.0) -> bool:
+        """
+        Reserve a swapped-out lease's bytes again before it is used; the
+        caller then brings its KV cache back into them. Returns whether the
+        lease was swapped out.
+        """
+        nbytes = self.swapped.get(lease_id)
+        if nbytes is None:
+            return False
+        lease = self.leases.get(lease_id)
+        await self.reserve(lease_id, nbytes, timeout, ttl=lease[2] if lease else None)
+        self.swapped.pop(lease_id, None)
+        return True
+
+    @asynccontextmanager
+    async def activations(self, nbytes: int, timeout: float = 0.0) -> AsyncIterator[None]:
+        """Hold ``nbytes`` of activation memory for the duration of the block."""
+        nbytes = int(nbytes)
+        await self._acquire(nbytes, timeout, "activations")
+        self.activation_bytes += nbytes
+        try:
+            yield
+        finally:
+            self.activation_bytes -= nbytes
+            self._released.set()
+
+    def usage(self) -> Dict[str, int]:
+        """Budget and reserved bytes by kind."""
+        self._expire()
+        return {
+            "budget": self.budget,
+            "weights": sum(self.weights.values()),
+            "kv": self.kv_bytes,
+            "activations": self.activation_bytes,
+            "headroom": max(0, self.budget - self.used),
+        }
+
+    async def _acquire(self, nbytes: int, timeout: float, what: str):
+        """Wait until ``nbytes`` fits in the budget."""
+        if nbytes > self.budget - sum(self.weights.values()):
+            raise MemoryExhausted(
+                f"{what} needs {nbytes / 1024**2:.1f}MB, more than this node can ever hold"
+            )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while nbytes > self.headroom:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise MemoryExhausted(
+                    f"{what} needs {nbytes / 1024**2:.1f}MB, "
+                    f"only {self.headroom / 1024**2:.1f}MB free"
+                )
+
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [lease_id for lease_id, lease in self.leases.items() if lease[1] < now]
+        for lease_id in expired:
+            logger.warning(f"Reclaiming expired memory lease {lease_id}")
+            del self.leases[lease_id]
+            self.swapped.pop(lease_id, None)
+        if expired:
+            self._released.set()
@@ -0,0 +1,72 @@
+"""
+Data-parallel request routing.
+
+When the cluster holds several complete pipelines for a model, each
+request goes to the least-loaded one.
+"""
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from swarm.inference.coordinator import LayerPartition
+
+Pipeline = List["LayerPartition"]
+
+
+def pipeline_key(pipeline: Pipeline) -> Tuple[str, ...]:
+    """Identify a pipeline by its chain of node ids."""
+    return tuple(p.node_id for p in pipeline)
+
+
+class PipelineRouter:
+    """
+    Picks a pipeline per request by queue depth.
+
+    Pipelines with room for the request (as judged by the caller's ``fits``
+    check, e.g. on reported memory headroom) are preferred over ones
+    without.
+
+    A pipeline's depth is the number of requests this router has in flight
+    on it plus the deepest queue any of its nodes reports, since a pipeline
+    moves only as fast as its busiest stage.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[Tuple[str, ...], int] = {}
+
+    def depth(self, pipeline: Pipeline, queue_depths: Mapping[str, int]) -> int:
+        """Current load on a pipeline."""
+        reported = max((queue_depths.get(p.node_id, 0) for p in pipeline), default=0)
+        return self.inflight.get(pipeline_key(pipeline), 0) + reported
+
+    def select(
+        self,
+        pipelines: List[Pipeline],
+        queue_depths: Mapping[str, int],
+        fits: Optional[Callable[[Pipeline], bool]] = None,
+    ) -> Pipeline:
+        """Least-loaded pipeline that fits; ties go to the shortest chain."""
+        return min(
+            pipelines,
+            key=lambda p: (fits is not None and not fits(p), self.depth(p, queue_depths), len(p)),
+        )
+
+    @contextmanager
+    def route(
+        self,
+        pipelines: List[Pipeline],
+        queue_depths: Mapping[str, int],
+        fits: Optional[Callable[[Pipeline], bool]] = None,
+    ) -> Iterator[Pipeline]:
+        """Select a pipeline and count the request against it until done."""
+        pipeline = self.select(pipelines, queue_depths, fits)
+        key = pipeline_key(pipeline)
+
+        self.inflight[key] = self.inflight.get(key, 0) + 1
+        try:
+            yield pipeline
+        finally:
+            self.inflight[key] -= 1
+            if not self.inflight[key]:
+                del self.inflight[key]
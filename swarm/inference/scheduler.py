@@ -0,0 +1,125 @@
+"""
+Priority- and deadline-aware scheduling of layer compute.
+
+Interactive and batch traffic share the same stages. Each stage hands its
+compute slots to the most urgent waiting step first: by priority class,
+then decode steps ahead of prefill, then by earliest deadline, then by
+arrival. Decode runs one step at a
+time, so a long batch generation gives way to interactive requests
+between its tokens. Steps whose deadline passes while they wait are
+dropped instead of run.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+
+# Lower rank is more urgent
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request can no longer finish before its deadline."""
+
+
+def priority_rank(priority: str) -> int:
+    """Rank of a priority class name."""
+    try:
+        return PRIORITIES[priority]
+    except KeyError:
+        raise ValueError(f"Unknown priority: {priority!r} (expected one of {list(PRIORITIES)})")
+
+
+@dataclass
+class Urgency:
+    """How urgent a request's work is: priority rank and deadline (Unix time)."""
+
+    priority: int = PRIORITIES["normal"]
+    deadline: Optional[float] = None
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (infinite without one)."""
+        return math.inf if self.deadline is None else self.deadline - time.time()
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("Deadline passed")
+
+
+class StepScheduler:
+    """
+    ``slots`` concurrent compute steps, granted most urgent first.
+
+    Usage:
+        async with scheduler.slot(urgency):
+            await executor.run(...)
+    """
+
+    def __init__(self, slots: int = 1):
+        self.slots = slots
+        self.active = 0
+        self._waiting: List[Tuple[int, bool, float, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiting if not future.done())
+
+    @asynccontextmanager
+    async def slot(self, urgency: Urgency, prefill: bool = False) -> AsyncIterator[None]:
+        """Hold a compute slot for the duration of the block."""
+        await self.acquire(urgency, prefill)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, urgency: Urgency, prefill: bool = False):
+        """
+        Wait for a compute slot; pair with ``release``. Within a priority
+        class, prefill waits behind decode steps, which keeps inter-token
+        latency flat while long prompts are admitted. Raises
+        DeadlineExceeded if the deadline passes first.
+        """
+        urgency.check()
+        if self.active < self.slots and not self.queued:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        deadline = math.inf if urgency.deadline is None else urgency.deadline
+        heapq.heappush(
+            self._waiting, (urgency.priority, prefill, deadline, next(self._order), future)
+        )
+
+        remaining = urgency.remaining()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), None if remaining == math.inf else remaining)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Granted just as the deadline passed; hand the slot on
+                self.release()
+            else:
+                future.cancel()
+            raise DeadlineExceeded("Deadline passed while queued for compute")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        """Give back a slot, straight to the most urgent live waiter."""
+        while self._waiting:
+            *_, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
@@ -0,0 +1,79 @@
+"""
+Conversation sessions.
+
+A session pins a multi-turn conversation to one pipeline, so the KV cache
+built by earlier turns stays on the stages that will run the next one.
+Each turn then prefills only its new tokens. A session remembers the
+conversation's text as well; if a stage lost its cache (eviction,
+restart, a pipeline change), the next turn re-prefills the whole history
+without the caller noticing.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from swarm.inference.router import Pipeline
+
+
+@dataclass
+class Session:
+    """State of one conversation."""
+
+    session_id: str
+    model: str
+    partitions: Pipeline = field(default_factory=list)
+    history: List[str] = field(default_factory=list)  # text of earlier turns
+    pending: str = ""  # last generated token, not yet run through the pipeline
+    tokens: int = 0  # tokens each stage should hold in KV cache
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def reset(self):
+        """Forget where the KV cache lives; the next turn re-prefills."""
+        self.partitions = []
+        self.pending = ""
+        self.tokens = 0
+
+
+class SessionStore:
+    """
+    Sessions by id, forgotten ``ttl`` seconds after their last turn.
+
+    Usage:
+        session = sessions.get("chat-42", "default")
+        async with session.lock:
+            ...
+        for expired in sessions.expire():
+            ...  # release its KV cache
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+        self.sessions: Dict[str, Session] = {}
+
+    def get(self, session_id: str, model: str) -> Session:
+        """The session with this id, started for ``model`` if unknown."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id, model)
+        session.last_used = time.monotonic()
+        return session
+
+    def end(self, session_id: str) -> List[Session]:
+        """Forget a session; returns it (if known) so its cache can be released."""
+        session = self.sessions.pop(session_id, None)
+        return [session] if session else []
+
+    def expire(self) -> List[Session]:
+        """Forget idle sessions and return them."""
+        cutoff = time.monotonic() - self.ttl
+        expired = [
+            session
+            for session in self.sessions.values()
+            if session.last_used < cutoff and not session.lock.locked()
+        ]
+        for session in expired:
+            del self.sessions[session.session_id]
+        return expired
@@ -0,0 +1,38 @@
+"""
+Simulated hardware costs.
+
+Lets a laptop stand in for a cluster of slower machines and links: the
+mock layers are nearly free, so benchmarks add synthetic compute and
+transfer time on top of the real work.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class SimulationProfile:
+    """
+    Synthetic costs added to every pipeline pass.
+
+    A stage running ``L`` layers over ``T`` tokens costs
+    ``L * (layer_ms + T * token_ms)``; a hop carrying ``B`` bytes costs
+    ``link_latency_ms + B / link_bandwidth_mbps``.
+    """
+
+    layer_ms: float = 0.0
+    token_ms: float = 0.0
+    link_latency_ms: float = 0.0
+    link_bandwidth_mbps: float = 0.0  # 0 means unlimited
+    memory_gb: Optional[float] = None  # report this instead of the real memory
+
+    def compute_delay(self, layers: int, tokens: int) -> float:
+        """Seconds of simulated compute for one stage pass."""
+        return layers * (self.layer_ms + tokens * self.token_ms) / 1000
+
+    def transfer_delay(self, nbytes: int) -> float:
+        """Seconds to move ``nbytes`` one way over a simulated link."""
+        delay = self.link_latency_ms / 1000
+        if self.link_bandwidth_mbps > 0:
+            delay += nbytes * 8 / (self.link_bandwidth_mbps * 1_000_000)
+        return delay
@@ -0,0 +1,88 @@
+"""
+Prompt tokenization.
+
+Prompts are tokenized once, on the coordinator, and travel to the first
+stage as token ids: 4 bytes per token instead of a whole embedding row.
+Requests built from a template share most of their text, so token ids
+are cached per prompt and per line; a new prompt only tokenizes the lines
+no earlier prompt had.
+"""
+
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from swarm.inference.compute import VOCAB_SIZE
+
+
+class _LRU:
+    """A small least-recently-used map."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: np.ndarray):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class Tokenizer:
+    """
+    Word-level stand-in tokenizer with an LRU cache of token ids.
+
+    Usage:
+        tokenizer = Tokenizer()
+        ids = tokenizer.encode(prompt)  # int32 array, one id per token
+    """
+
+    def __init__(self, vocab_size: int = VOCAB_SIZE, cache_size: int = 1024):
+        self.vocab_size = vocab_size
+        self.hits = 0
+        self.misses = 0
+        self._prompts = _LRU(cache_size)
+        self._lines = _LRU(cache_size * 4)
+
+    def encode(self, text: str) -> np.ndarray:
+        """Token ids of ``text``; never empty, so every pass has a row to run."""
+        ids = self._prompts.get(text)
+        if ids is not None:
+            self.hits += 1
+            return ids
+
+        self.misses += 1
+        ids = np.concatenate([self._encode_line(line) for line in text.split("\n")])
+        if not len(ids):
+            ids = self._encode_words([""])
+        ids.flags.writeable = False
+        self._prompts.put(text, ids)
+        return ids
+
+    def count(self, text: str) -> int:
+        """Number of tokens in ``text``."""
+        return len(self.encode(text))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._prompts.entries)}
+
+    def _encode_line(self, line: str) -> np.ndarray:
+        ids = self._lines.get(line)
+        if ids is None:
+            ids = self._encode_words(line.split())
+            self._lines.put(line, ids)
+        return ids
+
+    def _encode_words(self, words) -> np.ndarray:
+        return np.array(
+            [zlib.crc32(word.encode()) % self.vocab_size for word in words], dtype=np.int32
+        )
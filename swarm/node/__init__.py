@@ -1,5 +1,6 @@
 """Node module."""
 
 from swarm.node.node import Node, NodeConfig, NodeStats
+from swarm.node.client import NodeClient
 
-__all__ = ["Node", "NodeConfig", "NodeStats"]
+__all__ = ["Node", "NodeConfig", "NodeStats", "NodeClient"]
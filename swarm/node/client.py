@@ -0,0 +1,80 @@
+"""
+Client for a running Swarm node.
+
+Talks to the node's local control socket so callers reuse its discovery
+state, partitions and compute pool instead of starting a node per call.
+"""
+
+import os
+from typing import Dict, Optional
+
+from swarm.protocol.rpc import RPCClient
+from swarm.utils.paths import default_control_socket
+
+
+class NodeClient:
+    """
+    Long-lived connection to a local node.
+
+    Usage:
+        async with NodeClient() as client:
+            result = await client.infer("Hello", model="llama-7b")
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_control_socket()
+        self._rpc = RPCClient(path=self.path)
+
+    @staticmethod
+    def available(path: Optional[str] = None) -> bool:
+        """Whether a node appears to be listening on the control socket."""
+        return os.path.exists(path or default_control_socket())
+
+    async def connect(self):
+        """Connect to the node."""
+        await self._rpc.connect()
+
+    async def close(self):
+        """Close the connection."""
+        await self._rpc.close()
+
+    async def infer(
+        self,
+        prompt: str,
+        model: str = "default",
+        trace_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        priority: str = "normal",
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """Run inference on the node."""
+        return await self._rpc.call(
+            "infer",
+            {
+                "prompt": prompt,
+                "model": model,
+                "trace_id": trace_id,
+                "session_id": session_id,
+                "priority": priority,
+                "max_tokens": max_tokens,
+            },
+        )
+
+    async def cluster_info(self) -> Dict:
+        """Get the node's view of the cluster."""
+        return await self._rpc.call("cluster_info")
+
+    async def trace(self, trace_id: str, chrome: bool = False) -> Optional[Dict]:
+        """Get a request's timeline, or None if the node no longer has it."""
+        return await self._rpc.call("trace", {"trace_id": trace_id, "chrome": chrome})
+
+    async def profile(self, kind: str = "timers", duration: float = 10.0, reset: bool = False) -> Dict:
+        """Ask the node for profiling data (see ``Node._handle_profile``)."""
+        return await self._rpc.call("profile", {"kind": kind, "duration": duration, "reset": reset})
+
+    async def __aenter__(self) -> "NodeClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -6,14 +6,30 @@ Represents a single machine in the distributed inference cluster.
 
 import asyncio
 import uuid
+from functools import partial
 import platform
 import psutil
 import logging
-from typing import Optional, Dict, List
+from typing import AsyncIterator, Optional, Dict, List, Set
 from dataclasses import dataclass, field
 
+from swarm.discovery.cache import PeerCache
 from swarm.discovery.service import DiscoveryService, PeerInfo
+from swarm.discovery.gossip import GossipService
+from swarm.discovery.topology import ClusterTopology
 from swarm.inference.coordinator import InferenceCoordinator
+from swarm.inference.executor import LayerExecutor
+from swarm.inference.kvcache import KVCache
+from swarm.inference.memory import MemoryAccountant
+from swarm.inference.simulation import SimulationProfile
+from swarm.protocol.rpc import RPCServer
+from swarm.protocol.transport import TCPTransport, Transport
+from swarm.serving.metrics import MetricsServer
+from swarm.utils.metrics import MetricsRegistry
+from swarm.utils.hardware import probe_gpu
+from swarm.utils.paths import default_hardware_cache, default_profile_dir
+from swarm.utils.profiling import Profiler
+from swarm.utils.net import get_local_ip
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +39,28 @@ class NodeConfig:
     """Node configuration."""
     
     port: int = 5000
+    listen_host: str = "0.0.0.0"
+    advertise_host: Optional[str] = None
     device_type: Optional[str] = None
     max_memory_gb: Optional[float] = None
     auto_discover: bool = True
+    compute_mode: str = "thread"
+    compute_workers: Optional[int] = None
+    intra_op_threads: Optional[int] = None
+    control_socket: Optional[str] = None
+    peer_cache: Optional[str] = None
+    peer_cache_ttl: float = 300.0
+    announce_interval: float = 5.0
+    seeds: List[str] = field(default_factory=list)
+    gossip_interval: float = 1.0
+    group: str = ""
+    metrics_port: Optional[int] = None
+    simulation: Optional[SimulationProfile] = None
+    transport: Optional[Transport] = None  # TCP unless given
+    profile: bool = False
+    kv_offload_dir: Optional[str] = None  # spill cold KV cache blocks here
+    activation_codec: str = "auto"  # hidden-state compression on the wire; auto picks per link
+    compute_backend: str = "auto"  # numpy, torch or mlx; auto benchmarks what's installed
     
 
 @dataclass
@@ -61,11 +96,47 @@ class Node:
         
         # Services
         self.discovery: Optional[DiscoveryService] = None
+        self.gossip: Optional[GossipService] = None
+        self.rpc_server: Optional[RPCServer] = None
+        self.transport: Transport = self.config.transport or TCPTransport()
         self.coordinator: Optional[InferenceCoordinator] = None
+        self.executor: Optional[LayerExecutor] = None
+        self.control_server: Optional[RPCServer] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self._announce_task: Optional[asyncio.Task] = None
         
         # State
         self.running = False
         self.peers: Dict[str, PeerInfo] = {}
+        self._peer_sources: Dict[str, Set[str]] = {}  # node id -> sources that still see it
+        self._peers_event: Optional[asyncio.Event] = None
+        self.topology = ClusterTopology(
+            self.node_id, self.config.group, self.stats.memory_total_gb
+        )
+        
+        # Metrics, shared by every component of this node
+        self.metrics = MetricsRegistry()
+        process = psutil.Process()
+        self.metrics.gauge(
+            "swarm_memory_in_use_bytes", "Resident memory of this node process",
+            function=lambda: process.memory_info().rss,
+        )
+        self.metrics.gauge(
+            "swarm_memory_available_bytes", "Memory available on this machine",
+            function=lambda: self.stats.memory_available_gb * 1024**3,
+        )
+        self.metrics.gauge("swarm_peers", "Known peers", function=lambda: len(self.peers))
+        self.profiler = Profiler(enabled=self.config.profile, output_dir=default_profile_dir())
+        
+        # Everything this node takes on is reserved against this budget
+        # (max_memory_gb when set), so it refuses work instead of swapping
+        self.memory = MemoryAccountant(self.stats.memory_available_gb * 1024**3)
+        self.kv_cache = KVCache(spill_dir=self.config.kv_offload_dir)
+        self._peer_cache = (
+            PeerCache(self.config.peer_cache, ttl=self.config.peer_cache_ttl)
+            if self.config.peer_cache
+            else None
+        )
         
         logger.info(f"Node initialized: {self.node_id} ({self.stats.device_type})")
         logger.info(f"Memory: {self.stats.memory_available_gb:.1f}GB / {self.stats.memory_total_gb:.1f}GB")
@@ -78,22 +149,104 @@ class Node:
         
         logger.info(f"Starting node {self.node_id}...")
         
-        # Start discovery service
-        if self.config.auto_discover:
+        # Listen on the node port (port 0 picks a free one)
+        self.rpc_server = RPCServer()
+        self.config.port = await self.transport.listen(
+            self.rpc_server, self.config.listen_host, self.config.port
+        )
+        
+        # Last-known peers are tried in the first gossip round, so live ones
+        # are back within a round even without mDNS
+        host = self.config.advertise_host or self.transport.advertise_host or get_local_ip()
+        hints = [
+            f"{peer.ip_address}:{peer.port}"
+            for peer in (self._peer_cache.load() if self._peer_cache else [])
+            if (peer.ip_address, peer.port) != (host, self.config.port)
+        ]
+        
+        # Gossip always answers on the node port so others can seed from us;
+        # it only initiates rounds once it knows seeds or members
+        self.gossip = GossipService(
+            node_id=self.node_id,
+            host=host,
+            port=self.config.port,
+            rpc_server=self.rpc_server,
+            device_type=self.stats.device_type,
+            memory_gb=self.stats.memory_total_gb,
+            seeds=self.config.seeds,
+            hints=hints,
+            interval=self.config.gossip_interval,
+            on_peer_added=partial(self._on_peer_added, "gossip"),
+            on_peer_removed=partial(self._on_peer_removed, "gossip"),
+            on_peer_updated=partial(self._on_peer_updated, "gossip"),
+            group=self.config.group,
+            transport=self.transport,
+        )
+        await self.gossip.start()
+        
+        # Start discovery service (mDNS needs a real network)
+        if self.config.auto_discover and self.transport.multicast_discovery:
             self.discovery = DiscoveryService(
                 node_id=self.node_id,
                 port=self.config.port,
                 device_type=self.stats.device_type,
                 memory_gb=self.stats.memory_total_gb,
-                on_peer_added=self._on_peer_added,
-                on_peer_removed=self._on_peer_removed,
+                on_peer_added=partial(self._on_peer_added, "mdns"),
+                on_peer_removed=partial(self._on_peer_removed, "mdns"),
+                cache_path=self.config.peer_cache,
+                cache_ttl=self.config.peer_cache_ttl,
+                on_peer_updated=partial(self._on_peer_updated, "mdns"),
+                group=self.config.group,
             )
             await self.discovery.start()
         
+        # Start compute pool, sized from the local core count
+        self.executor = LayerExecutor.for_cpu_count(
+            self.stats.cpu_count,
+            mode=self.config.compute_mode,
+            workers=self.config.compute_workers,
+            intra_op_threads=self.config.intra_op_threads,
+        )
+        self.executor.start()
+        
         # Start coordinator
-        self.coordinator = InferenceCoordinator(node_id=self.node_id)
+        self.coordinator = InferenceCoordinator(
+            node_id=self.node_id,
+            executor=self.executor,
+            local_memory_gb=self.stats.memory_available_gb,
+            port=self.config.port,
+            group=self.config.group,
+            metrics=self.metrics,
+            simulation=self.config.simulation,
+            transport=self.transport,
+            profiler=self.profiler,
+            memory=self.memory,
+            kv_cache=self.kv_cache,
+            activation_codec=self.config.activation_codec,
+            backend=self.config.compute_backend,
+        )
+        self.rpc_server.register("forward", self.coordinator.handle_forward)
+        self.rpc_server.register("reserve", self.coordinator.handle_reserve)
+        self.rpc_server.register("release", self.coordinator.handle_release)
+        
+        if self.config.metrics_port is not None:
+            self.metrics_server = MetricsServer(
+                self.metrics, self.config.listen_host, self.config.metrics_port
+            )
+            await self.metrics_server.start()
+        
+        # Expose a local endpoint so clients can reuse this node
+        if self.config.control_socket:
+            self.control_server = RPCServer()
+            self.control_server.register("infer", self._handle_infer)
+            self.control_server.register("cluster_info", self._handle_cluster_info)
+            self.control_server.register("trace", self._handle_trace)
+            self.control_server.register("profile", self._handle_profile)
+            await self.control_server.start_unix(self.config.control_socket)
         
         self.running = True
+        self._announce_task = asyncio.create_task(self._announce_loop())
+        
         logger.info(f"Node {self.node_id} started successfully")
         
     async def stop(self):
@@ -103,19 +256,56 @@ class Node:
         
         logger.info(f"Stopping node {self.node_id}...")
         
+        if self._announce_task:
+            self._announce_task.cancel()
+        
+        if self.control_server:
+            await self.control_server.stop()
+        
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        
         if self.discovery:
             await self.discovery.stop()
         
+        if self.gossip:
+            await self.gossip.stop()
+        
+        if self.rpc_server:
+            await self.transport.close()
+            await self.rpc_server.stop()
+        
+        if self.executor:
+            self.executor.shutdown()
+        
+        self.kv_cache.close()
+        self.profiler.close()
         self.running = False
         logger.info(f"Node {self.node_id} stopped")
         
-    async def run_inference(self, prompt: str, model: str = "default") -> str:
+    async def run_inference(
+        self,
+        prompt: str,
+        model: str = "default",
+        trace_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        priority: str = "normal",
+        deadline: Optional[float] = None,
+        client: str = "local",
+    ) -> str:
         """
         Run inference across the cluster.
         
         Args:
             prompt: Input prompt
             model: Model name to use
+            trace_id: Id to record the request's timeline under
+            max_tokens: Number of tokens to generate
+            session_id: Conversation to continue (send only the new turn)
+            priority: "interactive", "normal" or "batch"
+            deadline: Unix time after which the request is dropped
+            client: Who sent the request; session ids are only unique per client
             
         Returns:
             Generated text
@@ -126,53 +316,293 @@ class Node:
         logger.info(f"Running inference: '{prompt[:50]}...'")
         
         # Get available peers
-        available_peers = list(self.peers.values()) if self.discovery else []
+        available_peers = list(self.peers.values())
         
         # Run coordinated inference
         result = await self.coordinator.run_inference(
             prompt=prompt,
             model=model,
             peers=available_peers,
+            trace_id=trace_id,
+            max_tokens=max_tokens,
+            session_id=session_id,
+            priority=priority,
+            deadline=deadline,
+            client=client,
         )
         
         return result
         
+    async def stream_inference(
+        self,
+        prompt: str,
+        model: str = "default",
+        trace_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        session_id: Optional[str] = None,
+        priority: str = "normal",
+        deadline: Optional[float] = None,
+        client: str = "local",
+    ) -> AsyncIterator[str]:
+        """Run inference and yield each token as soon as it is decoded."""
+        if not self.coordinator:
+            raise RuntimeError("Node not started")
+        
+        pieces = self.coordinator.generate(
+            prompt,
+            model,
+            list(self.peers.values()),
+            trace_id,
+            max_tokens,
+            session_id,
+            priority,
+            deadline,
+            client,
+        )
+        async for piece in pieces:
+            yield piece
+        
+    async def end_session(self, session_id: str, client: str = "local"):
+        """Forget a conversation and free its KV cache across the cluster."""
+        if self.coordinator:
+            await self.coordinator.end_session(session_id, client)
+        
+    def fits_locally(self, model: str = "default") -> bool:
+        """Whether ``model`` can run on this node alone, without any peers."""
+        model_spec = InferenceCoordinator.get_model_spec(model)
+        return InferenceCoordinator.fits_locally(model_spec, self.stats.memory_available_gb)
+        
+    async def wait_for_capacity(self, memory_gb: float, timeout: float = 2.0) -> bool:
+        """
+        Wait until the cluster holds at least ``memory_gb``.
+        
+        Returns as soon as enough peers are known rather than sleeping for
+        the full timeout. Returns False if the timeout expires first.
+        """
+        def has_capacity() -> bool:
+            available = self.stats.memory_available_gb + sum(
+                peer.memory_gb for peer in self.peers.values()
+            )
+            return available >= memory_gb
+        
+        return await self.wait_until(has_capacity, timeout)
+        
+    async def wait_for_peers(self, count: Optional[int] = None, timeout: float = 5.0) -> bool:
+        """
+        Wait until ``count`` peers are confirmed (default: a quorum of the
+        peers this node knew about before it restarted).
+        """
+        if count is None:
+            count = self.discovery.quorum if self.discovery else 1
+        
+        # Cached peers only join self.peers once something confirms them
+        return await self.wait_until(lambda: len(self.peers) >= count, timeout)
+        
+    async def wait_until(self, predicate, timeout: float) -> bool:
+        """
+        Wait until ``predicate()`` holds, re-checking whenever peers change.
+        
+        Returns False if the timeout expires first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while not predicate():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            
+            self._peers_changed.clear()
+            try:
+                await asyncio.wait_for(self._peers_changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+        
+        return True
+        
+    def get_trace(self, trace_id: str, chrome: bool = False) -> Optional[Dict]:
+        """A recorded request timeline, as JSON or in the Chrome trace format."""
+        if not self.coordinator:
+            return None
+        trace = self.coordinator.tracer.get(trace_id)
+        if trace is None:
+            return None
+        return trace.to_chrome() if chrome else trace.to_dict()
+        
     def get_cluster_info(self) -> Dict:
         """Get information about the cluster."""
         total_memory = self.stats.memory_total_gb
         total_nodes = 1
         
-        if self.discovery:
-            for peer in self.discovery.get_peers().values():
-                total_memory += peer.memory_gb
-                total_nodes += 1
+        for peer in self.peers.values():
+            total_memory += peer.memory_gb
+            total_nodes += 1
+        
+        groups = self.topology.summarize(self.peers.values())
         
         return {
             "node_id": self.node_id,
+            "group": self.config.group,
+            "backend": self.coordinator.backend_name if self.coordinator else None,
             "total_nodes": total_nodes,
             "total_memory_gb": round(total_memory, 2),
+            "memory": {kind: round(nbytes / 1024**3, 3) for kind, nbytes in self.memory.usage().items()},
+            "groups": {
+                name: {
+                    "leader": summary.leader_id,
+                    "nodes": summary.nodes,
+                    "memory_gb": round(summary.memory_gb, 2),
+                }
+                for name, summary in groups.items()
+            },
             "peers": [
                 {
                     "node_id": peer.node_id,
                     "ip": peer.ip_address,
                     "device": peer.device_type,
+                    "group": peer.group,
                     "memory_gb": peer.memory_gb,
+                    "memory_available_gb": peer.memory_available_gb,
+                    "memory_headroom_gb": peer.memory_headroom_gb,
+                    "queue_depth": peer.queue_depth,
+                    "tokens_per_sec": peer.tokens_per_sec,
+                    "models": peer.models,
                 }
                 for peer in self.peers.values()
             ],
         }
     
-    def _on_peer_added(self, peer: PeerInfo):
-        """Handle peer discovery."""
+    async def _handle_infer(self, params: Dict) -> str:
+        """Control socket handler for inference requests."""
+        return await self.run_inference(
+            params["prompt"],
+            params.get("model", "default"),
+            params.get("trace_id"),
+            max_tokens=params.get("max_tokens"),
+            session_id=params.get("session_id"),
+            priority=params.get("priority", "normal"),
+            deadline=params.get("deadline"),
+        )
+        
+    async def _handle_cluster_info(self, params: Dict) -> Dict:
+        """Control socket handler for cluster info."""
+        return self.get_cluster_info()
+        
+    async def _handle_trace(self, params: Dict) -> Optional[Dict]:
+        """Control socket handler for request timelines."""
+        return self.get_trace(params["trace_id"], chrome=params.get("chrome", False))
+    
+    async def _handle_profile(self, params: Dict) -> Dict:
+        """
+        Control socket handler for profiling.
+        
+        ``kind`` is "timers" (section timings so far), "cpu" (a cProfile
+        window of ``duration`` seconds) or "memory" (a tracemalloc snapshot).
+        """
+        kind = params.get("kind", "timers")
+        
+        if kind == "timers":
+            report = self.profiler.report()
+            if params.get("reset"):
+                self.profiler.reset()
+            return {"enabled": self.profiler.enabled, "sections": report}
+        if kind == "cpu":
+            path = await self.profiler.capture_cpu(float(params.get("duration", 10.0)))
+            return {"path": path, "summary": Profiler.summarize_cpu(path)}
+        if kind == "memory":
+            return self.profiler.capture_memory()
+        
+        raise ValueError(f"Unknown profile kind: {kind}")
+        
+    @property
+    def _peers_changed(self) -> asyncio.Event:
+        # Created inside the running loop: before 3.10 an event binds to the
+        # loop current at construction, and the CLI builds nodes outside it
+        if self._peers_event is None:
+            self._peers_event = asyncio.Event()
+        return self._peers_event
+        
+    def _on_peer_added(self, source: str, peer: PeerInfo):
+        """Handle peer discovery by ``source`` ("gossip" or "mdns")."""
+        new = peer.node_id not in self.peers
+        self.peers[peer.node_id] = peer
+        self._peer_sources.setdefault(peer.node_id, set()).add(source)
+        if self.discovery:
+            self.discovery.confirm(peer.node_id)
+        self._save_peers()
+        self._peers_changed.set()
+        if new:
+            logger.info(f"Peer connected: {peer.node_id} ({peer.device_type}) - {peer.memory_gb}GB")
+        
+    def _on_peer_updated(self, source: str, peer: PeerInfo):
+        """Handle a peer publishing new load figures."""
         self.peers[peer.node_id] = peer
-        logger.info(f"Peer connected: {peer.node_id} ({peer.device_type}) - {peer.memory_gb}GB")
+        self._peer_sources.setdefault(peer.node_id, set()).add(source)
+        self._peers_changed.set()
+        logger.debug(
+            f"Peer {peer.node_id}: {peer.memory_available_gb:.1f}GB free, "
+            f"queue {peer.queue_depth}, {peer.tokens_per_sec:.1f} tok/s"
+        )
+        
+    async def _announce_loop(self):
+        """Periodically republish this node's load to peers."""
+        while self.running:
+            self.stats.memory_available_gb = self._cap_memory(
+                psutil.virtual_memory().available / (1024**3)
+            )
+            
+            load = dict(
+                memory_available_gb=self.stats.memory_available_gb,
+                queue_depth=self.coordinator.active_requests,
+                tokens_per_sec=self.coordinator.tokens_per_sec(),
+                models=sorted(self.coordinator.resident_models),
+                memory_headroom_gb=self.memory.headroom / 1024**3,
+            )
+            
+            try:
+                await self.gossip.update_load(**load)
+            except Exception as e:
+                logger.warning(f"Failed to gossip load: {e}")
+            if self.discovery:
+                try:
+                    await self.discovery.update_load(**load)
+                except Exception as e:
+                    logger.warning(f"Failed to publish load: {e}")
+            
+            await asyncio.sleep(self.config.announce_interval)
+    
+    def _on_peer_removed(self, source: str, node_id: str):
+        """Handle ``source`` losing a peer; it is gone once every source has lost it."""
+        sources = self._peer_sources.get(node_id, set())
+        sources.discard(source)
+        if sources:
+            logger.debug(f"{source} lost peer {node_id}, still seen by {', '.join(sorted(sources))}")
+            return
         
-    def _on_peer_removed(self, node_id: str):
-        """Handle peer removal."""
+        self._peer_sources.pop(node_id, None)
         if node_id in self.peers:
             del self.peers[node_id]
+            self._save_peers()
+            self._peers_changed.set()
             logger.info(f"Peer disconnected: {node_id}")
     
+    def _save_peers(self):
+        """Keep the peer cache current when mDNS discovery (which saves it otherwise) is off."""
+        if self._peer_cache and not self.discovery:
+            self._peer_cache.save(self.peers.values())
+    
+    def _cap_memory(self, memory_gb: float) -> float:
+        """
+        Memory this node offers: the simulated figure when one is set,
+        otherwise ``memory_gb`` limited to ``max_memory_gb``.
+        """
+        simulation = self.config.simulation
+        if simulation and simulation.memory_gb is not None:
+            return simulation.memory_gb
+        if self.config.max_memory_gb is None:
+            return memory_gb
+        return min(memory_gb, self.config.max_memory_gb)
+        
     def _get_system_stats(self) -> NodeStats:
         """Get system statistics."""
         memory = psutil.virtual_memory()
@@ -193,23 +623,15 @@ class Node:
             else:
                 device_type = "linux_x86"
         
-        # Check for GPU (basic check)
-        has_gpu = False
-        gpu_memory = 0.0
-        try:
-            import torch
-            if torch.cuda.is_available():
-                has_gpu = True
-                gpu_memory = torch.cuda.get_device_properties(0).total_memory / (1024**3)
-        except ImportError:
-            pass
+        # Cached: probing for a GPU imports torch
+        gpu = probe_gpu(default_hardware_cache())
         
         return NodeStats(
             cpu_count=psutil.cpu_count(),
-            memory_total_gb=memory.total / (1024**3),
-            memory_available_gb=memory.available / (1024**3),
+            memory_total_gb=self._cap_memory(memory.total / (1024**3)),
+            memory_available_gb=self._cap_memory(memory.available / (1024**3)),
             device_type=device_type,
             platform=f"{platform.system()} {platform.release()}",
-            has_gpu=has_gpu,
-            gpu_memory_gb=gpu_memory,
+            has_gpu=gpu.has_gpu,
+            gpu_memory_gb=gpu.memory_gb,
         )
@@ -0,0 +1,42 @@
+"""Protocol module."""
+
+from typing import TYPE_CHECKING
+
+from swarm.utils.lazy import lazy_module
+
+# Imported on first use, so light modules like swarm.protocol.codec can be
+# imported without the transports
+_EXPORTS = {
+    "HiddenStateFrame": "swarm.protocol.frames",
+    "LinkProfile": "swarm.protocol.memory",
+    "MemoryNetwork": "swarm.protocol.memory",
+    "MemoryTransport": "swarm.protocol.memory",
+    "RPCClient": "swarm.protocol.rpc",
+    "RPCError": "swarm.protocol.rpc",
+    "RPCServer": "swarm.protocol.rpc",
+    "TCPTransport": "swarm.protocol.transport",
+    "Transport": "swarm.protocol.transport",
+    "rpc_call": "swarm.protocol.rpc",
+}
+
+__all__ = [
+    "HiddenStateFrame",
+    "LinkProfile",
+    "MemoryNetwork",
+    "MemoryTransport",
+    "RPCClient",
+    "RPCError",
+    "RPCServer",
+    "TCPTransport",
+    "Transport",
+    "rpc_call",
+]
+
+if TYPE_CHECKING:
+    from swarm.protocol.frames import HiddenStateFrame
+    from swarm.protocol.memory import LinkProfile, MemoryNetwork, MemoryTransport
+    from swarm.protocol.rpc import RPCClient, RPCError, RPCServer, rpc_call
+    from swarm.protocol.transport import TCPTransport, Transport
+
+
+__getattr__, __dir__ = lazy_module(__name__, _EXPORTS)
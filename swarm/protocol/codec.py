@@ -0,0 +1,161 @@
+"""
+Activation codecs.
+
+Hidden states can cross slow links in fewer bytes than float32:
+- ``fp16`` and ``bf16`` halve them (bf16 keeps float32's range, so fp16
+  frames with values out of its range fall back to it)
+- ``int8`` quarters them, with one float32 scale per row
+- ``zlib``, or ``lz4`` when installed, compress losslessly; used for
+  token ids, which squeeze well and must arrive exact
+
+Each coordinator measures the bandwidth of its links to the stages it
+forwards to, and picks a codec per link from it: full precision on fast
+links, 16 bits on ordinary ones, 8 bits on slow ones. Stages advertise the
+codecs they can decode, so lz4 is only sent to those that have it.
+"""
+
+import zlib
+from typing import Any, Collection, Dict, Optional, Tuple
+
+import numpy as np
+
+# lz4 is optional: None where it isn't installed
+from swarm.utils.choices import BASE_CODECS, CODECS, lz4
+
+# Links at least this fast (Mbit/s) send full precision; slower than
+# SLOW_LINK_MBPS, 8 bits
+FAST_LINK_MBPS = 1000.0
+SLOW_LINK_MBPS = 100.0
+
+_FP16_MAX = float(np.finfo(np.float16).max)
+
+
+def choose_codec(
+    dtype: np.dtype,
+    rows: int,
+    bandwidth_mbps: Optional[float],
+    accepted: Collection[str] = BASE_CODECS,
+) -> str:
+    """
+    The codec for a ``rows``-row frame of ``dtype`` over a link of the given
+    bandwidth, among the ``accepted`` ones both ends can handle.
+    """
+    if bandwidth_mbps is None or bandwidth_mbps >= FAST_LINK_MBPS:
+        return "raw"
+    if not np.issubdtype(dtype, np.floating):
+        # Token ids: lossless only, and only worth it for a prefill
+        return ("lz4" if "lz4" in accepted else "zlib") if rows > 1 else "raw"
+    return "fp16" if bandwidth_mbps >= SLOW_LINK_MBPS else "int8"
+
+
+def fallback_codec(codec: str, accepted: Collection[str]) -> str:
+    """``codec`` if accepted, else the nearest one every node decodes."""
+    if codec in accepted:
+        return codec
+    return "zlib" if codec == "lz4" else "raw"
+
+
+def encode(array: np.ndarray, codec: str) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Encode an array; returns its payload and what ``decode`` needs besides.
+
+    Lossy codecs leave non-float arrays alone, so the codec that was
+    actually used is part of the returned metadata.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown activation codec {codec!r} (expected one of {list(CODECS)})")
+    array = np.ascontiguousarray(array)
+    meta: Dict[str, Any] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+    lossy = codec in ("fp16", "bf16", "int8")
+    if lossy and not np.issubdtype(array.dtype, np.floating):
+        codec = "raw"
+    if codec == "fp16" and array.size and np.abs(array).max() > _FP16_MAX:
+        codec = "bf16"
+    meta["codec"] = codec
+
+    if codec == "fp16":
+        return array.astype(np.float16).tobytes(), meta
+    if codec == "bf16":
+        array32 = array.astype(np.float32)
+        bits = array32.view(np.uint32)
+        # Round to nearest even before dropping the low 16 bits. Rounding
+        # would carry NaN payloads into the sign bit or down to inf, so
+        # NaNs are truncated instead, keeping the quiet bit set
+        rounded = bits + 0x7FFF + ((bits >> 16) & 1)
+        high = np.where(np.isnan(array32), (bits >> 16) | 0x40, rounded >> 16)
+        return high.astype(np.uint16).tobytes(), meta
+    if codec == "int8":
+        rows = array.astype(np.float32).reshape(-1, array.shape[-1] if array.ndim else 1)
+        scale = np.abs(rows).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        quantized = np.clip(np.rint(rows / scale), -127, 127).astype(np.int8)
+        meta["scale"] = scale.astype(np.float32).tobytes()
+        return quantized.tobytes(), meta
+    if codec == "zlib":
+        return zlib.compress(array.tobytes(), 1), meta
+    if codec == "lz4":
+        return lz4.compress(array.tobytes()), meta
+    return array.tobytes(), meta
+
+
+def decode(payload: bytes, meta: Dict[str, Any]) -> np.ndarray:
+    """Rebuild an array from ``encode``'s payload and metadata."""
+    codec = meta.get("codec", "raw")
+    dtype = np.dtype(meta["dtype"])
+    shape = meta["shape"]
+
+    if codec == "fp16":
+        array = np.frombuffer(payload, dtype=np.float16).astype(dtype)
+    elif codec == "bf16":
+        bits = np.frombuffer(payload, dtype=np.uint16).astype(np.uint32) << 16
+        array = bits.view(np.float32).astype(dtype)
+    elif codec == "int8":
+        scale = np.frombuffer(meta["scale"], dtype=np.float32)
+        quantized = np.frombuffer(payload, dtype=np.int8).reshape(len(scale), -1)
+        array = (quantized * scale[:, None]).astype(dtype)
+    elif codec == "zlib":
+        try:
+            array = np.frombuffer(zlib.decompress(payload), dtype=dtype)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt zlib payload: {e}")
+    elif codec == "lz4":
+        if lz4 is None:
+            raise ValueError("Frame is lz4-compressed but lz4 isn't installed")
+        array = np.frombuffer(lz4.decompress(payload), dtype=dtype)
+    elif codec == "raw":
+        array = np.frombuffer(payload, dtype=dtype)
+    else:
+        raise ValueError(f"Unknown activation codec {codec!r}")
+    return array.reshape(shape)
+
+
+class LinkMeter:
+    """
+    Bandwidth of links to peers, estimated from the transfers seen.
+
+    The quickest recent transfer to a peer stands in for the link's
+    latency: a quicker one replaces it, slower ones pull it up by
+    ``latency_decay`` of the difference, so a link that got slower is
+    learned again. Whatever a transfer takes beyond that is put down to
+    its bytes, smoothed into the bandwidth by ``smoothing``. Transfers
+    dominated by latency say little about bandwidth and are skipped.
+    """
+
+    def __init__(self, smoothing: float = 0.3, latency_decay: float = 0.05):
+        self.smoothing = smoothing
+        self.latency_decay = latency_decay
+        self.latency: Dict[str, float] = {}
+        self.bandwidth: Dict[str, float] = {}  # Mbit/s
+
+    def observe(self, peer: str, nbytes: int, seconds: float):
+        previous = self.latency.get(peer, seconds)
+        latency = self.latency[peer] = min(
+            seconds, previous + self.latency_decay * (seconds - previous)
+        )
+        if seconds <= 2 * latency:
+            return
+        mbps = nbytes * 8 / (seconds - latency) / 1e6
+        previous = self.bandwidth.get(peer)
+        if previous is not None:
+            mbps = previous + self.smoothing * (mbps - previous)
+        self.bandwidth[peer] = mbps
@@ -0,0 +1,86 @@
+"""
+Hidden-state frames.
+
+The unit of work passed between pipeline stages: a hidden state (or, for
+the first stage, the token ids to embed) plus the layer range to run over
+it, the trace id of the request it belongs to, the sequence whose KV cache
+it extends, and how urgent the request is. On the wire the tensor can be
+compressed with any activation codec (see ``swarm.protocol.codec``).
+"""
+
+import base64
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from swarm.protocol.codec import decode, encode
+
+
+@dataclass
+class HiddenStateFrame:
+    """A hidden state on its way to (or back from) a pipeline stage."""
+
+    trace_id: str
+    model: str
+    start_layer: int
+    end_layer: int
+    hidden_state: np.ndarray  # float activations, or int32 token ids for the first stage
+    sequence_id: str = ""  # KV cache key; the trace id unless part of a session
+    priority: int = 1  # rank, lower is more urgent
+    deadline: Optional[float] = None  # Unix time
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the tensor payload."""
+        return self.hidden_state.nbytes
+
+    def to_wire(self, codec: str = "raw") -> Dict[str, Any]:
+        """Encode for a JSON message; the tensor travels as base64 bytes."""
+        payload, meta = encode(self.hidden_state, codec)
+        wire = {
+            "trace_id": self.trace_id,
+            "model": self.model,
+            "start_layer": self.start_layer,
+            "end_layer": self.end_layer,
+            "sequence_id": self.sequence_id,
+            "priority": self.priority,
+            "deadline": self.deadline,
+            "codec": meta["codec"],
+            "dtype": meta["dtype"],
+            "shape": meta["shape"],
+            "data": base64.b64encode(payload).decode("ascii"),
+        }
+        if "scale" in meta:
+            wire["scale"] = base64.b64encode(meta["scale"]).decode("ascii")
+        return wire
+
+    @staticmethod
+    def wire_nbytes(wire: Dict[str, Any]) -> int:
+        """Size of an encoded frame's tensor payload, before base64."""
+        return (len(wire["data"]) + len(wire.get("scale", ""))) * 3 // 4
+
+    @classmethod
+    def from_wire(cls, data: Dict[str, Any]) -> "HiddenStateFrame":
+        """Decode a frame produced by ``to_wire``."""
+        try:
+            meta = {
+                "codec": data.get("codec", "raw"),
+                "dtype": data["dtype"],
+                "shape": data["shape"],
+            }
+            if "scale" in data:
+                meta["scale"] = base64.b64decode(data["scale"])
+            hidden_state = decode(base64.b64decode(data["data"]), meta)
+            return cls(
+                trace_id=str(data["trace_id"]),
+                model=str(data["model"]),
+                start_layer=int(data["start_layer"]),
+                end_layer=int(data["end_layer"]),
+                hidden_state=hidden_state,
+                sequence_id=str(data.get("sequence_id", "")),
+                priority=int(data.get("priority", 1)),
+                deadline=None if data.get("deadline") is None else float(data["deadline"]),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Malformed hidden-state frame: {e}")
@@ -0,0 +1,275 @@
+"""
+Minimal asyncio HTTP/1.1 server.
+
+Just enough HTTP for JSON APIs, Server-Sent Events and plain-text
+endpoints, without pulling in a web framework.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    """Raise from a handler to return an error status."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+@dataclass
+class HTTPRequest:
+    """A parsed HTTP request."""
+
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes = b""
+
+    def json(self) -> Any:
+        """Decode the body as JSON, raising HTTPError(400) if it isn't."""
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+
+
+@dataclass
+class HTTPResponse:
+    """A complete response with a known body."""
+
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        return cls(
+            status=status,
+            body=json.dumps(data).encode(),
+            content_type="application/json",
+            headers=headers or {},
+        )
+
+    @classmethod
+    def text(cls, text: str, status: int = 200, content_type: str = "text/plain; charset=utf-8"):
+        return cls(status=status, body=text.encode(), content_type=content_type)
+
+
+@dataclass
+class StreamingResponse:
+    """A response whose body is produced incrementally, e.g. SSE."""
+
+    chunks: AsyncIterator[bytes]
+    status: int = 200
+    content_type: str = "text/event-stream"
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Called once the stream is finished or abandoned, even if never started
+    on_close: Optional[Callable[[], None]] = None
+
+
+Response = Union[HTTPResponse, StreamingResponse]
+Handler = Callable[[HTTPRequest], Awaitable[Response]]
+ErrorFormatter = Callable[[HTTPError], HTTPResponse]
+
+
+def _default_error(error: HTTPError) -> HTTPResponse:
+    return HTTPResponse.json({"error": error.message}, status=error.status, headers=error.headers)
+
+
+class HTTPServer:
+    """
+    Routes requests to handlers by (method, path).
+
+    Connections are kept alive between complete responses; streaming
+    responses close the connection when the stream ends.
+    """
+
+    def __init__(self, error_formatter: ErrorFormatter = _default_error):
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._error_formatter = error_formatter
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+
+    def route(self, method: str, path: str, handler: Handler):
+        """Register ``handler`` for ``method path``."""
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000):
+        """Start listening. Pass ``port=0`` to pick a free port."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, host=host, port=port, limit=MAX_HEADER_BYTES
+        )
+        self.host = host
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        """Stop listening."""
+        if self._server:
+            self._server.close()
+            handlers = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._write_response(writer, self._error_formatter(e), keep_alive=False)
+                    break
+
+                if request is None:
+                    break
+
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+
+                if isinstance(response, StreamingResponse):
+                    await self._write_stream(writer, response)
+                    break
+
+                await self._write_response(writer, response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, request: HTTPRequest) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return self._error_formatter(HTTPError(405, "Method not allowed"))
+            return self._error_formatter(HTTPError(404, f"No route for {request.path}"))
+
+        try:
+            return await handler(request)
+        except HTTPError as e:
+            return self._error_formatter(e)
+        except Exception as e:
+            logger.exception(f"Handler for {request.method} {request.path} failed")
+            return self._error_formatter(HTTPError(500, str(e)))
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HTTPRequest]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise HTTPError(400, "Incomplete request")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(411, "Chunked request bodies are not supported")
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        return HTTPRequest(
+            method=method.upper(),
+            path=url.path,
+            query=dict(parse_qsl(url.query)),
+            headers=headers,
+            body=body,
+        )
+
+    def _write_head(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        headers: Dict[str, str],
+    ):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        response: HTTPResponse,
+        keep_alive: bool,
+    ):
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(response.body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **response.headers,
+        }
+        self._write_head(writer, response.status, headers)
+        writer.write(response.body)
+        await writer.drain()
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, response: StreamingResponse):
+        headers = {
+            "Content-Type": response.content_type,
+            "Cache-Control": "no-cache",
+            "Connection": "close",
+            **response.headers,
+        }
+        try:
+            self._write_head(writer, response.status, headers)
+            await writer.drain()
+
+            async for chunk in response.chunks:
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            if response.on_close is not None:
+                response.on_close()
@@ -0,0 +1,188 @@
+"""
+In-memory network emulation.
+
+Nodes in one process talk through a MemoryNetwork instead of sockets.
+Every directed link between two hosts can be given latency, jitter, a
+bandwidth cap and a drop rate, and all randomness comes from one seeded
+generator. Slow-link and lossy-link behaviour can then be reproduced
+exactly on a single machine.
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from swarm.protocol.messages import decode_message, encode_message
+from swarm.protocol.rpc import RPCError, RPCServer
+from swarm.protocol.transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LinkProfile:
+    """Characteristics of one direction of a link."""
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0  # extra delay drawn uniformly from [0, jitter_ms]
+    bandwidth_mbps: float = 0.0  # 0 means unlimited
+    drop_rate: float = 0.0  # probability a message is lost
+
+
+class _Link:
+    """Delivery state of one directed link."""
+
+    def __init__(self, profile: LinkProfile):
+        self.profile = profile
+        # Messages share the link's bandwidth: each starts sending when the
+        # previous one has left
+        self.busy_until = 0.0
+
+
+class MemoryNetwork:
+    """
+    A simulated network shared by every node of an in-process cluster.
+
+    Usage:
+        network = MemoryNetwork(default=LinkProfile(latency_ms=5))
+        network.set_link("node-a", "node-b", LinkProfile(bandwidth_mbps=10))
+        config = NodeConfig(transport=network.transport("node-a"))
+    """
+
+    def __init__(self, default: Optional[LinkProfile] = None, seed: int = 0):
+        self.default = default or LinkProfile()
+        self.random = random.Random(seed)
+        self._profiles: Dict[Tuple[str, str], LinkProfile] = {}
+        self._links: Dict[Tuple[str, str], _Link] = {}
+        self._servers: Dict[Tuple[str, int], RPCServer] = {}
+        self._ports = itertools.count(1)
+
+    def transport(self, host: str) -> "MemoryTransport":
+        """A transport for the node at ``host``."""
+        return MemoryTransport(self, host)
+
+    def set_link(self, src: str, dst: str, profile: LinkProfile, symmetric: bool = True):
+        """Set the profile from ``src`` to ``dst`` (and back, if symmetric)."""
+        pairs = [(src, dst), (dst, src)] if symmetric else [(src, dst)]
+        for pair in pairs:
+            self._profiles[pair] = profile
+            self._links.pop(pair, None)
+
+    def link(self, src: str, dst: str) -> LinkProfile:
+        """The profile in effect from ``src`` to ``dst``."""
+        return self._profiles.get((src, dst), self.default)
+
+    def bind(self, server: RPCServer, host: str, port: int) -> int:
+        if port == 0:
+            port = next(self._ports)
+            while (host, port) in self._servers:
+                port = next(self._ports)
+        elif (host, port) in self._servers:
+            raise OSError(f"Address already in use: {host}:{port}")
+
+        self._servers[(host, port)] = server
+        return port
+
+    def unbind(self, host: str, server: RPCServer):
+        for address, bound in list(self._servers.items()):
+            if address[0] == host and bound is server:
+                del self._servers[address]
+
+    async def transmit(self, src: str, dst: str, nbytes: int, timeout: Optional[float]):
+        """
+        Wait as long as sending ``nbytes`` from ``src`` to ``dst`` takes.
+
+        A dropped message never arrives, so the sender sees a timeout (or a
+        connection error if it wasn't going to wait).
+        """
+        loop = asyncio.get_running_loop()
+        pair = (src, dst)
+        link = self._links.get(pair)
+        if link is None:
+            link = self._links[pair] = _Link(self.link(src, dst))
+        profile = link.profile
+
+        if profile.drop_rate and self.random.random() < profile.drop_rate:
+            if timeout is None:
+                raise ConnectionError(f"Message from {src} to {dst} was dropped")
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError()
+
+        now = loop.time()
+        start = max(now, link.busy_until)
+        if profile.bandwidth_mbps > 0:
+            link.busy_until = start + nbytes * 8 / (profile.bandwidth_mbps * 1_000_000)
+        else:
+            link.busy_until = start
+
+        delay = profile.latency_ms / 1000
+        if profile.jitter_ms:
+            delay += self.random.uniform(0, profile.jitter_ms) / 1000
+
+        await asyncio.sleep(max(0.0, link.busy_until + delay - now))
+
+    def server(self, host: str, port: int) -> RPCServer:
+        server = self._servers.get((host, port))
+        if server is None:
+            raise ConnectionRefusedError(f"Nothing listening on {host}:{port}")
+        return server
+
+
+class MemoryTransport(Transport):
+    """One node's view of a MemoryNetwork."""
+
+    multicast_discovery = False
+
+    def __init__(self, network: MemoryNetwork, host: str):
+        self.network = network
+        self.host = host
+        self.advertise_host = host
+        self._server: Optional[RPCServer] = None
+
+    async def listen(self, server: RPCServer, host: str, port: int) -> int:
+        self._server = server
+        port = self.network.bind(server, self.host, port)
+        logger.info(f"Listening on in-memory address {self.host}:{port}")
+        return port
+
+    async def call(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        return await asyncio.wait_for(self._call(host, port, method, params, timeout), timeout)
+
+    async def _call(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+    ) -> Any:
+        server = self.network.server(host, port)
+
+        # Messages go through the real wire encoding, so sizes are honest
+        # and the two sides never share objects
+        request = encode_message({"id": 1, "method": method, "params": params or {}})
+        await self.network.transmit(self.host, host, len(request), timeout)
+        reply = await server.dispatch(decode_message(request))
+
+        encoded = encode_message(reply)
+        await self.network.transmit(host, self.host, len(encoded), timeout)
+        reply = decode_message(encoded)
+
+        if "error" in reply:
+            raise RPCError(reply["error"], reply.get("code"))
+        return reply.get("result")
+
+    async def close(self):
+        if self._server is not None:
+            self.network.unbind(self.host, self._server)
+            self._server = None
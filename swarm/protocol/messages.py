@@ -0,0 +1,41 @@
+"""
+Wire format for node RPCs.
+
+Messages are JSON objects sent one per line. Requests carry ``id``,
+``method`` and ``params``; replies echo the ``id`` and carry either
+``result`` or ``error``.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+# Upper bound on a single message, also used as the stream reader limit
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """Encode a message as a single newline-terminated JSON line."""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    """Decode a single JSON line into a message."""
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Message must be a JSON object")
+    return message
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Read the next message, or None if the peer closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    return decode_message(line)
+
+
+async def write_message(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    """Write a message and wait for the transport to drain."""
+    writer.write(encode_message(message))
+    await writer.drain()
@@ -0,0 +1,265 @@
+"""
+Minimal JSON-lines RPC over Unix or TCP sockets.
+
+Used for the local control socket (``swarm infer`` talking to a running
+``swarm node``) and for node-to-node messages.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from swarm.protocol.messages import MAX_MESSAGE_BYTES, read_message, write_message
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class RPCError(Exception):
+    """
+    Raised when a remote handler fails or the method is unknown.
+
+    ``code`` is the ``rpc_code`` of the exception the handler raised, when
+    it has one, so callers can tell the failures they handle apart.
+    """
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class RPCServer:
+    """
+    Dispatches incoming requests to registered handlers by method name.
+
+    A connection may carry any number of requests; each is handled in turn
+    and answered with a reply carrying the same ``id``.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+        self._servers: list = []
+        self._unix_paths: list = []
+        self._connections: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    def register(self, method: str, handler: Handler):
+        """Register ``handler(params)`` for ``method``."""
+        self._handlers[method] = handler
+
+    async def start_unix(self, path: str):
+        """Listen on a Unix domain socket at ``path``."""
+        if os.path.exists(path):
+            if await _socket_alive(path):
+                raise RuntimeError(f"Control socket already in use: {path}")
+            # Left behind by a node that didn't shut down cleanly
+            os.unlink(path)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=path, limit=MAX_MESSAGE_BYTES
+        )
+        self._servers.append(server)
+        self._unix_paths.append(path)
+        logger.info(f"RPC server listening on {path}")
+
+    async def start_tcp(self, host: str, port: int) -> int:
+        """
+        Listen on a TCP ``host:port``.
+
+        Returns the bound port, which differs from ``port`` when it is 0.
+        """
+        server = await asyncio.start_server(
+            self._handle_connection, host=host, port=port, limit=MAX_MESSAGE_BYTES
+        )
+        self._servers.append(server)
+
+        port = server.sockets[0].getsockname()[1]
+        logger.info(f"RPC server listening on {host}:{port}")
+        return port
+
+    async def stop(self):
+        """Stop listening and remove any socket files."""
+        for server in self._servers:
+            server.close()
+
+        # Idle keep-alive connections would otherwise outlive the server
+        handlers = list(self._connections.values())
+        for writer in list(self._connections):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+
+        for path in self._unix_paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._unix_paths.clear()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on a single connection until the peer hangs up."""
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await read_message(reader)
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    await write_message(writer, {"id": None, "error": f"Bad request: {e}"})
+                    break
+
+                if request is None:
+                    break
+
+                reply = await self.dispatch(request)
+                await write_message(writer, reply)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the handler for a request and build the reply."""
+        request_id = request.get("id")
+        method = request.get("method")
+        handler = self._handlers.get(method)
+
+        if handler is None:
+            return {"id": request_id, "error": f"Unknown method: {method}"}
+
+        try:
+            result = await handler(request.get("params") or {})
+        except Exception as e:
+            code = getattr(e, "rpc_code", None)
+            if code is None:
+                logger.exception(f"RPC handler for {method} failed")
+                return {"id": request_id, "error": str(e)}
+            # An expected rejection: the caller gets the code, no traceback here
+            logger.info(f"RPC {method} rejected: {e}")
+            return {"id": request_id, "error": str(e), "code": code}
+
+        return {"id": request_id, "result": result}
+
+
+class RPCClient:
+    """
+    A persistent connection to an RPCServer.
+
+    Requests on one client are serialised; open several clients for
+    concurrent calls.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+    ):
+        if path is None and (host is None or port is None):
+            raise ValueError("RPCClient needs either a socket path or host and port")
+
+        self.path = path
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._ids = itertools.count(1)
+        self._lock_instance: Optional[asyncio.Lock] = None
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        # Created inside the running loop: before 3.10 a lock binds to the
+        # loop current at construction, and NodeClient may be built outside it
+        if self._lock_instance is None:
+            self._lock_instance = asyncio.Lock()
+        return self._lock_instance
+
+    async def connect(self):
+        """Open the connection."""
+        if self.path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                self.path, limit=MAX_MESSAGE_BYTES
+            )
+        else:
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host, self.port, limit=MAX_MESSAGE_BYTES
+            )
+
+    @property
+    def connected(self) -> bool:
+        """Whether the connection is open and the server hasn't closed its end."""
+        return (
+            self._writer is not None
+            and not self._writer.is_closing()
+            and not self._reader.at_eof()
+        )
+
+    async def close(self):
+        """Close the connection."""
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        self._reader = self._writer = None
+
+    async def call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Call ``method`` and return its result, raising RPCError on failure."""
+        async with self._lock:
+            if self._writer is None:
+                await self.connect()
+
+            request_id = next(self._ids)
+            await write_message(
+                self._writer, {"id": request_id, "method": method, "params": params or {}}
+            )
+
+            reply = await read_message(self._reader)
+            if reply is None:
+                await self.close()
+                raise ConnectionError("RPC server closed the connection")
+
+        if "error" in reply:
+            raise RPCError(reply["error"], reply.get("code"))
+        return reply.get("result")
+
+    async def __aenter__(self) -> "RPCClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def rpc_call(
+    method: str,
+    params: Optional[Dict[str, Any]] = None,
+    path: Optional[str] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Any:
+    """One-shot RPC: connect, call, close."""
+
+    async def _call():
+        async with RPCClient(path=path, host=host, port=port) as client:
+            return await client.call(method, params)
+
+    return await asyncio.wait_for(_call(), timeout)
+
+
+async def _socket_alive(path: str) -> bool:
+    """Whether something is accepting connections on a Unix socket."""
+    try:
+        _, writer = await asyncio.open_unix_connection(path)
+    except (ConnectionError, FileNotFoundError, OSError):
+        return False
+    writer.close()
+    return True
@@ -0,0 +1,120 @@
+"""
+Node-to-node transports.
+
+Everything a node says to another node (gossip, forwarded hidden states)
+goes through a Transport, so the network underneath can be swapped: TCP
+sockets in production, an emulated in-memory network in tests and
+benchmarks (see ``swarm.protocol.memory``).
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from swarm.protocol.rpc import RPCClient, RPCError, RPCServer
+
+
+class Transport:
+    """
+    How a node listens for and sends RPCs to other nodes.
+
+    ``advertise_host`` is the address peers should use for this node when
+    the transport defines one. ``multicast_discovery`` says whether mDNS can
+    find nodes on this transport.
+    """
+
+    advertise_host: Optional[str] = None
+    multicast_discovery: bool = True
+
+    async def listen(self, server: RPCServer, host: str, port: int) -> int:
+        """Serve ``server`` at ``host:port``; returns the bound port."""
+        raise NotImplementedError
+
+    async def call(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Call ``method`` on the node at ``host:port`` and return its result."""
+        raise NotImplementedError
+
+    async def close(self):
+        """Stop listening."""
+
+
+class TCPTransport(Transport):
+    """
+    JSON-lines RPC over real TCP sockets.
+
+    Connections to each peer are pooled and reused, so a stage hop per
+    token doesn't pay a TCP handshake. A call takes an idle connection (or
+    opens one) and returns it when the reply is in; concurrent calls to one
+    peer use separate connections. Idle connections the peer has closed are
+    dropped before use; a call that fails after it was sent is not retried.
+    """
+
+    # Idle connections kept open per peer
+    MAX_IDLE_PER_PEER = 8
+
+    def __init__(self):
+        self._idle: Dict[Tuple[str, int], List[RPCClient]] = {}
+
+    async def listen(self, server: RPCServer, host: str, port: int) -> int:
+        return await server.start_tcp(host, port)
+
+    async def call(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        key = (host, port)
+        idle = self._idle.get(key, [])
+        while idle:
+            client = idle.pop()
+            if client.connected:
+                break
+            # The peer closed the idle connection (it restarted, or shut it
+            # down). Calls aren't retried once sent: the handler may have run
+            await client.close()
+        else:
+            client = RPCClient(host=host, port=port)
+        return await self._call(key, client, method, params, timeout)
+
+    async def _call(
+        self,
+        key: Tuple[str, int],
+        client: RPCClient,
+        method: str,
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+    ) -> Any:
+        try:
+            result = await asyncio.wait_for(client.call(method, params), timeout)
+        except RPCError:
+            # The handler failed; the connection is fine
+            self._release(key, client)
+            raise
+        except BaseException:
+            # A timed-out or cancelled call may still get its reply later,
+            # which would be read as the answer to the next one
+            await client.close()
+            raise
+        self._release(key, client)
+        return result
+
+    def _release(self, key: Tuple[str, int], client: RPCClient):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.MAX_IDLE_PER_PEER:
+            idle.append(client)
+        else:
+            asyncio.ensure_future(client.close())
+
+    async def close(self):
+        clients = [client for idle in self._idle.values() for client in idle]
+        self._idle.clear()
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
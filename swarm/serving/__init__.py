@@ -0,0 +1,16 @@
+"""Serving module."""
+
+from swarm.serving.admission import AdmissionController, Overloaded
+from swarm.serving.batch import BatchItem, BatchReport, run_batch
+from swarm.serving.metrics import MetricsServer
+from swarm.serving.openai import OpenAIServer
+
+__all__ = [
+    "AdmissionController",
+    "BatchItem",
+    "BatchReport",
+    "MetricsServer",
+    "OpenAIServer",
+    "Overloaded",
+    "run_batch",
+]
@@ -0,0 +1,85 @@
+"""
+Admission control for inference requests.
+
+Bounds how many requests run at once and how many may wait behind them,
+so overload turns into fast rejections instead of unbounded queueing.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full."""
+
+
+class AdmissionController:
+    """
+    Concurrency limit plus a bounded wait queue.
+
+    Usage:
+        async with admission.admit():
+            await node.run_inference(...)
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def _slots(self) -> asyncio.Semaphore:
+        # Created inside the running loop: before 3.10 a semaphore binds to
+        # the loop current at construction, which the caller's may not be
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests running plus requests waiting."""
+        return self.active + self.waiting
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        Wait for a slot, or raise Overloaded if the queue is full and
+        asyncio.TimeoutError if none frees up within ``timeout`` seconds.
+        """
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            raise Overloaded(f"{self.waiting} requests already queued")
+
+        self.waiting += 1
+        acquiring = asyncio.ensure_future(self._slots.acquire())
+        try:
+            await asyncio.wait([acquiring], timeout=timeout)
+        finally:
+            self.waiting -= 1
+            if not acquiring.done():
+                # Timed out or cancelled: a slot granted from here on goes
+                # straight back instead of leaking
+                acquiring.cancel()
+                acquiring.add_done_callback(self._give_back)
+        if not acquiring.done():
+            raise asyncio.TimeoutError(f"No slot free within {timeout}s")
+        self.active += 1
+
+    def release(self):
+        """Give back a slot taken by acquire()."""
+        self.active -= 1
+        self._slots.release()
+
+    def _give_back(self, acquiring: "asyncio.Future[bool]"):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,196 @@
+"""
+Offline batch inference.
+
+Runs every prompt of a JSONL file through the cluster and appends one
+JSON result per line to an output file as soon as it is done. Enough
+requests are kept in flight to keep every pipeline stage busy, at batch
+priority, so interactive traffic on the same cluster still goes first.
+
+The output file doubles as the checkpoint: a rerun with the same output
+skips every prompt that already has a result, so an interrupted job
+resumes where it stopped.
+
+Input lines are either a JSON string (the prompt) or an object with a
+``prompt`` and optionally ``id``, ``model`` and ``max_tokens``. Prompts
+without an ``id`` are identified by their line number.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    """One prompt of a batch job."""
+
+    id: Any
+    prompt: str
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+
+
+@dataclass
+class BatchReport:
+    """What a batch run did."""
+
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    output_tokens: int = 0
+    duration: float = 0.0
+
+    def summary(self) -> dict:
+        duration = self.duration or 1e-9
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "duration_s": self.duration,
+            "output_tokens": self.output_tokens,
+            "throughput_tok_s": self.output_tokens / duration,
+            "requests_per_s": self.completed / duration,
+        }
+
+
+# Runs one item and returns the generated text
+Infer = Callable[[BatchItem], Awaitable[str]]
+
+
+def read_items(path: str) -> Iterator[BatchItem]:
+    """
+    Prompts of a JSONL file, read lazily. Malformed lines come back as
+    items with an empty prompt and are reported as failures.
+    """
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"{path}:{number}: not valid JSON")
+                yield BatchItem(number, "")
+                continue
+
+            if isinstance(record, str):
+                yield BatchItem(number, record)
+            elif isinstance(record, dict) and isinstance(record.get("prompt"), str):
+                yield BatchItem(
+                    record.get("id", number),
+                    record["prompt"],
+                    record.get("model"),
+                    record.get("max_tokens"),
+                )
+            else:
+                logger.warning(f"{path}:{number}: expected a string or an object with a 'prompt'")
+                yield BatchItem(record.get("id", number) if isinstance(record, dict) else number, "")
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids with a successful result in an output file.
+
+    A line cut short by an interrupted write is truncated away, so the file
+    can be appended to again.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning(f"Dropping a partly written result at the end of {path}")
+            f.truncate(end)
+
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict) and "output" in record:
+            done.add(str(record.get("id")))
+    return done
+
+
+async def run_batch(
+    infer: Infer,
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    retries: int = 3,
+    on_result: Optional[Callable[[BatchReport], None]] = None,
+) -> BatchReport:
+    """
+    Run every prompt in ``input_path`` not yet done in ``output_path``.
+
+    At most ``concurrency`` prompts are in flight. A failed prompt is
+    retried up to ``retries`` times with backoff (a full cluster rejects
+    work it has no memory for), then recorded with its error. Failed
+    prompts are retried again on the next run; readers should take the
+    last line written for an id.
+    """
+    done = completed_ids(output_path)
+    report = BatchReport()
+    # Bounded, so a huge input file is never read far ahead of the workers
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def feed():
+        for item in read_items(input_path):
+            if str(item.id) in done:
+                report.skipped += 1
+                continue
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def run(item: BatchItem) -> dict:
+        if not item.prompt:
+            return {"id": item.id, "error": "Invalid input line"}
+        for attempt in range(retries + 1):
+            try:
+                return {"id": item.id, "output": await infer(item)}
+            except Exception as e:
+                if attempt == retries:
+                    return {"id": item.id, "error": str(e) or type(e).__name__}
+                logger.info(f"Prompt {item.id} failed ({e}), retrying")
+                await asyncio.sleep(0.5 * 2**attempt)
+
+    started = time.perf_counter()
+    with open(output_path, "a") as out:
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                result = await run(item)
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                if "output" in result:
+                    report.completed += 1
+                    report.output_tokens += len(result["output"].split())
+                else:
+                    report.failed += 1
+                if on_result is not None:
+                    on_result(report)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            await asyncio.gather(feeder, *(worker() for _ in range(max(1, concurrency))))
+        finally:
+            feeder.cancel()
+            out.flush()
+            os.fsync(out.fileno())
+
+    report.duration = time.perf_counter() - started
+    return report
@@ -0,0 +1,38 @@
+"""
+Metrics endpoint.
+
+Serves a node's metrics registry at ``/metrics`` for Prometheus to scrape.
+"""
+
+import logging
+
+from swarm.protocol.http import HTTPRequest, HTTPResponse, HTTPServer
+from swarm.utils.metrics import CONTENT_TYPE, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """HTTP server exposing a MetricsRegistry in the Prometheus text format."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "0.0.0.0", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+
+        self.http = HTTPServer()
+        self.http.route("GET", "/metrics", self.handle)
+
+    async def start(self):
+        """Start serving."""
+        await self.http.start(self.host, self.port)
+        self.port = self.http.port
+        logger.info(f"Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop serving."""
+        await self.http.stop()
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        """Render the registry; also mountable on another HTTPServer."""
+        return HTTPResponse.text(self.registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,336 @@
+"""
+OpenAI-compatible HTTP frontend.
+
+Serves ``/v1/completions``, ``/v1/chat/completions`` and ``/v1/models`` on
+top of a running Node, with admission control and per-request deadlines.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from swarm.inference.coordinator import InferenceCoordinator
+from swarm.inference.memory import MemoryExhausted
+from swarm.inference.scheduler import PRIORITIES, DeadlineExceeded
+from swarm.protocol.http import (
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPServer,
+    StreamingResponse,
+)
+from swarm.serving.admission import AdmissionController, Overloaded
+from swarm.serving.metrics import MetricsServer
+from swarm.utils.tracing import new_trace_id
+
+logger = logging.getLogger(__name__)
+
+
+def _openai_error(error: HTTPError) -> HTTPResponse:
+    """Format errors the way OpenAI clients expect."""
+    error_type = {
+        400: "invalid_request_error",
+        404: "not_found_error",
+        429: "rate_limit_error",
+        504: "timeout_error",
+    }.get(error.status, "server_error")
+
+    return HTTPResponse.json(
+        {"error": {"message": error.message, "type": error_type, "code": error.status}},
+        status=error.status,
+        headers=error.headers,
+    )
+
+
+def _sse(data: Any) -> bytes:
+    """Encode one Server-Sent Event."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"data: {payload}\n\n".encode()
+
+
+def _client(request: HTTPRequest, body: Dict[str, Any]) -> str:
+    """
+    Who a request's sessions belong to: its API key, hashed so keys never
+    reach logs or lease ids, and the OpenAI ``user`` it names.
+    """
+    key = request.headers.get("authorization", "")
+    client = hashlib.sha256(key.encode()).hexdigest()[:16] if key else "anonymous"
+    user = body.get("user")
+    if user is not None and not isinstance(user, str):
+        raise HTTPError(400, "'user' must be a string")
+    return f"{client}/{user}" if user else client
+
+
+def _format_chat(messages: List[Dict[str, Any]]) -> str:
+    """Flatten chat messages into a single prompt."""
+    lines = [f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages]
+    return "\n".join(lines + ["assistant:"])
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+class OpenAIServer:
+    """
+    HTTP server exposing a Node through the OpenAI API shape.
+
+    At most ``max_concurrency`` requests run at once; up to ``max_queue``
+    more wait for a slot and anything beyond that gets a 429. Each request
+    must finish within its deadline (``request_timeout`` by default, or the
+    ``timeout`` body field) or it gets a 504.
+    """
+
+    def __init__(
+        self,
+        node,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_concurrency: int = 4,
+        max_queue: int = 32,
+        request_timeout: float = 60.0,
+    ):
+        self.node = node
+        self.host = host
+        self.port = port
+        self.request_timeout = request_timeout
+        self.admission = AdmissionController(max_concurrency=max_concurrency, max_queue=max_queue)
+
+        self.http = HTTPServer(error_formatter=_openai_error)
+        self.http.route("POST", "/v1/completions", self._completions)
+        self.http.route("POST", "/v1/chat/completions", self._chat_completions)
+        self.http.route("GET", "/v1/models", self._models)
+        self.http.route("GET", "/health", self._health)
+        self.http.route("GET", "/metrics", MetricsServer(node.metrics).handle)
+        self.http.route("GET", "/v1/traces", self._traces)
+
+        self._queue_wait = node.metrics.histogram(
+            "swarm_queue_wait_seconds", "Time requests spent waiting for an admission slot"
+        )
+        self._rejected = node.metrics.counter(
+            "swarm_requests_rejected_total", "Requests turned away by admission control", ["reason"]
+        )
+
+    async def start(self):
+        """Start serving."""
+        await self.http.start(self.host, self.port)
+        self.port = self.http.port
+        logger.info(f"OpenAI-compatible API on http://{self.host}:{self.port}/v1")
+
+    async def stop(self):
+        """Stop serving."""
+        await self.http.stop()
+
+    async def _models(self, request: HTTPRequest) -> HTTPResponse:
+        return HTTPResponse.json({
+            "object": "list",
+            "data": [
+                {"id": name, "object": "model", "owned_by": "swarm"}
+                for name in InferenceCoordinator.MODELS
+            ],
+        })
+
+    async def _health(self, request: HTTPRequest) -> HTTPResponse:
+        return HTTPResponse.json({
+            "status": "ok" if self.node.running else "stopped",
+            "active": self.admission.active,
+            "waiting": self.admission.waiting,
+        })
+
+    async def _traces(self, request: HTTPRequest) -> HTTPResponse:
+        """Timeline of a recent request by ``id`` (``format=chrome`` for the Chrome trace format)."""
+        trace_id = request.query.get("id")
+        if not trace_id:
+            raise HTTPError(400, "Missing 'id' query parameter")
+
+        trace = self.node.get_trace(trace_id, chrome=request.query.get("format") == "chrome")
+        if trace is None:
+            raise HTTPError(404, f"No trace with id '{trace_id}'")
+        return HTTPResponse.json(trace)
+
+    async def _completions(self, request: HTTPRequest):
+        body = self._parse_body(request)
+        prompt = body.get("prompt")
+        if isinstance(prompt, list):
+            if len(prompt) != 1:
+                raise HTTPError(400, "Only a single prompt per request is supported")
+            prompt = prompt[0]
+        if not isinstance(prompt, str):
+            raise HTTPError(400, "'prompt' must be a string")
+
+        return await self._respond(body, prompt, chat=False, client=_client(request, body))
+
+    async def _chat_completions(self, request: HTTPRequest):
+        body = self._parse_body(request)
+        messages = body.get("messages")
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list")
+
+        return await self._respond(body, _format_chat(messages), chat=True, client=_client(request, body))
+
+    def _parse_body(self, request: HTTPRequest) -> Dict[str, Any]:
+        body = request.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+
+        model = body.setdefault("model", "default")
+        if model not in InferenceCoordinator.MODELS:
+            raise HTTPError(404, f"The model '{model}' does not exist")
+        return body
+
+    async def _respond(self, body: Dict[str, Any], prompt: str, chat: bool, client: str):
+        """Admit the request, then answer it whole or as an SSE stream."""
+        loop = asyncio.get_running_loop()
+        try:
+            timeout = float(body.get("timeout") or self.request_timeout)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'timeout' must be a number of seconds")
+        deadline = loop.time() + timeout
+        model = body["model"]
+        max_tokens = body.get("max_tokens")
+        if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+            raise HTTPError(400, "'max_tokens' must be a positive integer")
+        session_id = body.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, "'session_id' must be a string")
+        priority = body.get("priority", "normal")
+        if priority not in PRIORITIES:
+            raise HTTPError(400, f"'priority' must be one of {list(PRIORITIES)}")
+        trace_id = new_trace_id()
+        headers = {"X-Trace-Id": trace_id}
+
+        # Admission happens before any response bytes go out, so a full
+        # queue or an expired deadline can still become a proper status
+        queued_at = loop.time()
+        try:
+            await self.admission.acquire(timeout=deadline - loop.time())
+        except Overloaded as e:
+            self._rejected.inc(reason="overloaded")
+            raise HTTPError(429, f"Server overloaded: {e}", headers={"Retry-After": "1"})
+        except asyncio.TimeoutError:
+            self._rejected.inc(reason="deadline")
+            raise HTTPError(504, "Deadline exceeded while queued")
+        self._queue_wait.observe(loop.time() - queued_at)
+        # Stages schedule by wall-clock deadline
+        urgency = {"priority": priority, "deadline": time.time() + deadline - loop.time()}
+
+        if body.get("stream"):
+            return StreamingResponse(
+                chunks=self._stream(
+                    prompt, model, chat, deadline, trace_id, max_tokens, session_id, client, urgency
+                ),
+                headers=headers,
+                on_close=self.admission.release,
+            )
+
+        try:
+            text = await asyncio.wait_for(
+                self.node.run_inference(
+                    prompt, model, trace_id, max_tokens, session_id, client=client, **urgency
+                ),
+                deadline - loop.time(),
+            )
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            raise HTTPError(504, "Deadline exceeded")
+        except MemoryExhausted as e:
+            self._rejected.inc(reason="memory")
+            raise HTTPError(503, f"Not enough memory: {e}", headers={"Retry-After": "1"})
+        finally:
+            self.admission.release()
+
+        return HTTPResponse.json(self._completion(model, prompt, text, chat), headers=headers)
+
+    async def _stream(
+        self,
+        prompt: str,
+        model: str,
+        chat: bool,
+        deadline: float,
+        trace_id: str,
+        max_tokens: Optional[int],
+        session_id: Optional[str],
+        client: str,
+        urgency: Dict[str, Any],
+    ) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        completion_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        pieces = self.node.stream_inference(
+            prompt, model, trace_id, max_tokens, session_id, client=client, **urgency
+        ).__aiter__()
+
+        if chat:
+            yield _sse(self._chunk(completion_id, created, model, chat, {"role": "assistant"}))
+
+        try:
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                except (asyncio.TimeoutError, DeadlineExceeded):
+                    yield _sse({"error": {"message": "Deadline exceeded", "type": "timeout_error"}})
+                    return
+                except MemoryExhausted as e:
+                    self._rejected.inc(reason="memory")
+                    yield _sse({"error": {"message": f"Not enough memory: {e}", "type": "overloaded_error"}})
+                    return
+
+                delta = {"content": piece} if chat else piece
+                yield _sse(self._chunk(completion_id, created, model, chat, delta))
+        finally:
+            await pieces.aclose()
+
+        yield _sse(self._chunk(completion_id, created, model, chat, {} if chat else "", "stop"))
+        yield _sse("[DONE]")
+
+    def _chunk(
+        self,
+        completion_id: str,
+        created: int,
+        model: str,
+        chat: bool,
+        delta: Any,
+        finish_reason: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if chat:
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+        else:
+            choice = {"index": 0, "text": delta, "logprobs": None, "finish_reason": finish_reason}
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk" if chat else "text_completion",
+            "created": created,
+            "model": model,
+            "choices": [choice],
+        }
+
+    def _completion(self, model: str, prompt: str, text: str, chat: bool) -> Dict[str, Any]:
+        if chat:
+            choice = {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        else:
+            choice = {"index": 0, "text": text, "logprobs": None, "finish_reason": "stop"}
+
+        prompt_tokens = _count_tokens(prompt)
+        completion_tokens = _count_tokens(text)
+        return {
+            "id": f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion" if chat else "text_completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [choice],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
@@ -0,0 +1,22 @@
+"""
+Names of the pluggable parts the CLI offers as choices.
+
+They live here, away from the modules that implement them, so parsing
+options doesn't import NumPy.
+"""
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+# Compute backends, in swarm.inference.backends
+BACKEND_NAMES = ("numpy", "torch", "mlx")
+
+# Activation codecs, in swarm.protocol.codec. Every node decodes the base
+# ones; lz4 only where it is installed
+BASE_CODECS = ("raw", "fp16", "bf16", "int8", "zlib")
+CODECS = BASE_CODECS + (("lz4",) if lz4 else ())
+
+# Prompt and output length distributions of benchmark workloads
+LENGTH_DISTRIBUTIONS = ("fixed", "uniform", "exponential")
@@ -0,0 +1,89 @@
+"""
+Hardware probing.
+
+Checking for a CUDA GPU means importing torch, which takes seconds. The
+answer only changes with the machine or its torch install, so it is kept
+in memory and on disk, keyed by a fingerprint of both: repeated CLI
+invocations skip the import. Without torch there is nothing to probe.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import platform
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GPUInfo:
+    """What the probe found."""
+
+    has_gpu: bool = False
+    memory_gb: float = 0.0
+
+
+def _fingerprint() -> str:
+    """Changes whenever the probe's answer could."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        torch_version = version("torch")
+    except PackageNotFoundError:
+        torch_version = "unknown"
+    return "|".join(
+        [
+            platform.node(),
+            platform.platform(),
+            f"torch {torch_version}",
+            os.environ.get("CUDA_VISIBLE_DEVICES", ""),
+        ]
+    )
+
+
+def _probe() -> GPUInfo:
+    try:
+        import torch
+    except ImportError:
+        return GPUInfo()
+    if not torch.cuda.is_available():
+        return GPUInfo()
+    return GPUInfo(True, torch.cuda.get_device_properties(0).total_memory / 1024**3)
+
+
+@lru_cache(maxsize=None)
+def probe_gpu(cache_path: Optional[str] = None) -> GPUInfo:
+    """
+    The machine's GPU, probed once and then read from ``cache_path``
+    (when given) until the fingerprint changes.
+    """
+    if importlib.util.find_spec("torch") is None:
+        return GPUInfo()
+
+    fingerprint = _fingerprint()
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+            if data.get("fingerprint") == fingerprint:
+                return GPUInfo(**data["gpu"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable hardware cache {cache_path}: {e}")
+
+    gpu = _probe()
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"fingerprint": fingerprint, "gpu": asdict(gpu)}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write hardware cache {cache_path}: {e}")
+    return gpu
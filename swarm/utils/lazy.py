@@ -0,0 +1,37 @@
+"""
+Lazy package exports.
+
+Packages whose public names live in heavy modules re-export them on first
+use (PEP 562), so importing the package, or a light module inside it,
+doesn't import everything else.
+"""
+
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def lazy_module(name: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    Module-level ``__getattr__`` and ``__dir__`` for package ``name``.
+
+    ``exports`` maps each public name to the module defining it; that
+    module is imported when the name is first looked up.
+
+    Usage:
+        __getattr__, __dir__ = lazy_module(__name__, {"Node": "swarm.node.node"})
+    """
+
+    def __getattr__(attr: str) -> Any:
+        module = exports.get(attr)
+        if module is None:
+            raise AttributeError(f"module {name!r} has no attribute {attr!r}")
+        value = getattr(importlib.import_module(module), attr)
+        # Later lookups find it without coming back here
+        setattr(sys.modules[name], attr, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[name])) | set(exports))
+
+    return __getattr__, __dir__
@@ -0,0 +1,27 @@
+"""
+Network helpers.
+"""
+
+import socket
+from typing import Tuple
+
+
+def get_local_ip() -> str:
+    """Get the local IP address other machines can reach us on."""
+    try:
+        # Create a socket to determine local IP
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(("8.8.8.8", 80))
+        local_ip = s.getsockname()[0]
+        s.close()
+        return local_ip
+    except Exception:
+        return "127.0.0.1"
+
+
+def parse_address(address: str, default_port: int = 5000) -> Tuple[str, int]:
+    """Parse ``host[:port]`` into (host, port)."""
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        return address, default_port
+    return host.strip("[]"), int(port)
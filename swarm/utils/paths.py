@@ -0,0 +1,37 @@
+"""
+Filesystem locations used by Swarm.
+
+Everything lives under ``~/.swarm`` unless ``SWARM_HOME`` is set.
+"""
+
+import os
+
+
+def swarm_home() -> str:
+    """Directory for Swarm's local state."""
+    return os.environ.get("SWARM_HOME") or os.path.join(os.path.expanduser("~"), ".swarm")
+
+
+def default_control_socket() -> str:
+    """Path of the control socket a running ``swarm node`` listens on."""
+    return os.path.join(swarm_home(), "node.sock")
+
+
+def default_peer_cache() -> str:
+    """Path of the on-disk cache of last-known peers."""
+    return os.path.join(swarm_home(), "peers.json")
+
+
+def default_kv_offload_dir() -> str:
+    """Directory where KV cache blocks are spilled when offload is on."""
+    return os.path.join(swarm_home(), "kv")
+
+
+def default_profile_dir() -> str:
+    """Directory where profiling captures are written."""
+    return os.path.join(swarm_home(), "profiles")
+
+
+def default_hardware_cache() -> str:
+    """Path of the cached hardware probe."""
+    return os.path.join(swarm_home(), "hardware.json")
@@ -0,0 +1,164 @@
+"""
+Opt-in profiling of the request path.
+
+``Profiler.section`` wraps hot spots (planning, serialization, layer
+execution, send/receive) with cheap wall-clock timers; when profiling is
+off it hands back a shared no-op context, so the instrumented code costs
+one attribute check. For deeper dives a node can capture a cProfile window
+or a tracemalloc snapshot on demand.
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import ContextManager, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_DISABLED = nullcontext()
+
+
+@dataclass
+class SectionStats:
+    """Accumulated timings of one section."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Profiler:
+    """
+    Section timers plus on-demand cProfile and tracemalloc captures.
+
+    Usage:
+        with profiler.section("serialize"):
+            wire = frame.to_wire()
+    """
+
+    def __init__(self, enabled: bool = False, output_dir: Optional[str] = None):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.sections: Dict[str, SectionStats] = {}
+        self._cpu_capture: Optional[asyncio.Task] = None
+        self._started_tracing = False
+
+        # Allocations are only traced from the moment tracing starts, so
+        # start now rather than when the first snapshot is asked for
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def section(self, name: str) -> ContextManager:
+        """Time the ``with`` block under ``name`` (no-op unless enabled)."""
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    def record(self, name: str, seconds: float, count: int = 1):
+        """Add an externally measured duration covering ``count`` occurrences."""
+        if not self.enabled:
+            return
+        stats = self.sections.get(name)
+        if stats is None:
+            stats = self.sections[name] = SectionStats()
+        stats.count += count
+        stats.total += seconds
+        stats.max = max(stats.max, seconds / count)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Per-section count, total, mean and max, slowest total first."""
+        ordered = sorted(self.sections.items(), key=lambda item: item[1].total, reverse=True)
+        return {
+            name: {
+                "count": stats.count,
+                "total_s": stats.total,
+                "mean_ms": stats.mean * 1000,
+                "max_ms": stats.max * 1000,
+            }
+            for name, stats in ordered
+        }
+
+    def reset(self):
+        self.sections.clear()
+
+    def close(self):
+        """Stop allocation tracing if this profiler started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    async def capture_cpu(self, duration: float = 10.0, path: Optional[str] = None) -> str:
+        """
+        Run cProfile over the event loop for ``duration`` seconds.
+
+        Writes a pstats file (open with ``python -m pstats`` or snakeviz)
+        and returns its path. Work in the compute pool is not included.
+        """
+        if self._cpu_capture is not None:
+            raise RuntimeError("A CPU profile is already being captured")
+
+        path = path or self._output_path("cpu", "pstats")
+        profile = cProfile.Profile()
+        self._cpu_capture = asyncio.current_task()
+        profile.enable()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            profile.disable()
+            self._cpu_capture = None
+
+        profile.dump_stats(path)
+        logger.info(f"CPU profile written to {path}")
+        return path
+
+    def capture_memory(self, path: Optional[str] = None, limit: int = 15) -> Dict[str, object]:
+        """
+        Dump a tracemalloc snapshot and summarize the top allocation sites.
+
+        The snapshot file can be reloaded with ``tracemalloc.Snapshot.load``.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        path = path or self._output_path("memory", "tracemalloc")
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(path)
+
+        current, peak = tracemalloc.get_traced_memory()
+        top = [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+        logger.info(f"Memory snapshot written to {path}")
+        return {"path": path, "current_bytes": current, "peak_bytes": peak, "top": top}
+
+    @staticmethod
+    def summarize_cpu(path: str, limit: int = 20) -> str:
+        """Top functions by cumulative time from a capture_cpu file."""
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def _output_path(self, kind: str, extension: str) -> str:
+        directory = self.output_dir or os.getcwd()
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(directory, f"{kind}-{stamp}-{os.getpid()}.{extension}")
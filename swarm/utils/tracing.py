@@ -0,0 +1,144 @@
+"""
+Per-request tracing across pipeline stages.
+
+Every request gets a trace id that travels with its hidden-state frames.
+Each node times what it did with a frame (receive, queue, compute, send)
+and hands the spans back, so the coordinator can assemble one timeline per
+request and export it as JSON or in the Chrome trace format
+(chrome://tracing, Perfetto).
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@dataclass
+class Span:
+    """One timed step of a request on one node."""
+
+    name: str
+    node_id: str
+    start: float  # wall-clock seconds
+    duration: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Span":
+        return cls(
+            name=data["name"],
+            node_id=data["node_id"],
+            start=float(data["start"]),
+            duration=float(data["duration"]),
+            attrs=dict(data.get("attrs") or {}),
+        )
+
+
+@dataclass
+class Trace:
+    """All spans recorded for one request."""
+
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        if not self.spans:
+            return 0.0
+        return max(s.end for s in self.spans) - min(s.start for s in self.spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The timeline as plain JSON, spans in start order."""
+        return {
+            "trace_id": self.trace_id,
+            "duration": self.duration,
+            "spans": [asdict(s) for s in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """
+        The timeline in the Chrome trace event format.
+
+        Each node becomes a process row so slow stages and links stand out.
+        """
+        nodes = sorted({s.node_id for s in self.spans})
+        pids = {node_id: i + 1 for i, node_id in enumerate(nodes)}
+
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pids[node_id], "args": {"name": node_id}}
+            for node_id in nodes
+        ]
+        events += [
+            {
+                "name": s.name,
+                "cat": "swarm",
+                "ph": "X",
+                "ts": s.start * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": pids[s.node_id],
+                "tid": 1,
+                "args": dict(s.attrs, trace_id=self.trace_id),
+            }
+            for s in sorted(self.spans, key=lambda s: s.start)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class Tracer:
+    """
+    Records spans for one node and keeps the most recent traces.
+
+    Only the last ``max_traces`` requests are kept, so tracing is always on
+    without growing without bound.
+    """
+
+    def __init__(self, node_id: str, max_traces: int = 256):
+        self.node_id = node_id
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def trace(self, trace_id: str) -> Trace:
+        """Get or start the trace for ``trace_id``."""
+        trace = self._traces.get(trace_id)
+        if trace is None:
+            trace = Trace(trace_id)
+            self._traces[trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        return trace
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._traces.get(trace_id)
+
+    def recent(self, limit: int = 20) -> List[Trace]:
+        """Most recent traces, newest first."""
+        return list(reversed(self._traces.values()))[:limit]
+
+    def record(self, trace_id: str, span: Span):
+        self.trace(trace_id).spans.append(span)
+
+    def add(self, trace_id: str, spans: List[Span]):
+        """Merge spans reported by another node."""
+        self.trace(trace_id).spans.extend(spans)
+
+    @contextmanager
+    def span(self, trace_id: str, name: str, **attrs: Any) -> Iterator[Span]:
+        """Time the ``with`` block as a span on this node."""
+        span = Span(name, self.node_id, time.time(), 0.0, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - started
+            self.record(trace_id, span)
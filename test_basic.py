@@ -6,7 +6,10 @@ Run with: python test_basic.py
 
 import asyncio
 import logging
-from swarm.node import Node, NodeConfig
+import os
+import tempfile
+import time
+from swarm.node import Node, NodeConfig, NodeClient
 
 logging.basicConfig(level=logging.INFO)
 
@@ -61,6 +64,1118 @@ async def test_cluster_info():
     await node.stop()
 
 
+async def test_process_compute_pool():
+    """Test layer execution in a process pool."""
+    print("\nTesting process compute pool...")
+    
+    config = NodeConfig(port=5004, auto_discover=False, compute_mode="process", compute_workers=2)
+    node = Node(config)
+    
+    await node.start()
+    
+    result = await node.run_inference("What is 2+2?", model="default")
+    print(f"✓ Inference result: {result}")
+    print(
+        f"✓ Compute pool: {node.executor.workers} {node.executor.mode} worker(s), "
+        f"{node.executor.intra_op_threads} intra-op thread(s)"
+    )
+    
+    await node.stop()
+    
+    from swarm.inference.executor import plan_threads
+    assert plan_threads(8, None, 2) == (4, 2)
+    try:
+        plan_threads(8, None, 0)
+        assert False, "zero intra-op threads should be refused"
+    except ValueError:
+        pass
+    print("✓ Thread plan refuses a zero thread count")
+    
+    # A thread pool shares the process: limits hold only while compute runs
+    import os
+    from swarm.inference.executor import LayerExecutor
+    env = os.environ.get("OMP_NUM_THREADS")
+    executor = LayerExecutor(mode="thread", workers=2, intra_op_threads=3)
+    assert await executor.run(lambda: executor._limits._active) == 1
+    assert executor._limits._active == 0 and os.environ.get("OMP_NUM_THREADS") == env
+    executor.shutdown()
+    print("✓ Thread pool leaves the process thread settings as it found them")
+
+
+async def test_local_fast_path():
+    """Test that small models skip partitioning entirely."""
+    print("\nTesting local fast path...")
+    
+    config = NodeConfig(port=5005, auto_discover=False)
+    node = Node(config)
+    node.stats.memory_available_gb = 64.0
+    
+    assert node.fits_locally("default")
+    
+    await node.start()
+    
+    result = await node.run_inference("What is 2+2?", model="default")
+    assert result.startswith("[Local inference")
+    assert not node.coordinator.current_partitions
+    print(f"✓ Ran locally: {result}")
+    
+    await node.stop()
+
+
+async def test_control_socket():
+    """Test submitting inference to a running node over its control socket."""
+    print("\nTesting control socket...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "node.sock")
+        config = NodeConfig(port=5006, auto_discover=False, control_socket=socket_path)
+        node = Node(config)
+        
+        await node.start()
+        assert NodeClient.available(socket_path)
+        
+        async with NodeClient(socket_path) as client:
+            first = await client.infer("What is 2+2?")
+            second = await client.infer("What is 3+3?")
+            info = await client.cluster_info()
+        
+        assert info["node_id"] == node.node_id
+        print(f"✓ Results over one connection: {first!r}, {second!r}")
+        
+        await node.stop()
+        assert not os.path.exists(socket_path)
+        print("✓ Control socket removed on stop")
+
+
+async def test_openai_server():
+    """Test the OpenAI-compatible HTTP frontend."""
+    print("\nTesting OpenAI-compatible server...")
+    
+    import httpx
+    from swarm.serving import AdmissionController, OpenAIServer
+    
+    config = NodeConfig(port=5007, auto_discover=False)
+    node = Node(config)
+    await node.start()
+    
+    server = OpenAIServer(node, port=0, max_concurrency=1, max_queue=0)
+    await server.start()
+    base_url = f"http://127.0.0.1:{server.port}/v1"
+    
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.post("/chat/completions", json={
+            "model": "default",
+            "messages": [{"role": "user", "content": "What is 2+2?"}],
+        })
+        assert response.status_code == 200
+        assert node.get_trace(response.headers["x-trace-id"]) is not None
+        print(f"✓ Chat completion: {response.json()['choices'][0]['message']['content']}")
+        
+        async with client.stream("POST", "/completions", json={"prompt": "Hi", "stream": True}) as r:
+            events = [line async for line in r.aiter_lines() if line.startswith("data: ")]
+        assert events[-1] == "data: [DONE]"
+        print(f"✓ Streamed {len(events)} SSE events")
+        
+        # One slot and no queue: with the slot taken, requests are rejected
+        await server.admission.acquire()
+        response = await client.post("/completions", json={"prompt": "rejected"})
+        assert response.status_code == 429
+        server.admission.release()
+        print("✓ Overload returns 429")
+    
+    # Waiting for a slot times out or is cancelled without keeping one
+    admission = AdmissionController(max_concurrency=1, max_queue=1)
+    await admission.acquire()
+    try:
+        await admission.acquire(timeout=0.05)
+        assert False, "expected the wait to time out"
+    except asyncio.TimeoutError:
+        pass
+    waiter = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    admission.release()
+    await asyncio.sleep(0)
+    await admission.acquire(timeout=0.05)
+    assert admission.active == 1 and admission.waiting == 0
+    admission.release()
+    print("✓ Abandoned admission waits give their slot back")
+    
+    await server.stop()
+    await node.stop()
+
+
+async def test_peer_cache():
+    """Test that a restarting node starts with its cached peers."""
+    print("\nTesting peer cache...")
+    
+    from swarm.discovery import PeerCache, PeerInfo
+    
+    def peer(node_id: str, last_seen: float) -> PeerInfo:
+        return PeerInfo(node_id, f"{node_id}.local", "10.0.0.2", 5000, "linux_x86", 8.0, {}, last_seen)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "peers.json")
+        PeerCache(cache_path).save([peer("fresh001", time.time()), peer("stale001", 0.0)])
+        
+        config = NodeConfig(port=5008, peer_cache=cache_path)
+        node = Node(config)
+        await node.start()
+        
+        assert list(node.discovery.cached) == ["fresh001"]
+        assert node.discovery.expected_peers == 1
+        print(f"✓ Warm start with cached peers: {list(node.discovery.cached)}")
+        
+        # Cached peers aren't used or counted until mDNS or gossip confirms them
+        assert not node.peers
+        assert not await node.wait_for_peers(timeout=0.2)
+        print("✓ Unconfirmed peers stay out of planning and don't satisfy quorum")
+        
+        await node.stop()
+        
+        # Without mDNS, a restarted node reaches its last-known peers by gossip
+        cache_path = os.path.join(tmp, "gossip-peers.json")
+        fast = dict(auto_discover=False, gossip_interval=0.1, listen_host="127.0.0.1",
+                    advertise_host="127.0.0.1")
+        anchor = Node(NodeConfig(port=5040, **fast))
+        await anchor.start()
+        node = Node(NodeConfig(port=5041, peer_cache=cache_path, seeds=["127.0.0.1:5040"], **fast))
+        await node.start()
+        assert await node.wait_for_peers(1, timeout=2.0)
+        await node.stop()
+        
+        # On another port, so only the cache can lead it back to the anchor
+        restarted = Node(NodeConfig(port=5042, peer_cache=cache_path, **fast))
+        await restarted.start()
+        assert await restarted.wait_for_peers(1, timeout=0.5)
+        assert anchor.node_id in restarted.peers
+        print("✓ Restarted node without seeds or mDNS rejoined its cached peers")
+        await restarted.stop()
+        await anchor.stop()
+
+
+async def test_live_load_updates():
+    """Test that peers see each other's load change over discovery."""
+    print("\nTesting live load updates...")
+    
+    node_a = Node(NodeConfig(port=5009, announce_interval=0.2))
+    node_b = Node(NodeConfig(port=5010, announce_interval=0.2))
+    await node_a.start()
+    await node_b.start()
+    
+    assert await node_a.wait_for_peers(1, timeout=5)
+    print(f"✓ Peer discovered: {list(node_a.peers)}")
+    
+    await node_b.run_inference("What is 2+2?", model="default")
+    updated = await node_a.discovery.wait_until(
+        lambda: node_a.peers[node_b.node_id].models == ["default"], timeout=5
+    )
+    assert updated
+    print(f"✓ Peer load refreshed: {node_a.get_cluster_info()['peers'][0]}")
+    
+    await node_a.stop()
+    await node_b.stop()
+
+
+async def test_seed_gossip():
+    """Test cluster formation from a seed list without mDNS."""
+    print("\nTesting seed list and gossip...")
+    
+    def config(port: int, seeds=()) -> NodeConfig:
+        return NodeConfig(
+            port=port,
+            auto_discover=False,
+            advertise_host="127.0.0.1",
+            seeds=list(seeds),
+            gossip_interval=0.1,
+        )
+    
+    seed = Node(config(5011))
+    await seed.start()
+    
+    # Every other node only knows the seed; gossip spreads the rest
+    nodes = [Node(config(5012 + i, seeds=["127.0.0.1:5011"])) for i in range(3)]
+    for node in nodes:
+        await node.start()
+    
+    for node in [seed] + nodes:
+        assert await node.wait_for_peers(3, timeout=5)
+    print(f"✓ All 4 nodes converged: {sorted(seed.peers)}")
+    
+    # A peer stays while any source still sees it
+    peer = seed.peers[nodes[0].node_id]
+    seed._on_peer_added("mdns", peer)
+    seed._on_peer_removed("gossip", peer.node_id)
+    assert peer.node_id in seed.peers
+    seed._on_peer_removed("mdns", peer.node_id)
+    assert peer.node_id not in seed.peers
+    print("✓ Peers are dropped only once every source has lost them")
+    
+    # A silent member is declared dead after a few gossip intervals
+    await nodes[2].stop()
+    for _ in range(20):
+        if nodes[2].node_id not in seed.gossip.members:
+            break
+        await asyncio.sleep(0.1)
+    assert nodes[2].node_id not in seed.gossip.members
+    print(f"✓ Stopped node expired after {seed.gossip.fail_timeout:.1f}s of silence")
+    
+    for node in [seed] + nodes[:2]:
+        await node.stop()
+
+
+async def test_grouped_gossip():
+    """Test that nodes track their own group plus other groups' leaders."""
+    print("\nTesting grouped topology...")
+    
+    def config(port: int, group: str) -> NodeConfig:
+        return NodeConfig(
+            port=port,
+            auto_discover=False,
+            advertise_host="127.0.0.1",
+            seeds=["127.0.0.1:5015"],
+            gossip_interval=0.1,
+            group=group,
+        )
+    
+    nodes = [Node(config(5015 + i, "rack-a" if i < 3 else "rack-b")) for i in range(6)]
+    for node in nodes:
+        await node.start()
+    
+    # Each node tracks its two group mates plus the other group's leader,
+    # and learns the other group's size from that leader
+    for node in nodes:
+        other = "rack-b" if node.config.group == "rack-a" else "rack-a"
+        assert await node.wait_until(
+            lambda: len(node.peers) == 3
+            and node.get_cluster_info()["groups"].get(other, {}).get("nodes") == 3,
+            timeout=5,
+        )
+    
+    info = nodes[0].get_cluster_info()
+    print(f"✓ Groups: {info['groups']}")
+    
+    for node in nodes:
+        await node.stop()
+
+
+async def test_data_parallel_pipelines():
+    """Test that spare nodes form extra pipelines and requests spread over them."""
+    print("\nTesting data-parallel pipelines...")
+    
+    from swarm.discovery import PeerInfo
+    from swarm.inference.coordinator import InferenceCoordinator
+    
+    peers = [
+        PeerInfo(f"peer-{i}", f"peer-{i}.local", "10.0.0.2", 5100 + i, "linux_x86", 8.0, {})
+        for i in range(3)
+    ]
+    coordinator = InferenceCoordinator("self", local_memory_gb=8.0)
+    spec = coordinator.get_model_spec("llama-7b")
+    
+    # Four 8 GB nodes hold two copies of a ~16 GB model, every layer covered
+    pipelines = coordinator.plan("llama-7b", peers)
+    assert len(pipelines) == 2
+    for pipeline in pipelines:
+        assert pipeline[0].start_layer == 0
+        assert pipeline[-1].end_layer == spec.total_layers - 1
+    
+    # Concurrent requests land on different pipelines
+    with coordinator.router.route(pipelines, {}) as first:
+        with coordinator.router.route(pipelines, {}) as second:
+            assert first is not second
+    assert not coordinator.router.inflight
+    
+    # A node reporting a deep queue steers traffic to the other pipeline
+    busy = pipelines[1][-1].node_id
+    assert coordinator.router.select(pipelines, {busy: 5}) is pipelines[0]
+    print(f"✓ {len(pipelines)} pipelines: {[[p.node_id for p in pl] for pl in pipelines]}")
+    
+    # Live load changes reuse the plan, which never depended on them: they
+    # only steer routing. The cache stays bounded
+    peers[0].memory_available_gb = 1.5
+    assert coordinator.plan("llama-7b", peers) is pipelines
+    assert InferenceCoordinator("self", local_memory_gb=8.0).plan("llama-7b", peers) == pipelines
+    for i in range(coordinator.PLAN_CACHE_SIZE + 4):
+        peers[0].port = 6000 + i
+        coordinator.plan("llama-7b", peers)
+    assert len(coordinator._plan_cache) == coordinator.PLAN_CACHE_SIZE
+    print("✓ Plans cached on stable peer fields, at most PLAN_CACHE_SIZE kept")
+    
+    coordinator.executor.shutdown()
+
+
+async def test_metrics_endpoint():
+    """Test that a node serves Prometheus metrics for the work it did."""
+    print("\nTesting metrics endpoint...")
+    
+    import httpx
+    
+    config = NodeConfig(port=5021, auto_discover=False, metrics_port=0)
+    node = Node(config)
+    await node.start()
+    
+    result = await node.run_inference("How fast is this?")
+    tokens = node.metrics.get("swarm_tokens_generated_total")
+    assert tokens.value() == len(result.split())
+    
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"http://127.0.0.1:{node.metrics_server.port}/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'swarm_requests_total{model="default",mode=' in body
+    assert "swarm_stage_compute_seconds_count{" in body
+    assert "swarm_stage_queue_wait_seconds_count{" in body
+    assert "swarm_memory_in_use_bytes" in body
+    print(f"✓ Scraped {len(body.splitlines())} metric lines")
+    
+    await node.stop()
+
+
+async def test_request_tracing():
+    """Test that a request's timeline covers every stage it passed through."""
+    print("\nTesting request tracing...")
+    
+    def config(port: int) -> NodeConfig:
+        return NodeConfig(
+            port=port,
+            auto_discover=False,
+            advertise_host="127.0.0.1",
+            seeds=["127.0.0.1:5022"],
+            gossip_interval=0.1,
+        )
+    
+    first, second = Node(config(5022)), Node(config(5023))
+    await first.start()
+    await second.start()
+    assert await first.wait_for_peers(1, timeout=5)
+    
+    # Too little memory to run alone, so the peer has to take part (and
+    # has room for the layers it gets)
+    first.coordinator.local_memory_gb = 1.0
+    second.memory.budget = 16 * 1024**3
+    await first.run_inference("Where did the time go?", trace_id="trace-1")
+    
+    trace = first.get_trace("trace-1")
+    remote = {s["name"] for s in trace["spans"] if s["node_id"] == second.node_id}
+    assert {"receive", "queue", "compute", "send"} <= remote
+    assert any(s["name"] == "hop" for s in trace["spans"])
+    
+    chrome = first.get_trace("trace-1", chrome=True)
+    assert any(e["ph"] == "X" for e in chrome["traceEvents"])
+    print(f"✓ Trace has {len(trace['spans'])} spans over {trace['duration'] * 1000:.1f}ms")
+    
+    await second.stop()
+    await first.stop()
+
+
+async def test_simulated_bench():
+    """Test the benchmark harness against a small simulated cluster."""
+    print("\nTesting simulated cluster benchmark...")
+    
+    from swarm.bench import SimulatedCluster, Workload, run_workload
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.inference.simulation import SimulationProfile
+    
+    # Two nodes, each holding half the model
+    memory_gb = InferenceCoordinator.get_model_spec("default").memory_gb / 2 * 1.05
+    simulation = SimulationProfile(layer_ms=0.1, link_latency_ms=1.0)
+    
+    async with SimulatedCluster(nodes=2, memory_gb=memory_gb, simulation=simulation) as cluster:
+        workload = Workload(requests=4, concurrency=2, prompt_tokens=8, output_tokens=3)
+        report = await run_workload(cluster.frontend, workload)
+    
+    summary = report.summary()
+    assert summary["errors"] == 0
+    assert summary["output_tokens"] == 12
+    assert summary["ttft_s"]["p50"] > 0
+    print(
+        f"✓ TTFT p50 {summary['ttft_s']['p50'] * 1000:.1f}ms, "
+        f"{summary['throughput_tok_s']:.1f} tok/s"
+    )
+
+
+async def test_emulated_network():
+    """Test that per-link latency and drops on the in-memory network apply."""
+    print("\nTesting emulated network...")
+    
+    from swarm.bench import SimulatedCluster
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.protocol import LinkProfile
+    
+    memory_gb = InferenceCoordinator.get_model_spec("default").memory_gb * 1.05
+    async with SimulatedCluster(nodes=1, memory_gb=memory_gb) as cluster:
+        frontend = cluster.frontend
+        
+        # 50ms each way on the only hop
+        cluster.network.set_link("frontend", "node-0", LinkProfile(latency_ms=50))
+        started = time.perf_counter()
+        await frontend.run_inference("slow link", max_tokens=1)
+        elapsed = time.perf_counter() - started
+        assert elapsed >= 0.1
+        print(f"✓ One token over a 50ms link took {elapsed * 1000:.0f}ms")
+        
+        # A link that loses everything turns into a timeout
+        cluster.network.set_link("frontend", "node-0", LinkProfile(drop_rate=1.0))
+        frontend.coordinator.HOP_TIMEOUT = 0.2
+        try:
+            await frontend.run_inference("lossy link", max_tokens=1)
+            assert False, "expected the hop to time out"
+        except asyncio.TimeoutError:
+            print("✓ Dropped frames time out")
+    
+    # TCP reuses one connection per peer, and reconnects when it drops
+    from swarm.protocol import RPCServer, TCPTransport
+    
+    async def echo(params):
+        return params
+    
+    transport = TCPTransport()
+    server = RPCServer()
+    server.register("echo", echo)
+    await server.start_tcp("127.0.0.1", 5033)
+    for i in range(5):
+        assert await transport.call("127.0.0.1", 5033, "echo", {"i": i}) == {"i": i}
+    assert len(server._connections) == 1
+    
+    await server.stop()
+    server = RPCServer()
+    server.register("echo", echo)
+    await server.start_tcp("127.0.0.1", 5033)
+    assert await transport.call("127.0.0.1", 5033, "echo", {"i": 5}) == {"i": 5}
+    
+    # A connection lost after the request went out fails the call; it isn't
+    # sent again, since the handler may already have run
+    calls = []
+    
+    async def hang_up(params):
+        calls.append(params)
+        for writer in list(server._connections):
+            writer.close()
+        await asyncio.sleep(1)
+    
+    server.register("hang_up", hang_up)
+    try:
+        await transport.call("127.0.0.1", 5033, "hang_up", timeout=2)
+        assert False, "expected the dropped connection to surface"
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    assert len(calls) == 1
+    await transport.close()
+    await server.stop()
+    print("✓ TCP calls share a pooled connection and reconnect after the peer restarts")
+
+
+async def test_profiling():
+    """Test section timers and on-demand captures over the control socket."""
+    print("\nTesting profiling...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "node.sock")
+        config = NodeConfig(port=5024, auto_discover=False, control_socket=socket_path, profile=True)
+        node = Node(config)
+        node.profiler.output_dir = tmp
+        await node.start()
+        
+        await node.run_inference("Profile me")
+        
+        async with NodeClient(socket_path) as client:
+            timers = await client.profile("timers")
+            cpu = await client.profile("cpu", duration=0.1)
+            memory = await client.profile("memory")
+        
+        assert timers["sections"]["layer"]["count"] > 0
+        assert os.path.exists(cpu["path"]) and os.path.exists(memory["path"])
+        print(f"✓ Timed sections: {sorted(timers['sections'])}")
+        
+        await node.stop()
+
+
+async def test_memory_admission():
+    """Test that work beyond the memory budget queues, then is rejected."""
+    from swarm.inference.memory import MemoryAccountant, MemoryExhausted
+    
+    print("\nTesting memory admission...")
+    
+    memory = MemoryAccountant(budget_bytes=1000)
+    await memory.reserve("a", 600)
+    try:
+        await memory.reserve("b", 600, timeout=0.05)
+        assert False, "Reservation beyond the budget should be rejected"
+    except MemoryExhausted:
+        pass
+    
+    # A queued reservation goes through once memory is released
+    waiter = asyncio.create_task(memory.reserve("b", 600, timeout=1.0))
+    await asyncio.sleep(0.01)
+    memory.release("a")
+    await waiter
+    assert memory.usage()["kv"] == 600
+    print("✓ Reservations queue for memory and are rejected on timeout")
+    
+    node = Node(NodeConfig(port=5025, auto_discover=False, max_memory_gb=1.0))
+    await node.start()
+    
+    await node.run_inference("Fits in memory", max_tokens=8)
+    try:
+        await node.run_inference("Far too long", max_tokens=100_000)
+        assert False, "A sequence too long for the KV budget should be rejected"
+    except MemoryExhausted:
+        pass
+    
+    usage = node.memory.usage()
+    assert usage["budget"] == 1024**3
+    assert usage["kv"] == 0 and usage["activations"] == 0
+    print("✓ max_memory_gb bounds the budget; oversized requests are rejected")
+    
+    await node.stop()
+    
+    # Only a remote stage out of memory is MemoryExhausted; other failures stay errors
+    from swarm.bench import SimulatedCluster
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.protocol import RPCError
+    
+    async def full(params):
+        raise MemoryExhausted("no room")
+    
+    async def broken(params):
+        raise ValueError("protocol mismatch")
+    
+    memory_gb = InferenceCoordinator.get_model_spec("default").memory_gb * 1.05
+    async with SimulatedCluster(nodes=1, memory_gb=memory_gb) as cluster:
+        frontend = cluster.frontend
+        (pipeline,) = frontend.coordinator.plan("default", list(frontend.peers.values()))
+        (stage,) = [p for p in pipeline if p.node_id != frontend.node_id]
+        server = cluster.network.server(stage.ip_address, stage.port)
+        
+        server.register("reserve", full)
+        try:
+            await frontend.run_inference("Remote stage is full", max_tokens=1)
+            assert False, "expected MemoryExhausted"
+        except MemoryExhausted:
+            pass
+        
+        server.register("reserve", broken)
+        try:
+            await frontend.run_inference("Remote stage is broken", max_tokens=1)
+            assert False, "expected an RPC error"
+        except RPCError as e:
+            assert "protocol mismatch" in str(e)
+    print("✓ Remote memory rejections map to MemoryExhausted, other RPC errors don't")
+
+
+async def test_kv_offload():
+    """Test that cold KV blocks spill to disk and page back in order."""
+    import numpy as np
+    from swarm.inference.kvcache import KVCache
+    from swarm.inference.memory import MemoryExhausted
+    
+    print("\nTesting KV cache offload...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = KVCache(block_tokens=4, resident_blocks=1, spill_dir=tmp)
+        rows = np.arange(40 * 8, dtype=np.float32).reshape(40, 8)
+        for i in range(0, 40, 5):
+            cache.append("seq", 0, rows[i:i + 5])
+        
+        # Blocks stay readable in memory until their write lands
+        assert cache.stats()["spilled_bytes"] == 0
+        await cache.flush()
+        assert cache.stats()["spilled_bytes"] > 0
+        staged = []
+        
+        def collect(parts, block):
+            # At most the block being folded and the next one are paged in
+            staged.append(sum(b.staged is not None for b in cache.sequences["seq"][0]))
+            return (parts or []) + [block]
+        
+        (parts,) = await cache.stream("seq", [0], collect)
+        assert np.array_equal(np.concatenate(parts), rows)
+        assert max(staged) <= 1 and all(b.staged is None for b in cache.sequences["seq"][0])
+        
+        # Only the first spilled block is read back ahead; later ones stream
+        misses = cache.misses
+        cache.prefetch("seq")
+        await cache.stream("seq", [0], collect)
+        assert cache.misses == misses
+        print(f"✓ {cache.stats()['spilled_bytes']} bytes spilled, context intact after page-in")
+        cache.close()
+        
+        node = Node(NodeConfig(port=5026, auto_discover=False, max_memory_gb=1.0, kv_offload_dir=tmp))
+        node.kv_cache.block_tokens = 4
+        node.kv_cache.resident_blocks = 1
+        await node.start()
+        
+        await node.run_inference("A long conversation", max_tokens=40)
+        assert node.kv_cache.misses + node.kv_cache.hits > 0
+        
+        # Only a window of the sequence needs memory, so long contexts are admitted
+        await node.coordinator.handle_reserve(
+            {"sequence_id": "long", "model": "default", "start_layer": 0, "end_layer": 23,
+             "tokens": 100_000},
+            stream_weights=True,
+        )
+        await node.coordinator.handle_release({"sequence_id": "long"})
+        print("✓ Long context admitted with KV offload")
+        
+        # As a stage of someone else's pipeline, weights over budget are refused
+        try:
+            await node.coordinator.handle_reserve(
+                {"sequence_id": "stage", "model": "default", "start_layer": 0, "end_layer": 23,
+                 "tokens": 1}
+            )
+            assert False, "expected a weights rejection"
+        except MemoryExhausted:
+            pass
+        rejections = node.metrics.get("swarm_memory_rejections_total")
+        assert rejections.value(kind="weights") == 1 and "stage" not in node.memory.leases
+        print("✓ Stage refuses layers whose weights exceed its budget")
+        
+        await node.stop()
+
+
+async def test_sessions():
+    """Test that session turns prefill only new tokens, and recover from eviction."""
+    print("\nTesting sessions...")
+    
+    node = Node(NodeConfig(port=5027, auto_discover=False))
+    await node.start()
+    cache = node.kv_cache
+    
+    await node.run_inference("one two three", max_tokens=4, session_id="chat")
+    key = node.coordinator.session_key("local", "chat")
+    assert key.startswith(node.node_id) and key != "chat"
+    first = cache.tokens(key, 0)
+    assert first == 3 + 3  # prompt, then every generated token but the last
+    
+    await node.run_inference("four five", max_tokens=4, session_id="chat")
+    assert cache.tokens(key, 0) == first + 1 + 2 + 3
+    print("✓ Second turn prefilled only its new tokens")
+    
+    # Lose the cache behind the session's back: the next turn starts over
+    await node.coordinator.handle_release({"sequence_id": key})
+    await node.run_inference("six", max_tokens=2, session_id="chat")
+    session = node.coordinator.sessions.sessions[key]
+    history = " ".join(session.history[:-2])
+    assert cache.tokens(key, 0) == len(history.split()) + 1 + 1
+    print("✓ Evicted session was prefilled again from its history")
+    
+    # Another client's session of the same name is a different conversation
+    await node.run_inference("hello", max_tokens=2, session_id="chat", client="other")
+    other = node.coordinator.session_key("other", "chat")
+    assert cache.tokens(other, 0) == 1 + 1 and cache.tokens(key, 0) > 2
+    print("✓ Session ids are namespaced per node and client")
+    
+    await node.end_session("chat", client="other")
+    await node.end_session("chat")
+    assert key not in cache.sequences and key not in node.memory.leases
+    
+    await node.stop()
+
+
+async def test_priority_scheduling():
+    """Test that urgent steps run first, late requests drop and batch work is preempted."""
+    import time
+    import numpy as np
+    from swarm.inference.scheduler import PRIORITIES, DeadlineExceeded, StepScheduler, Urgency
+    
+    print("\nTesting priority scheduling...")
+    
+    scheduler = StepScheduler(slots=1)
+    order = []
+    
+    async def step(name, urgency):
+        async with scheduler.slot(urgency):
+            order.append(name)
+            await asyncio.sleep(0.01)
+    
+    async with scheduler.slot(Urgency()):
+        tasks = [
+            asyncio.create_task(step("batch", Urgency(PRIORITIES["batch"]))),
+            asyncio.create_task(step("late", Urgency(PRIORITIES["interactive"], time.time() + 60))),
+            asyncio.create_task(step("soon", Urgency(PRIORITIES["interactive"], time.time() + 1))),
+        ]
+        await asyncio.sleep(0.01)
+        assert scheduler.queued == 3
+    await asyncio.gather(*tasks)
+    assert order == ["soon", "late", "batch"]
+    print("✓ Steps granted by priority, then earliest deadline")
+    
+    node = Node(NodeConfig(port=5028, auto_discover=False, max_memory_gb=1.0))
+    await node.start()
+    
+    try:
+        await node.run_inference("Too late", deadline=time.time() - 1)
+        assert False, "A request past its deadline should be dropped"
+    except DeadlineExceeded:
+        pass
+    print("✓ Request past its deadline dropped")
+    
+    # A batch sequence holds most of the budget; an interactive one needs it
+    coordinator = node.coordinator
+    reserve = {"model": "default", "start_layer": 0, "end_layer": 23}
+    await coordinator.handle_reserve(
+        {**reserve, "sequence_id": "bulk", "tokens": 4000, "priority": PRIORITIES["batch"]},
+        stream_weights=True,
+    )
+    rows = np.zeros((40, 64), dtype=np.float32)
+    for layer in range(24):
+        node.kv_cache.append("bulk", layer, rows)
+    held, headroom = node.memory.held("bulk"), node.memory.headroom
+    await coordinator.handle_reserve(
+        {**reserve, "sequence_id": "chat", "tokens": 2000, "priority": PRIORITIES["interactive"]},
+        stream_weights=True,
+    )
+    # Only the blocks being filled stay in memory, and only they stay reserved
+    tail = 40 % node.kv_cache.block_tokens
+    assert node.kv_cache.resident("bulk") == tail
+    spec = coordinator.get_model_spec("default")
+    assert node.memory.held("bulk") == spec.kv_bytes(tail, 24) and node.memory.swapped["bulk"] > 0
+    assert node.memory.held("chat") > 0
+    await node.kv_cache.flush()
+    assert node.kv_cache.stats()["resident_bytes"] < node.kv_cache.stats()["spilled_bytes"]
+    print("✓ Batch KV cache swapped out for an interactive request")
+    
+    await coordinator.handle_release({"sequence_id": "chat"})
+    
+    # Its next step takes the memory back and reads the blocks back into it
+    step = np.zeros((1, 64), dtype=np.float32)
+    await coordinator._compute("default", 0, 23, step, "bulk", Urgency(PRIORITIES["batch"]))
+    assert "bulk" not in node.memory.swapped and node.memory.held("bulk") == held
+    assert node.kv_cache.resident("bulk") == 41 and node.kv_cache.stats()["spilled_bytes"] == 0
+    assert node.memory.headroom == headroom
+    print("✓ Preempted sequence resumed with its blocks back in the reserved memory")
+    
+    await coordinator.handle_release({"sequence_id": "bulk"})
+    await node.stop()
+
+
+async def test_batch_inference():
+    """Test that a batch job writes every result and resumes where it stopped."""
+    import json
+    from swarm.serving.batch import completed_ids, run_batch
+    
+    print("\nTesting batch inference...")
+    
+    node = Node(NodeConfig(port=5029, auto_discover=False))
+    await node.start()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "prompts.jsonl")
+        output_path = os.path.join(tmp, "results.jsonl")
+        with open(input_path, "w") as f:
+            for i in range(20):
+                f.write(json.dumps({"id": f"p{i}", "prompt": f"Prompt number {i}", "max_tokens": 4}) + "\n")
+        
+        # The first run fails one prompt for good, and is cut off mid-write
+        async def flaky(item):
+            if item.id == "p7":
+                raise RuntimeError("stage lost")
+            return await node.run_inference(item.prompt, max_tokens=item.max_tokens, priority="batch")
+        
+        report = await run_batch(flaky, input_path, output_path, concurrency=4, retries=1)
+        assert report.completed == 19 and report.failed == 1
+        with open(output_path, "a") as f:
+            f.write('{"id": "p20", "out')
+        assert len(completed_ids(output_path)) == 19
+        print("✓ Results streamed to the output file")
+        
+        async def infer(item):
+            return await node.run_inference(item.prompt, max_tokens=item.max_tokens, priority="batch")
+        
+        report = await run_batch(infer, input_path, output_path, concurrency=4)
+        assert report.skipped == 19 and report.completed == 1
+        assert completed_ids(output_path) == {f"p{i}" for i in range(20)}
+        print("✓ Resumed run only ran the unfinished prompt")
+    
+    await node.stop()
+
+
+async def test_token_ids_first_hop():
+    """Test that prompts are tokenized once and the first stage gets token ids."""
+    import numpy as np
+    from swarm.bench import SimulatedCluster
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.inference.tokenizer import Tokenizer
+    
+    print("\nTesting tokenization...")
+    
+    tokenizer = Tokenizer()
+    template = "You are a helpful assistant.\nAnswer briefly.\nQuestion: {}"
+    first = tokenizer.encode(template.format("what is a swarm"))
+    assert first.dtype == np.int32 and len(first) == 12
+    assert tokenizer.encode(template.format("what is a swarm")) is first
+    # A new question only tokenizes its own line
+    lines = len(tokenizer._lines.entries)
+    tokenizer.encode(template.format("why is the sky blue"))
+    assert len(tokenizer._lines.entries) == lines + 1
+    print("✓ Templated prompts reuse cached token ids")
+    
+    memory_gb = InferenceCoordinator.get_model_spec("default").memory_gb * 1.05
+    async with SimulatedCluster(nodes=1, memory_gb=memory_gb) as cluster:
+        coordinator = cluster.frontend.coordinator
+        hop_bytes = coordinator.metrics.get("swarm_hop_transfer_bytes_total")
+        prompt = "one two three four five six"
+        await cluster.frontend.run_inference(prompt, max_tokens=1)
+        (stage,) = cluster.frontend.peers
+        sent = hop_bytes.value(src=coordinator.node_id, dst=stage)
+        assert sent == 6 * 4, sent
+        print(f"✓ First hop carried {sent:.0f} bytes of token ids for 6 tokens")
+
+
+async def test_micro_batching():
+    """Test that concurrent steps share micro-batches sized by AIMD."""
+    from swarm.inference.batching import BatchSizer
+    
+    print("\nTesting micro-batching...")
+    
+    sizer = BatchSizer(target=0.05, max_size=8)
+    for _ in range(5):
+        sizer.observe(steps=sizer.size, backlog=3, seconds=0.01)
+    assert sizer.size == 6
+    sizer.observe(steps=6, backlog=0, seconds=0.01)
+    assert sizer.size == 6  # nothing was waiting, no reason to grow
+    sizer.observe(steps=6, backlog=3, seconds=0.2)
+    assert sizer.size == 3
+    print("✓ Batch size grows additively and halves on overrun")
+    
+    node = Node(NodeConfig(port=5030, auto_discover=False))
+    await node.start()
+    
+    results = await asyncio.gather(
+        *(node.run_inference(f"Request {i}", max_tokens=16) for i in range(8))
+    )
+    assert all(len(result.split()) == 16 for result in results)
+    batches = node.coordinator.metrics.get("swarm_micro_batch_steps")
+    steps, passes = batches.sum(kind="decode"), batches.count(kind="decode")
+    assert steps == 8 * 15 and passes < steps
+    print(f"✓ {steps:.0f} decode steps ran in {passes} passes")
+    
+    await node.stop()
+
+
+async def test_chunked_prefill():
+    """Test that long prompts prefill in chunks that queue behind decode steps."""
+    from swarm.inference.scheduler import StepScheduler, Urgency
+    
+    print("\nTesting chunked prefill...")
+    
+    scheduler = StepScheduler(slots=1)
+    order = []
+    
+    async def step(name, prefill):
+        async with scheduler.slot(Urgency(), prefill):
+            order.append(name)
+    
+    async with scheduler.slot(Urgency()):
+        tasks = [asyncio.create_task(step("prefill", True)), asyncio.create_task(step("decode", False))]
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+    assert order == ["decode", "prefill"]
+    print("✓ Decode steps go ahead of prefill chunks")
+    
+    node = Node(NodeConfig(port=5031, auto_discover=False))
+    await node.start()
+    coordinator = node.coordinator
+    
+    prompt = " ".join(f"word{i}" for i in range(200))
+    await asyncio.gather(
+        node.run_inference(prompt, max_tokens=2, session_id="long"),
+        *(node.run_inference(f"Chat {i}", max_tokens=8) for i in range(4)),
+    )
+    chunks = -(-200 // coordinator.PREFILL_CHUNK)
+    assert coordinator.metrics.get("swarm_micro_batch_steps").count(kind="prefill") >= chunks
+    assert node.kv_cache.tokens(coordinator.session_key("local", "long"), 0) == 200 + 1
+    print(f"✓ 200-token prompt prefilled in {chunks} chunks")
+    
+    await node.stop()
+
+
+async def test_activation_compression():
+    """Test activation codecs and their choice per link from measured bandwidth."""
+    import numpy as np
+    from swarm.bench import SimulatedCluster
+    from swarm.inference.coordinator import InferenceCoordinator
+    from swarm.protocol import HiddenStateFrame, LinkProfile
+    from swarm.protocol.codec import (
+        BASE_CODECS, LinkMeter, choose_codec, decode, encode, fallback_codec,
+    )
+    
+    print("\nTesting activation compression...")
+    
+    hidden = np.random.default_rng(0).standard_normal((8, 64)).astype(np.float32)
+    for codec, ratio, tolerance in [("fp16", 2, 1e-2), ("bf16", 2, 5e-2), ("int8", 4, 5e-2)]:
+        payload, meta = encode(hidden, codec)
+        assert len(payload) == hidden.nbytes // ratio
+        restored = decode(payload, meta)
+        assert restored.dtype == np.float32 and np.abs(restored - hidden).max() < tolerance, codec
+    
+    # Token ids are never rounded, and fp16 falls back to bf16 when out of range
+    ids = np.arange(100, dtype=np.int32)
+    assert np.array_equal(decode(*encode(ids, "int8")), ids)
+    assert np.array_equal(decode(*encode(ids, "zlib")), ids)
+    assert encode(hidden * 1e6, "fp16")[1]["codec"] == "bf16"
+    
+    # bf16 keeps infinities and NaNs, whatever the NaN's payload
+    special = np.array([np.inf, -np.inf, np.nan, -np.nan, 1.0], dtype=np.float32)
+    special = np.append(special, np.array([0x7F800001, 0xFFFFFFFF], dtype=np.uint32).view(np.float32))
+    restored = decode(*encode(special, "bf16"))
+    assert np.array_equal(restored, special, equal_nan=True)
+    assert np.array_equal(np.signbit(restored), np.signbit(special))
+    
+    assert choose_codec(np.float32, 1, None) == "raw"
+    assert choose_codec(np.float32, 1, 300.0) == "fp16"
+    assert choose_codec(np.float32, 1, 20.0) == "int8"
+    # lz4 only goes to peers that advertise it
+    assert choose_codec(np.int32, 60, 20.0) == "zlib"
+    assert choose_codec(np.int32, 60, 20.0, accepted=BASE_CODECS + ("lz4",)) == "lz4"
+    assert fallback_codec("lz4", BASE_CODECS) == "zlib"
+    assert fallback_codec("int8", BASE_CODECS) == "int8"
+    print("✓ fp16/bf16 halve, int8 quarters, token ids stay exact")
+    
+    # A link that got slower is learned again
+    meter = LinkMeter()
+    meter.observe("peer", 100, 0.001)
+    for _ in range(100):
+        meter.observe("peer", 100, 0.05)
+    assert meter.latency["peer"] > 0.04
+    meter.observe("peer", 100, 0.002)
+    assert meter.latency["peer"] == 0.002
+    print("✓ Link latency estimate recovers after the link slows down")
+    
+    memory_gb = InferenceCoordinator.get_model_spec("default").memory_gb * 1.05
+    async with SimulatedCluster(nodes=1, memory_gb=memory_gb) as cluster:
+        coordinator = cluster.frontend.coordinator
+        (stage,) = cluster.frontend.peers
+        # A slow Wi-Fi link to the only stage
+        slow = LinkProfile(latency_ms=1, bandwidth_mbps=2)
+        cluster.network.set_link("frontend", "node-0", slow)
+        cluster.network.set_link("node-0", "frontend", slow)
+        
+        # Small decode frames show the latency, a big prefill reply the bandwidth
+        prompt = " ".join(f"word{i}" for i in range(60))
+        frames = coordinator.metrics.get("swarm_hop_frames_total")
+        for _ in range(3):
+            await cluster.frontend.run_inference(prompt, max_tokens=8)
+        bandwidth = coordinator.links.bandwidth[stage]
+        assert bandwidth < 10, bandwidth
+        assert frames.value(codec="int8") > 0
+        assert frames.value(codec="zlib") > 0  # the prompt's token ids
+        print(f"✓ Link measured at {bandwidth:.1f} Mbit/s switched to int8")
+
+
+async def test_compute_backends():
+    """Test compute backend selection and their agreement with the NumPy kernels."""
+    import pickle
+    import numpy as np
+    from swarm.inference.backends import (
+        BACKENDS, ComputeBackend, NumpyBackend, available_backends, select_backend,
+    )
+    from swarm.inference.compute import attend_batch
+    from swarm.node import Node, NodeConfig
+    
+    print("\nTesting compute backends...")
+    
+    rng = np.random.default_rng(1)
+    hidden = [rng.standard_normal((3, 64)).astype(np.float32), np.array([5, 7], dtype=np.int32)]
+    contexts = [[None, None], [rng.standard_normal((4, 64)).astype(np.float32)] * 2]
+    expected, expected_inputs = attend_batch("default", 2, 3, hidden, contexts)
+    
+    # The shared layer loop every engine runs, driven by NumPy's hooks
+    outputs, inputs = ComputeBackend.attend_batch(NumpyBackend(), "default", 2, 3, hidden, contexts)
+    for output, reference in zip(outputs, expected):
+        assert np.allclose(output, reference, atol=1e-5)
+    assert [len(layers) for layers in inputs] == [2, 2]
+    try:
+        ComputeBackend()
+        assert False, "A backend must implement its engine's hooks"
+    except TypeError:
+        pass
+    for name in available_backends():
+        outputs, _ = BACKENDS[name]().attend_batch("default", 2, 3, hidden, contexts)
+        assert all(np.allclose(o, r, atol=1e-3) for o, r in zip(outputs, expected)), name
+    print(f"✓ Backends here agree with NumPy: {', '.join(available_backends())}")
+    
+    chosen = select_backend("auto")
+    assert chosen.name in available_backends()
+    assert select_backend("auto") is chosen  # benchmarked once per process
+    pickle.dumps(chosen.attend_batch)  # process workers get it pickled
+    for bad in ("cuda", *(name for name in BACKENDS if name not in available_backends())):
+        try:
+            select_backend(bad)
+            assert False, f"{bad} should be refused"
+        except ValueError:
+            pass
+    print(f"✓ Auto-selected {chosen.name}; unknown or missing backends refused")
+    
+    node = Node(NodeConfig(port=5032, auto_discover=False, compute_backend="numpy"))
+    await node.start()
+    assert node.get_cluster_info()["backend"] == "numpy"
+    assert await node.run_inference("Hello backends", max_tokens=3)
+    await node.stop()
+    print("✓ Node runs its layers on the configured backend")
+    
+    # Nothing is benchmarked until the node first computes
+    node = Node(NodeConfig(port=5032, auto_discover=False))
+    await node.start()
+    assert node.get_cluster_info()["backend"] == "auto"
+    assert await node.run_inference("Hello auto", max_tokens=3)
+    assert node.get_cluster_info()["backend"] == chosen.name
+    await node.stop()
+    print("✓ Auto backend picked on first compute, not at startup")
+
+
+async def test_fast_cli_startup():
+    """Test that the CLI imports only what option parsing needs."""
+    import subprocess
+    import sys
+    from click.testing import CliRunner
+    from swarm.cli import main as cli
+    from swarm.utils.hardware import probe_gpu
+    
+    print("\nTesting CLI startup imports...")
+    
+    heavy = [
+        "rich", "zeroconf", "psutil", "torch", "numpy", "swarm.node.node", "swarm.inference.coordinator"
+    ]
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, swarm.cli; print([m for m in {heavy!r} if m in sys.modules])"],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    assert loaded == "[]", loaded
+    
+    # The CLI's choices are the real ones
+    from swarm.inference.backends import BACKENDS
+    from swarm.utils.choices import BACKEND_NAMES
+    assert tuple(BACKENDS) == BACKEND_NAMES
+    print("✓ Importing the CLI loads no node, discovery, rich or NumPy modules")
+    
+    # Package exports resolve on first use and are listed before that
+    import swarm
+    assert "Node" in dir(swarm) and swarm.Node is swarm.Node
+    try:
+        swarm.NoSuchExport
+        assert False, "Unknown exports should raise AttributeError"
+    except AttributeError:
+        pass
+    
+    result = CliRunner().invoke(cli, ["status"])
+    assert result.exit_code == 0 and "Swarm Status" in result.output, result.output
+    assert probe_gpu() is probe_gpu()  # probed once per process
+    print("✓ `swarm status` runs; hardware probe cached")
+    
+    # A session outlives one command only on a running node
+    result = CliRunner().invoke(cli, ["infer", "hi", "--session", "chat", "--standalone"])
+    assert result.exit_code == 2 and "running node" in result.output, result.output
+    orphan = subprocess.run(
+        [sys.executable, "-m", "swarm.cli", "infer", "hi", "--session", "chat",
+         "--socket", os.path.join(tempfile.gettempdir(), "no-such-node.sock")],
+        capture_output=True, text=True,
+    )
+    assert orphan.returncode == 2 and "running node" in orphan.stderr, orphan.stderr
+    print("✓ `swarm infer --session` without a running node is refused")
+
+
 async def main():
     """Run all tests."""
     print("=" * 60)
@@ -71,6 +1186,31 @@ async def main():
         await test_node_startup()
         await test_mock_inference()
         await test_cluster_info()
+        await test_process_compute_pool()
+        await test_local_fast_path()
+        await test_control_socket()
+        await test_openai_server()
+        await test_peer_cache()
+        await test_live_load_updates()
+        await test_seed_gossip()
+        await test_grouped_gossip()
+        await test_data_parallel_pipelines()
+        await test_metrics_endpoint()
+        await test_request_tracing()
+        await test_simulated_bench()
+        await test_emulated_network()
+        await test_profiling()
+        await test_memory_admission()
+        await test_kv_offload()
+        await test_sessions()
+        await test_priority_scheduling()
+        await test_batch_inference()
+        await test_token_ids_first_hop()
+        await test_micro_batching()
+        await test_chunked_prefill()
+        await test_activation_compression()
+        await test_compute_backends()
+        await test_fast_cli_startup()
         
         print("\n" + "=" * 60)
         print("All tests passed! ✓")